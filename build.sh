@@ -7,6 +7,9 @@ echo "Starting build process..."
 echo "Installing dependencies..."
 pip install -r requirements.txt
 
+echo "Building styles and icon fonts..."
+python manage.py build_assets
+
 echo "Collecting static files..."
 python manage.py collectstatic --noinput
 
@@ -14,6 +17,9 @@ echo "Running migrations..."
 python manage.py makemigrations --noinput
 python manage.py migrate --noinput
 
+echo "Rebuilding search index..."
+python manage.py rebuild_search_index
+
 echo "Creating superuser if needed..."
 python manage.py shell -c "
 from django.contrib.auth import get_user_model
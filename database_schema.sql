@@ -5,6 +5,7 @@
 
 -- Crear extensiones necesarias
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+CREATE EXTENSION IF NOT EXISTS unaccent;
 
 -- =====================================================
 -- TABLAS PRINCIPALES
@@ -30,7 +31,16 @@ CREATE TABLE main_book (
     reading_start_date DATE,
     reading_end_date DATE,
     average_rating DECIMAL(3,2) DEFAULT 0.00,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    rating_count INTEGER DEFAULT 0 CHECK (rating_count >= 0),
+    rating_sum INTEGER DEFAULT 0 CHECK (rating_sum >= 0),
+    rating_1_count INTEGER DEFAULT 0 CHECK (rating_1_count >= 0),
+    rating_2_count INTEGER DEFAULT 0 CHECK (rating_2_count >= 0),
+    rating_3_count INTEGER DEFAULT 0 CHECK (rating_3_count >= 0),
+    rating_4_count INTEGER DEFAULT 0 CHECK (rating_4_count >= 0),
+    rating_5_count INTEGER DEFAULT 0 CHECK (rating_5_count >= 0),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    search_vector TSVECTOR
 );
 
 -- Tabla intermedia para relación Many-to-Many entre Libros y Géneros
@@ -63,10 +73,29 @@ CREATE TABLE main_event (
     online_link TEXT DEFAULT '',
     book_id BIGINT REFERENCES main_book(id) ON DELETE SET NULL,
     max_participants INTEGER,
+    confirmed_count INTEGER DEFAULT 0 CHECK (confirmed_count >= 0),
+    waitlist_count INTEGER DEFAULT 0 CHECK (waitlist_count >= 0),
     is_active BOOLEAN DEFAULT TRUE,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    sequence INTEGER DEFAULT 0 CHECK (sequence >= 0),
+    details_updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Tabla de Inscripciones a Eventos
+CREATE TABLE main_eventregistration (
+    id BIGSERIAL PRIMARY KEY,
+    event_id BIGINT NOT NULL REFERENCES main_event(id) ON DELETE CASCADE,
+    name VARCHAR(100) NOT NULL,
+    email VARCHAR(254) NOT NULL,
+    status VARCHAR(20) NOT NULL CHECK (status IN ('confirmed', 'waitlisted', 'cancelled')),
+    token UUID NOT NULL UNIQUE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+CREATE UNIQUE INDEX unique_active_registration ON main_eventregistration(event_id, email) WHERE status <> 'cancelled';
+CREATE INDEX registration_queue_idx ON main_eventregistration(event_id, status, created_at, id);
+
 -- Tabla de Entradas de Blog
 CREATE TABLE main_blogpost (
     id BIGSERIAL PRIMARY KEY,
@@ -89,6 +118,7 @@ CREATE TABLE main_member (
     phone VARCHAR(20) DEFAULT '',
     bio TEXT DEFAULT '',
     join_date TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     is_active BOOLEAN DEFAULT TRUE,
     profile_image TEXT DEFAULT ''
 );
@@ -101,6 +131,17 @@ CREATE TABLE main_member_favorite_genres (
     UNIQUE(member_id, genre_id)
 );
 
+-- Recomendaciones precalculadas (manage.py refresh_recommendations)
+CREATE TABLE main_memberrecommendation (
+    id BIGSERIAL PRIMARY KEY,
+    member_id BIGINT NOT NULL REFERENCES main_member(id) ON DELETE CASCADE,
+    book_id BIGINT NOT NULL REFERENCES main_book(id) ON DELETE CASCADE,
+    rank SMALLINT NOT NULL CHECK (rank >= 0),
+    score DOUBLE PRECISION NOT NULL,
+    UNIQUE(member_id, rank)
+);
+CREATE INDEX main_memberrecommendation_book_id ON main_memberrecommendation(book_id);
+
 -- Tabla de Sugerencias de Libros
 CREATE TABLE main_booksuggestion (
     id BIGSERIAL PRIMARY KEY,
@@ -116,7 +157,7 @@ CREATE TABLE main_booksuggestion (
 -- Tabla de Newsletter
 CREATE TABLE main_newsletter (
     id BIGSERIAL PRIMARY KEY,
-    email VARCHAR(254) UNIQUE NOT NULL,
+    email VARCHAR(254) UNIQUE NOT NULL CONSTRAINT newsletter_email_lowercase CHECK (email = LOWER(email)),
     name VARCHAR(100) DEFAULT '',
     subscribed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     is_active BOOLEAN DEFAULT TRUE
@@ -130,6 +171,7 @@ CREATE TABLE main_gallery (
     image_url TEXT NOT NULL,
     event_id BIGINT REFERENCES main_event(id) ON DELETE SET NULL,
     upload_date TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     is_featured BOOLEAN DEFAULT FALSE
 );
 
@@ -137,22 +179,36 @@ CREATE TABLE main_gallery (
 -- ÍNDICES PARA OPTIMIZACIÓN
 -- =====================================================
 
--- Índices para búsquedas frecuentes
-CREATE INDEX idx_book_reading_status ON main_book(reading_status);
-CREATE INDEX idx_book_created_at ON main_book(created_at);
-CREATE INDEX idx_event_date ON main_event(date);
-CREATE INDEX idx_event_is_active ON main_event(is_active);
-CREATE INDEX idx_blogpost_is_published ON main_blogpost(is_published);
-CREATE INDEX idx_blogpost_is_featured ON main_blogpost(is_featured);
-CREATE INDEX idx_blogpost_created_at ON main_blogpost(created_at);
-CREATE INDEX idx_member_is_active ON main_member(is_active);
-CREATE INDEX idx_booksuggestion_status ON main_booksuggestion(status);
-CREATE INDEX idx_gallery_is_featured ON main_gallery(is_featured);
-CREATE INDEX idx_newsletter_is_active ON main_newsletter(is_active);
-
--- Índices para búsquedas de texto
-CREATE INDEX idx_book_title ON main_book USING gin(to_tsvector('spanish', title));
-CREATE INDEX idx_book_author ON main_book USING gin(to_tsvector('spanish', author));
+-- Índices de las consultas de cada página. Los crea la migración
+-- main/0007_hot_path_indexes (CONCURRENTLY en PostgreSQL); se copian aquí sólo
+-- como referencia para bases montadas a mano con este script.
+CREATE INDEX idx_book_isbn ON main_book(isbn);
+CREATE INDEX book_status_end_date_idx ON main_book(reading_status, reading_end_date DESC, id DESC);
+CREATE INDEX book_status_start_date_idx ON main_book(reading_status, reading_start_date);
+CREATE INDEX book_updated_at_idx ON main_book(updated_at);
+CREATE INDEX bookreview_created_at_idx ON main_bookreview(created_at);
+CREATE INDEX event_active_date_idx ON main_event(date) WHERE is_active;
+CREATE INDEX event_date_idx ON main_event(date);
+CREATE INDEX event_updated_at_idx ON main_event(updated_at);
+CREATE INDEX blogpost_published_idx ON main_blogpost(created_at DESC, id DESC) WHERE is_published;
+CREATE INDEX blogpost_featured_idx ON main_blogpost(created_at DESC) WHERE (is_featured AND is_published);
+CREATE INDEX blogpost_updated_at_idx ON main_blogpost(updated_at);
+CREATE INDEX member_active_name_idx ON main_member(name) WHERE is_active;
+CREATE INDEX member_active_joined_idx ON main_member(join_date DESC) WHERE is_active;
+CREATE INDEX member_updated_at_idx ON main_member(updated_at);
+CREATE INDEX gallery_upload_date_idx ON main_gallery(upload_date DESC, id DESC);
+CREATE INDEX gallery_featured_idx ON main_gallery(upload_date DESC) WHERE is_featured;
+CREATE INDEX gallery_updated_at_idx ON main_gallery(updated_at);
+CREATE INDEX suggestion_status_idx ON main_booksuggestion(status, created_at DESC);
+
+-- Mapa del sitio (main/0009_sitemap_indexes): pk y lastmod sin leer la tabla
+CREATE INDEX event_sitemap_idx ON main_event(id, created_at) WHERE is_active;
+CREATE INDEX event_cancelled_idx ON main_event(details_updated_at) WHERE NOT is_active;
+CREATE INDEX blogpost_sitemap_idx ON main_blogpost(id, updated_at) WHERE is_published;
+
+-- Índice para búsquedas de texto (search_vector lo mantiene main/search.py:
+-- título, autor, géneros y sinopsis sin tildes; ver manage.py rebuild_search_index)
+CREATE INDEX main_book_search_vector_gin ON main_book USING gin(search_vector);
 CREATE INDEX idx_genre_name ON main_genre USING gin(to_tsvector('spanish', name));
 
 -- =====================================================
@@ -199,6 +255,7 @@ COMMENT ON TABLE main_genre IS 'Géneros literarios disponibles para clasificar
 COMMENT ON TABLE main_book IS 'Catálogo principal de libros del club de lectura';
 COMMENT ON TABLE main_bookreview IS 'Reseñas y calificaciones de libros por miembros';
 COMMENT ON TABLE main_event IS 'Eventos y actividades del club de lectura';
+COMMENT ON TABLE main_eventregistration IS 'Inscripciones a eventos, con lista de espera';
 COMMENT ON TABLE main_blogpost IS 'Entradas del blog con reflexiones literarias';
 COMMENT ON TABLE main_member IS 'Miembros registrados del club de lectura';
 COMMENT ON TABLE main_booksuggestion IS 'Sugerencias de libros propuestas por miembros';
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djangocrug.settings')
+# Por ASGI se sirven las versiones asíncronas de las vistas (main.async_views)
+os.environ.setdefault('ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 from decouple import config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -27,6 +28,8 @@ SECRET_KEY = config('SECRET_KEY', default='django-insecure-nt6b@7%$+xdc$m8gzdll8
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = config('DEBUG', default=False, cast=bool)
 
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
 # For production, you can be more specific:
 ALLOWED_HOSTS = ['club-de-lectura-elixir.onrender.com', 'your-app-name.onrender.com', 'localhost', '127.0.0.1']
 
@@ -44,7 +47,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'main.middleware.StaticFilesMiddleware',
+    'main.middleware.PerformanceMiddleware',
+    'main.middleware.QueryBudgetMiddleware',
+    'main.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -53,11 +59,34 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Instrumentación de cada petición (main.instrumentation): cabecera Server-Timing,
+# aviso de consultas lentas (ms) o repetidas en la misma petición, y percentiles por
+# vista sobre las últimas PERFORMANCE_WINDOW peticiones en /metrics/ (formato de
+# Prometheus; para staff o con la cabecera Authorization: Bearer METRICS_TOKEN).
+# Sin SERVER_TIMING (por defecto fuera de DEBUG) la cabecera sólo va a esos mismos
+PERFORMANCE_INSTRUMENTATION = config('PERFORMANCE_INSTRUMENTATION', default=True, cast=bool)
+SERVER_TIMING = config('SERVER_TIMING', default=DEBUG, cast=bool)
+SLOW_QUERY_MS = config('SLOW_QUERY_MS', default=100, cast=float)
+DUPLICATE_QUERY_THRESHOLD = config('DUPLICATE_QUERY_THRESHOLD', default=3, cast=int)
+PERFORMANCE_WINDOW = config('PERFORMANCE_WINDOW', default=1000, cast=int)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Falla las peticiones que superan el @query_budget de su vista (sólo con DEBUG)
+QUERY_BUDGET_ENFORCE = config('QUERY_BUDGET_ENFORCE', default=DEBUG, cast=bool)
+
 ROOT_URLCONF = 'djangocrug.urls'
 
+# Vistas asíncronas (main.async_views); djangocrug/asgi.py las activa por defecto
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+# Consultas independientes en paralelo, cada una con su conexión. En los tests se
+# ejecutan en serie para que assertNumQueries las vea en la conexión principal
+ASYNC_CONCURRENT_QUERIES = config('ASYNC_CONCURRENT_QUERIES', default=not TESTING, cast=bool)
+ASYNC_QUERY_WORKERS = config('ASYNC_QUERY_WORKERS', default=32, cast=int)
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates que mide el tiempo de render para Server-Timing (main.instrumentation)
+        'BACKEND': 'main.instrumentation.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -106,9 +135,153 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # WAL: las lecturas no bloquean a los escritores (workers en paralelo,
+                # iteradores abiertos) y cada escritura espera su turno sin fallar
+                'init_command': 'PRAGMA journal_mode=WAL;',
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+            },
+            # Base de tests en archivo (no en memoria): la caché compartida de SQLite
+            # en memoria devuelve "table is locked" a escritores concurrentes en vez
+            # de esperar, y los tests de concurrencia deben ver el mismo WAL que producción
+            'TEST': {
+                'NAME': BASE_DIR / 'test_db.sqlite3',
+            },
         }
     }
 
+# Reutilización de conexiones a PostgreSQL (cada conexión nueva a Supabase paga TCP + TLS).
+# Con DB_POOL cada worker usa el pool nativo de psycopg; si no, cada hilo conserva su
+# conexión DB_CONN_MAX_AGE segundos. Con ASGI cada petición corre en un hilo distinto y
+# las conexiones persistentes no se reutilizarían, así que allí el pool es lo habitual.
+# El servidor verá hasta WEB_CONCURRENCY * DB_POOL_MAX_SIZE conexiones.
+SERVER_MODE = config('SERVER_MODE', default='wsgi').lower()
+DB_POOL = config('DB_POOL', default=SERVER_MODE == 'asgi', cast=bool)
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=0 if SERVER_MODE == 'asgi' else 600, cast=int)
+DB_CONN_HEALTH_CHECKS = config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool)
+# Por defecto, una conexión por hilo de gunicorn (wsgi) o por hilo de consultas en paralelo (asgi)
+DB_POOL_MAX_SIZE = config(
+    'DB_POOL_MAX_SIZE',
+    default=ASYNC_QUERY_WORKERS if SERVER_MODE == 'asgi' else config('GUNICORN_THREADS', default=1, cast=int),
+    cast=int,
+)
+DB_POOL_MIN_SIZE = config('DB_POOL_MIN_SIZE', default=min(2, DB_POOL_MAX_SIZE), cast=int)
+# Segundos que una petición espera una conexión libre antes de fallar
+DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', default=10, cast=float)
+
+# Réplicas de lectura para las páginas públicas (main.db_router), separadas por comas.
+# Tras escribir, el cliente lee de la primaria durante REPLICA_STICKY_SECONDS
+DATABASE_REPLICAS = []
+replica_urls = config('DATABASE_REPLICA_URLS', default='', cast=lambda v: [url.strip() for url in v.split(',') if url.strip()])
+for number, url in enumerate(replica_urls):
+    import dj_database_url
+    DATABASES[f'replica_{number}'] = dj_database_url.parse(url)
+    DATABASE_REPLICAS.append(f'replica_{number}')
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=10, cast=int)
+DATABASE_ROUTERS = ['main.db_router.ReplicaRouter']
+
+if TESTING:
+    # Segunda base local para los tests del enrutado a réplicas; sólo se crea si
+    # un test la declara en ``databases``
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+        'TEST': {
+            'NAME': BASE_DIR / 'test_replica.sqlite3',
+        },
+    }
+
+for database in DATABASES.values():
+    if database['ENGINE'] != 'django.db.backends.postgresql':
+        continue
+    # Con pool, Django comprueba cada conexión al sacarla del pool
+    database['CONN_HEALTH_CHECKS'] = DB_CONN_HEALTH_CHECKS
+    if DB_POOL:
+        # Django no admite pool y CONN_MAX_AGE a la vez: el pool ya mantiene las conexiones
+        database['CONN_MAX_AGE'] = 0
+        database.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+        }
+    else:
+        database['CONN_MAX_AGE'] = DB_CONN_MAX_AGE
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Con varios workers la caché debe ser compartida (Redis) para que las
+# invalidaciones por señales lleguen a todos; sin REDIS_URL se usa memoria local
+if config('REDIS_URL', default=None):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': config('REDIS_URL'),
+            'KEY_PREFIX': 'djangocrug',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'djangocrug',
+        }
+    }
+
+# Tiempo máximo (segundos) de los bloques cacheados de la portada
+HOME_CACHE_TIMEOUT = config('HOME_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int)
+
+# Páginas públicas (main.http_cache.public_page): max-age para navegadores/CDN y
+# vida en la caché del servidor, cuya clave ya cambia con el contenido
+PAGE_CACHE_MAX_AGE = config('PAGE_CACHE_MAX_AGE', default=60, cast=int)
+PAGE_CACHE_TIMEOUT = config('PAGE_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int)
+
+# Tarjetas de los listados ({% cached_cards %}): la clave incluye la versión del
+# objeto, así que este tiempo sólo limita lo que ocupan las versiones antiguas
+CARD_CACHE_TIMEOUT = config('CARD_CACHE_TIMEOUT', default=60 * 60 * 24 * 7, cast=int)
+# Forma parte de la clave junto con el código de la plantilla y los estáticos: cada
+# despliegue (en Render, su commit) descarta las tarjetas de las versiones anteriores
+CARD_CACHE_VERSION = config('CARD_CACHE_VERSION', default=os.environ.get('RENDER_GIT_COMMIT', ''))
+
+
+# Email
+# https://docs.djangoproject.com/en/5.2/topics/email/
+
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = config('EMAIL_HOST', default='localhost')
+EMAIL_PORT = config('EMAIL_PORT', default=25, cast=int)
+EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
+EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
+EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=False, cast=bool)
+EMAIL_FILE_PATH = config('EMAIL_FILE_PATH', default=str(BASE_DIR / 'sent_emails'))
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='Club de Lectura ELIXIR <newsletter@elixir.com>')
+
+# Campañas de newsletter (main.newsletter): hilos de envío y tamaño de lote
+NEWSLETTER_WORKERS = config('NEWSLETTER_WORKERS', default=4, cast=int)
+NEWSLETTER_BATCH_SIZE = config('NEWSLETTER_BATCH_SIZE', default=500, cast=int)
+
+# Altas del newsletter con escritura diferida (main.subscriptions): se acumulan en
+# memoria y se escriben por lotes al llegar a NEWSLETTER_BUFFER_SIZE o tras
+# NEWSLETTER_BUFFER_DELAY segundos
+NEWSLETTER_WRITE_BEHIND = config('NEWSLETTER_WRITE_BEHIND', default=False, cast=bool)
+NEWSLETTER_BUFFER_SIZE = config('NEWSLETTER_BUFFER_SIZE', default=500, cast=int)
+NEWSLETTER_BUFFER_DELAY = config('NEWSLETTER_BUFFER_DELAY', default=2.0, cast=float)
+
+
+# Límite de POST por IP en los formularios públicos (main.throttling): 'N/s', 'N/m',
+# 'N/h' o 'N/d'; vacío desactiva. Los contadores viven en la caché por defecto
+# (compartidos entre workers con Redis; con LocMem cada proceso cuenta por su cuenta)
+THROTTLE_RATES = {
+    'suggest_book': config('THROTTLE_SUGGEST_BOOK', default='5/h'),
+    'join': config('THROTTLE_JOIN', default='5/h'),
+    'contact': config('THROTTLE_CONTACT', default='5/h'),
+    'newsletter_subscribe': config('THROTTLE_NEWSLETTER', default='10/h'),
+    'event_register': config('THROTTLE_EVENT_REGISTER', default='10/h'),
+}
+# Proxies de confianza delante de la app (Render: 1); con 0 se usa REMOTE_ADDR
+THROTTLE_PROXY_COUNT = config('THROTTLE_PROXY_COUNT', default=0, cast=int)
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -154,8 +327,55 @@ if os.path.exists(BASE_DIR / 'static'):
         BASE_DIR / 'static',
     ]
 
-# WhiteNoise configuration
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Hoja de estilos, fuentes de iconos y CSS crítico que genera build_assets (main.assets);
+# no se versionan y su parte estática se publica con collectstatic como el resto
+GENERATED_ASSETS_DIR = Path(config('GENERATED_ASSETS_DIR', default=str(BASE_DIR / 'generated')))
+STATICFILES_DIRS.append(GENERATED_ASSETS_DIR / 'static')
+
+# WhiteNoise: nombres con hash (caché inmutable) y versiones gzip/brotli generadas
+# en collectstatic. Django 5.1 ya no lee STATICFILES_STORAGE, sólo STORAGES. Los
+# tests no ejecutan collectstatic, así que usan el almacenamiento sin manifiesto
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if TESTING
+            else 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+        ),
+    },
+}
+
+# Variantes redimensionadas de las imágenes remotas (main.images), generadas con
+# build_image_variants y servidas por WhiteNoise con caché inmutable
+IMAGE_VARIANTS_ROOT = Path(config('IMAGE_VARIANTS_ROOT', default=str(BASE_DIR / 'media' / 'variants')))
+IMAGE_VARIANTS_URL = '/media/variants/'
+IMAGE_VARIANT_WIDTHS = config('IMAGE_VARIANT_WIDTHS', default='200,400,800', cast=lambda v: [int(w) for w in v.split(',')])
+IMAGE_VARIANT_QUALITY = config('IMAGE_VARIANT_QUALITY', default=80, cast=int)
+IMAGE_FETCH_TIMEOUT = config('IMAGE_FETCH_TIMEOUT', default=10, cast=int)
+IMAGE_MAX_BYTES = config('IMAGE_MAX_BYTES', default=10 * 1024 * 1024, cast=int)
+# Sólo para desarrollo: permite descargar imágenes de direcciones locales o privadas
+IMAGE_FETCH_ALLOW_PRIVATE = config('IMAGE_FETCH_ALLOW_PRIVATE', default=False, cast=bool)
+
+# Logging
+# https://docs.djangoproject.com/en/5.2/topics/logging/
+
+# Consultas lentas y repetidas (main.performance) a la salida de error, que Render recoge
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'main.performance': {
+            'handlers': ['console'],
+            'level': config('PERFORMANCE_LOG_LEVEL', default='ERROR' if TESTING else 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
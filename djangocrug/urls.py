@@ -14,10 +14,17 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
+from main.views import image_variant, metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Variantes de imágenes generadas después de arrancar (el resto las sirve WhiteNoise)
+    path(settings.IMAGE_VARIANTS_URL.lstrip('/') + '<str:name>', image_variant, name='image_variant'),
+    # Métricas de rendimiento para Prometheus (sólo staff o con METRICS_TOKEN)
+    path('metrics/', metrics, name='metrics'),
     path('', include('main.urls')),
 ]
@@ -0,0 +1,18 @@
+# Configuración de Gunicorn: `gunicorn -c gunicorn.conf.py`
+#
+# SERVER_MODE=wsgi (por defecto) usa workers síncronos con djangocrug.wsgi.
+# SERVER_MODE=asgi usa workers de uvicorn bajo gunicorn con djangocrug.asgi y
+# las vistas asíncronas de main.async_views.
+import os
+
+server_mode = os.environ.get('SERVER_MODE', 'wsgi').lower()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+
+if server_mode == 'asgi':
+    wsgi_app = 'djangocrug.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'djangocrug.wsgi:application'
+    threads = int(os.environ.get('GUNICORN_THREADS', '1'))
@@ -1,8 +1,11 @@
 from django.contrib import admin
+from .exports import ExportMixin
 from .models import (
-    Genre, Book, BookReview, Event, BlogPost, Member, 
-    BookSuggestion, Newsletter, Gallery
+    Genre, Book, BookReview, Event, EventRegistration, BlogPost, Member, 
+    BookSuggestion, Newsletter, Gallery, NewsletterCampaign, CampaignShard, CampaignFailure
 )
+from .recommendations import recommended_books
+from .registrations import cancel, fill_seats, notify
 
 @admin.register(Genre)
 class GenreAdmin(admin.ModelAdmin):
@@ -28,20 +31,23 @@ class BookAdmin(admin.ModelAdmin):
             'fields': ('reading_status', 'reading_start_date', 'reading_end_date')
         }),
         ('Calificación', {
-            'fields': ('average_rating',)
+            'fields': ('average_rating', 'rating_count')
         }),
     )
+    # Calculados a partir de las reseñas (ver main.ratings y recompute_ratings)
+    readonly_fields = ['average_rating', 'rating_count']
 
 @admin.register(BookReview)
 class BookReviewAdmin(admin.ModelAdmin):
     list_display = ['book', 'author_name', 'rating', 'is_featured', 'created_at']
+    list_select_related = ['book']
     list_filter = ['rating', 'is_featured', 'created_at']
     search_fields = ['book__title', 'author_name', 'review_text']
     date_hierarchy = 'created_at'
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
-    list_display = ['title', 'event_type', 'date', 'location', 'is_active']
+    list_display = ['title', 'event_type', 'date', 'location', 'max_participants', 'confirmed_count', 'waitlist_count', 'is_active']
     list_filter = ['event_type', 'is_active', 'date']
     search_fields = ['title', 'description', 'location']
     date_hierarchy = 'date'
@@ -54,13 +60,53 @@ class EventAdmin(admin.ModelAdmin):
             'fields': ('date', 'location', 'online_link')
         }),
         ('Detalles', {
-            'fields': ('book', 'max_participants', 'is_active')
+            'fields': ('book', 'max_participants', 'confirmed_count', 'waitlist_count', 'is_active')
         }),
     )
+    # Los mantienen las inscripciones (ver main.registrations)
+    readonly_fields = ['confirmed_count', 'waitlist_count']
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'max_participants' in form.changed_data:
+            # Con más aforo entra la lista de espera por orden de llegada
+            promoted = fill_seats(obj.pk)
+            if promoted:
+                notify(promoted, request.build_absolute_uri(obj.get_absolute_url()))
+                self.message_user(request, f"{len(promoted)} inscripciones pasan de la lista de espera a confirmadas.")
+
+@admin.register(EventRegistration)
+class EventRegistrationAdmin(ExportMixin, admin.ModelAdmin):
+    list_display = ['name', 'email', 'event', 'status', 'created_at']
+    list_select_related = ['event']
+    list_filter = ['status', 'event']
+    search_fields = ['name', 'email', 'event__title']
+    export_fields = ['event', 'name', 'email', 'status', 'created_at']
+    # El estado sólo cambia con cancel/fill_seats para que los contadores del evento cuadren
+    readonly_fields = ['event', 'status', 'token', 'created_at']
+    
+    actions = ['cancel_registrations'] + ExportMixin.actions
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+    
+    def cancel_registrations(self, request, queryset):
+        cancelled = 0
+        for token in queryset.values_list('token', flat=True):
+            registration, promoted = cancel(token)
+            if registration is not None:
+                cancelled += 1
+                notify(promoted, request.build_absolute_uri(registration.event.get_absolute_url()))
+        self.message_user(request, f"{cancelled} inscripciones canceladas.")
+    cancel_registrations.short_description = "Cancelar inscripciones seleccionadas"
 
 @admin.register(BlogPost)
 class BlogPostAdmin(admin.ModelAdmin):
     list_display = ['title', 'author_name', 'book', 'is_published', 'is_featured', 'created_at']
+    list_select_related = ['book']
     list_filter = ['is_published', 'is_featured', 'created_at', 'book']
     search_fields = ['title', 'author_name', 'content']
     date_hierarchy = 'created_at'
@@ -78,21 +124,30 @@ class BlogPostAdmin(admin.ModelAdmin):
     )
 
 @admin.register(Member)
-class MemberAdmin(admin.ModelAdmin):
+class MemberAdmin(ExportMixin, admin.ModelAdmin):
     list_display = ['name', 'email', 'join_date', 'is_active']
     list_filter = ['is_active', 'join_date', 'favorite_genres']
     search_fields = ['name', 'email', 'bio']
     filter_horizontal = ['favorite_genres']
     date_hierarchy = 'join_date'
+    export_fields = ['name', 'email', 'phone', 'bio', 'favorite_genres', 'join_date', 'is_active']
+    readonly_fields = ['recommendations']
+    
+    def recommendations(self, obj):
+        # Precalculadas con manage.py refresh_recommendations
+        books = recommended_books(obj.pk) if obj.pk else []
+        return ', '.join(str(book) for book in books) or '-'
+    recommendations.short_description = "Libros recomendados"
 
 @admin.register(BookSuggestion)
-class BookSuggestionAdmin(admin.ModelAdmin):
+class BookSuggestionAdmin(ExportMixin, admin.ModelAdmin):
     list_display = ['title', 'author', 'suggested_by_name', 'status', 'created_at']
     list_filter = ['status', 'created_at']
     search_fields = ['title', 'author', 'suggested_by_name', 'suggested_by_email']
     date_hierarchy = 'created_at'
+    export_fields = ['title', 'author', 'suggested_by_name', 'suggested_by_email', 'reason', 'status', 'created_at']
     
-    actions = ['approve_suggestions', 'reject_suggestions']
+    actions = ['approve_suggestions', 'reject_suggestions'] + ExportMixin.actions
     
     def approve_suggestions(self, request, queryset):
         queryset.update(status='approved')
@@ -105,15 +160,40 @@ class BookSuggestionAdmin(admin.ModelAdmin):
     reject_suggestions.short_description = "Rechazar sugerencias seleccionadas"
 
 @admin.register(Newsletter)
-class NewsletterAdmin(admin.ModelAdmin):
+class NewsletterAdmin(ExportMixin, admin.ModelAdmin):
     list_display = ['email', 'name', 'subscribed_at', 'is_active']
     list_filter = ['is_active', 'subscribed_at']
     search_fields = ['email', 'name']
     date_hierarchy = 'subscribed_at'
+    export_fields = ['email', 'name', 'subscribed_at', 'is_active']
 
 @admin.register(Gallery)
 class GalleryAdmin(admin.ModelAdmin):
     list_display = ['title', 'event', 'is_featured', 'upload_date']
+    list_select_related = ['event']
     list_filter = ['is_featured', 'upload_date', 'event']
     search_fields = ['title', 'description']
     date_hierarchy = 'upload_date'
+
+class CampaignShardInline(admin.TabularInline):
+    model = CampaignShard
+    extra = 0
+    can_delete = False
+    readonly_fields = ['index', 'last_subscriber_id', 'sent_count', 'failed_count', 'finished_at']
+
+@admin.register(NewsletterCampaign)
+class NewsletterCampaignAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'status', 'created_at', 'started_at', 'finished_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['subject']
+    readonly_fields = ['status', 'workers', 'started_at', 'finished_at']
+    inlines = [CampaignShardInline]
+    # El envío se lanza fuera de la petición: python manage.py send_campaign <id>
+
+@admin.register(CampaignFailure)
+class CampaignFailureAdmin(admin.ModelAdmin):
+    list_display = ['email', 'campaign', 'error', 'created_at']
+    list_select_related = ['campaign']
+    list_filter = ['campaign']
+    search_fields = ['email', 'error']
+    raw_id_fields = ['subscriber']
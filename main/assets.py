@@ -0,0 +1,381 @@
+"""
+Construcción de la hoja de estilos del sitio (``build_assets``).
+
+Une Bootstrap, Font Awesome (copias en ``assets/vendor``) y ``assets/css/site.css``
+en ``main/css/elixir.css`` quitando las reglas cuyas clases no aparecen en
+ninguna plantilla, script o formulario; las fuentes de iconos se recortan a los
+iconos usados. La parte que necesita el esqueleto de la página (``base.html``)
+se escribe además en ``critical.css``, que la etiqueta ``{% critical_css %}``
+incluye en línea; el resto se carga sin bloquear el primer pintado.
+
+Todo se escribe en ``GENERATED_ASSETS_DIR`` (su carpeta ``static`` está en
+``STATICFILES_DIRS``), fuera del código: no se versiona, se genera en el build
+antes de ``collectstatic`` y un aviso de ``manage.py check`` recuerda
+generarlo. Sin el CSS crítico las páginas se muestran igual, sólo sin estilos
+hasta que llega la hoja completa.
+
+El recorte es conservador: un selector se conserva si todas sus clases (fuera de
+``:not(...)``) aparecen como palabra en alguna fuente, igual que hace PurgeCSS.
+"""
+import gzip
+import re
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core import checks
+
+APP_DIR = Path(__file__).resolve().parent
+VENDOR_DIR = settings.BASE_DIR / 'assets' / 'vendor'
+SOURCES = [
+    VENDOR_DIR / 'bootstrap-5.1.3' / 'bootstrap.min.css',
+    VENDOR_DIR / 'fontawesome-6.0.0' / 'all.min.css',
+    settings.BASE_DIR / 'assets' / 'css' / 'site.css',
+]
+FONTS_DIR = VENDOR_DIR / 'fontawesome-6.0.0' / 'webfonts'
+FONTS = ['fa-solid-900', 'fa-regular-400', 'fa-brands-400']
+STATIC_DIR = APP_DIR / 'static' / 'main'
+SHELL_TEMPLATE = APP_DIR / 'templates' / 'main' / 'base.html'
+# Archivos generados, relativos a GENERATED_ASSETS_DIR
+BUNDLE = 'static/main/css/elixir.css'
+CRITICAL = 'critical.css'
+OUTPUTS = [BUNDLE, CRITICAL] + [f'static/main/webfonts/{name}.woff2' for name in FONTS]
+
+# Clases que sólo añade el JavaScript de Bootstrap o que se montan en la plantilla
+SAFELIST = {
+    'show', 'showing', 'hiding', 'collapsing', 'collapsed', 'fade', 'active', 'disabled',
+    'dropdown-menu-end', 'dropdown-menu-start', 'was-validated', 'is-valid', 'is-invalid',
+    # alert-{{ message.tags }}
+    'alert-success', 'alert-info', 'alert-warning', 'alert-danger', 'alert-error', 'alert-debug',
+}
+
+COMMENT_RE = re.compile(r'/\*(?!!).*?\*/', re.S)
+LICENSE_RE = re.compile(r'/\*!.*?\*/', re.S)
+TOKEN_RE = re.compile(r'[A-Za-z0-9_-]+')
+CLASS_RE = re.compile(r'\.(-?[_a-zA-Z][\w-]*)')
+NOT_RE = re.compile(r':not\([^)]*\)')
+INLINE_RE = re.compile(r'<(style|script)\b[^>]*>(.*?)</\1>', re.S)
+ICON_RE = re.compile(r'content:\s*"\\(f[0-9a-f]{3})"')
+NESTED_AT_RULES = ('@media', '@supports', '@layer', '@document')
+# Estados que no existen en el primer pintado: se quedan fuera del CSS crítico
+INTERACTIVE_RE = re.compile(
+    r':(hover|focus|focus-visible|focus-within|active|visited|checked|disabled|valid|invalid)\b'
+    r'|::?(-webkit-|-moz-|file-selector-button|placeholder)|\.(is-valid|is-invalid|was-validated|show)\b'
+)
+# Rejilla y tipografía: fuera de la cabecera también se incluyen para que el
+# contenido no salte al llegar la hoja completa
+GRID_RE = re.compile(r'(container|row|col|g-\d|gx-\d|gy-\d)(-[\w-]+)?')
+CRITICAL_ELEMENTS = {'html', 'body', 'main', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'img', 'svg'}
+ELEMENT_RE = re.compile(r'(?:^|[\s>+~(])([a-z][a-z0-9]*)')
+
+
+def content_files():
+    """Plantillas, scripts y formularios donde se buscan las clases usadas"""
+    yield from (APP_DIR / 'templates').rglob('*.html')
+    yield from (STATIC_DIR / 'js').glob('*.js')
+    yield APP_DIR / 'forms.py'
+    yield APP_DIR / 'templatetags' / 'images.py'
+
+
+def used_tokens(paths):
+    tokens = set(SAFELIST)
+    for path in paths:
+        tokens.update(TOKEN_RE.findall(Path(path).read_text(encoding='utf-8')))
+    return tokens
+
+
+def above_the_fold_tokens(tokens):
+    """Clases y etiquetas de la cabecera de ``base.html`` (hasta el contenido) y de la rejilla"""
+    shell = SHELL_TEMPLATE.read_text(encoding='utf-8')
+    header = shell[:shell.index('{% block content %}')]
+    return set(TOKEN_RE.findall(header)) | CRITICAL_ELEMENTS | {token for token in tokens if GRID_RE.fullmatch(token)}
+
+
+def _scan(css, i, stops):
+    """Índice del primer carácter de ``stops`` fuera de comillas y paréntesis"""
+    depth, quote = 0, None
+    while i < len(css):
+        char = css[i]
+        if quote:
+            if char == '\\':
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif depth == 0 and char in stops:
+            return i
+        i += 1
+    return i
+
+
+def _block_end(css, start):
+    """Índice de la llave que cierra la que abre en ``start``"""
+    depth, i = 0, start
+    while True:
+        i = _scan(css, i, '{}')
+        if i >= len(css):
+            raise ValueError('CSS sin cerrar')
+        depth += 1 if css[i] == '{' else -1
+        if depth == 0:
+            return i
+        i += 1
+
+
+def parse_css(css):
+    """
+    Lista de nodos ``(tipo, preludio, contenido)``: 'rule' (selector y
+    declaraciones), 'group' (@media/@supports con nodos hijos) o 'statement'
+    (@charset, @import). @font-face y @keyframes son reglas opacas.
+    """
+    return _parse_nodes(COMMENT_RE.sub('', LICENSE_RE.sub('', css)), 0)[0]
+
+
+def _parse_nodes(css, i):
+    nodes = []
+    while True:
+        while i < len(css) and css[i].isspace():
+            i += 1
+        if i >= len(css) or css[i] == '}':
+            return nodes, i + 1
+        end = _scan(css, i, '{;')
+        prelude = ' '.join(css[i:end].split())
+        if end >= len(css) or css[end] == ';':
+            nodes.append(('statement', prelude, None))
+            i = end + 1
+        elif prelude.lower().startswith(NESTED_AT_RULES):
+            children, i = _parse_nodes(css, end + 1)
+            nodes.append(('group', prelude, children))
+        else:
+            close = _block_end(css, end)
+            nodes.append(('rule', prelude, css[end + 1:close]))
+            i = close + 1
+
+
+def split_selectors(prelude):
+    selectors, start = [], 0
+    while start < len(prelude):
+        end = _scan(prelude, start, ',')
+        selectors.append(prelude[start:end].strip())
+        start = end + 1
+    return selectors
+
+
+def selector_used(selector, tokens, critical=False):
+    selector = NOT_RE.sub('', selector)
+    if critical:
+        # Sin estados interactivos y sólo etiquetas presentes en la cabecera
+        plain = re.sub(r'\[[^\]]*\]|::?[\w-]+|[.#][\w-]+', ' ', selector)
+        if INTERACTIVE_RE.search(selector) or not all(tag in tokens for tag in ELEMENT_RE.findall(plain)):
+            return False
+    return all(name in tokens for name in CLASS_RE.findall(selector))
+
+
+def prune(nodes, tokens, critical=False):
+    """Nodos sin los selectores que no usa ninguna fuente (ni grupos vacíos)"""
+    kept = []
+    for kind, prelude, content in nodes:
+        if kind == 'group':
+            children = prune(content, tokens, critical)
+            if children:
+                kept.append((kind, prelude, children))
+        elif kind == 'rule' and not prelude.startswith('@'):
+            selectors = [s for s in split_selectors(prelude) if selector_used(s, tokens, critical)]
+            if selectors:
+                kept.append((kind, ','.join(selectors), content))
+        else:
+            kept.append((kind, prelude, content))
+    return _drop_unused_keyframes(kept)
+
+
+def _walk(nodes):
+    for node in nodes:
+        yield node
+        if node[0] == 'group':
+            yield from _walk(node[2])
+
+
+def _drop_unused_keyframes(nodes):
+    bodies = ' '.join(content for kind, prelude, content in _walk(nodes) if kind == 'rule' and not prelude.startswith('@'))
+    return [
+        node for node in nodes
+        if not re.match(r'@(-webkit-)?keyframes ', node[1]) or node[1].split()[1] in bodies
+    ]
+
+
+def drop_unused_properties(css):
+    """Quita las variables ``--x`` de ``:root`` que no se leen con ``var(--x)``"""
+    declared = re.compile(r'(?<=[{;])(--[\w-]+):[^;}]*;?')
+    while True:
+        used = set(re.findall(r'var\((--[\w-]+)', css))
+        pruned = declared.sub(lambda match: match.group(0) if match.group(1) in used else '', css)
+        if pruned == css:
+            return re.sub(r';}', '}', pruned)
+        # Quitar una variable puede dejar sin uso otra a la que ella hacía referencia
+        css = pruned
+
+
+def minify_body(body):
+    declarations = [part.strip() for part in _split_declarations(body) if part.strip()]
+    return ';'.join(re.sub(r'\s*:\s*', ':', ' '.join(d.split()), count=1) for d in declarations)
+
+
+def _split_declarations(body):
+    start = 0
+    while start < len(body):
+        end = _scan(body, start, ';')
+        yield body[start:end]
+        start = end + 1
+
+
+def serialize(nodes, minify=False):
+    out = []
+    for kind, prelude, content in nodes:
+        if kind == 'statement':
+            out.append(prelude + ';')
+        elif kind == 'group':
+            out.append(prelude + '{' + serialize(content, minify) + '}')
+        else:
+            if minify:
+                prelude = ','.join(split_selectors(prelude))
+                content = minify_body(content)
+            out.append(prelude + '{' + content + '}')
+    return ''.join(out)
+
+
+def _font_awesome(nodes):
+    """Sólo las @font-face de FA 6 (sin las de compatibilidad v4/v5) y sólo woff2"""
+    kept = []
+    for kind, prelude, content in nodes:
+        if prelude == '@font-face':
+            if 'Font Awesome 6' not in content:
+                continue
+            content = re.sub(r',url\([^)]*\.ttf\) format\("truetype"\)', '', content)
+        kept.append((kind, prelude, content))
+    return kept
+
+
+def load_sources():
+    """Nodos de cada fuente y sus cabeceras de licencia (``/*! ... */``)"""
+    sheets, licenses = [], []
+    for path in SOURCES:
+        css = path.read_text(encoding='utf-8')
+        licenses.extend(LICENSE_RE.findall(css))
+        nodes = [node for node in parse_css(css) if node[0] != 'statement']
+        if 'fontawesome' in path.parent.name:
+            nodes = _font_awesome(nodes)
+        sheets.append((path, nodes))
+    return sheets, licenses
+
+
+def used_icons(css):
+    return sorted({int(code, 16) for code in ICON_RE.findall(css)})
+
+
+def subset_font(source, codepoints):
+    """Convierte ``source`` (ttf) a woff2 con sólo los glifos de ``codepoints``"""
+    from fontTools import subset
+
+    options = subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = ['*']
+    font = subset.load_font(str(source), options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    stream = BytesIO()
+    subset.save_font(font, stream, options)
+    return stream.getvalue()
+
+
+def build():
+    """
+    Genera la hoja, el CSS crítico y las fuentes recortadas.
+
+    Devuelve ``{nombre en OUTPUTS: contenido}`` sin escribir nada, para que el
+    comando pueda comprobar si los archivos están al día.
+    """
+    tokens = used_tokens(content_files())
+    critical_tokens = above_the_fold_tokens(tokens)
+    sheets, licenses = load_sources()
+
+    bundle_parts, critical_parts = [], []
+    for path, nodes in sheets:
+        own = path.parent.name == 'css'
+        bundle_parts.append(serialize(prune(nodes, tokens), minify=own))
+        # Los iconos no son críticos: sin su fuente sólo mostrarían cuadros vacíos
+        if 'fontawesome' not in path.parent.name:
+            critical_parts.append(serialize(prune(nodes, critical_tokens, critical=True), minify=own))
+    bundle = '@charset "UTF-8";' + ''.join(licenses) + ''.join(bundle_parts) + '\n'
+
+    critical = drop_unused_properties(''.join(critical_parts))
+
+    outputs = {
+        BUNDLE: bundle.encode('utf-8'),
+        CRITICAL: critical.encode('utf-8'),
+    }
+    codepoints = used_icons(bundle)
+    for name in FONTS:
+        outputs[f'static/main/webfonts/{name}.woff2'] = subset_font(FONTS_DIR / f'{name}.ttf', codepoints)
+    return outputs
+
+
+def output_path(name):
+    """Ruta de un archivo generado en ``GENERATED_ASSETS_DIR``"""
+    return Path(settings.GENERATED_ASSETS_DIR) / name
+
+
+@lru_cache(maxsize=4)
+def _read_critical(path, mtime):
+    return path.read_text(encoding='utf-8')
+
+
+def critical_css():
+    """CSS crítico generado, o ``''`` si falta (se relee sólo cuando cambia el archivo)"""
+    path = output_path(CRITICAL)
+    try:
+        return _read_critical(path, path.stat().st_mtime_ns)
+    except FileNotFoundError:
+        return ''
+
+
+def check_outputs(app_configs=None, **kwargs):
+    """Aviso de ``manage.py check`` si faltan archivos generados (sin ellos las páginas salen sin estilos)"""
+    missing = [Path(name).name for name in OUTPUTS if not output_path(name).exists()]
+    if not missing:
+        return []
+    return [checks.Warning(
+        f'Faltan archivos generados: {", ".join(missing)}',
+        hint='Ejecuta python manage.py build_assets',
+        id='main.W001',
+    )]
+
+
+def sizes(data):
+    """Tamaño sin comprimir y con gzip (nivel 9, como WhiteNoise)"""
+    return len(data), len(gzip.compress(data, 9))
+
+
+def page_weights(paths):
+    """
+    Bytes de cada página: HTML sin comprimir, con gzip y la parte que son
+    ``<style>``/``<script>`` en línea (se reenvían en cada respuesta).
+    """
+    from django.test import Client
+
+    client = Client(HTTP_HOST='localhost')
+    weights = {}
+    for path in paths:
+        response = client.get(path, secure=True)
+        if response.status_code != 200 or not response['Content-Type'].startswith('text/html'):
+            continue
+        html = response.content
+        raw, compressed = sizes(html)
+        inline = sum(len(match.group(2).encode('utf-8')) for match in INLINE_RE.finditer(html.decode('utf-8')))
+        weights[path] = {'html': raw, 'html_gzip': compressed, 'inline': inline}
+    return weights
@@ -0,0 +1,100 @@
+"""
+Versiones asíncronas de las vistas de lectura con consultas independientes.
+
+Se usan cuando la aplicación se sirve por ASGI (``ASYNC_VIEWS``, ver
+djangocrug/asgi.py). Cada vista lanza a la vez las consultas que no dependen
+unas de otras mediante ``gather_queries`` y renderiza con los mismos datos y
+plantillas que su equivalente en views.py.
+"""
+from asgiref.sync import sync_to_async
+from django.shortcuts import render
+from django.utils import timezone
+
+from .caching import aget_home_blocks
+from .concurrency import gather_queries
+from .http_cache import latest_started_event, public_page
+from .models import Book, BlogPost, Event, Gallery, Genre
+from .pagination import KeysetPaginator
+from .query_budget import query_budget
+from .views import event_lists, library_books
+
+
+async def arender(request, template_name, context):
+    # La plantilla puede tocar relaciones perezosas: se renderiza en un hilo
+    return await sync_to_async(render)(request, template_name, context)
+
+
+@query_budget(6)
+@public_page(Book, Event, BlogPost, extra_sources=[latest_started_event])
+async def home(request):
+    """Vista principal de la aplicación (asíncrona)"""
+    try:
+        context = await aget_home_blocks()
+    except Exception as e:
+        # Si hay error con la base de datos, mostrar página básica
+        context = {
+            'current_book': None,
+            'upcoming_events': [],
+            'featured_posts': [],
+            'featured_quote': None,
+            'db_error': str(e)
+        }
+    return await arender(request, 'main/home.html', context)
+
+
+@query_budget(3)
+@public_page(Event, Book, extra_sources=[latest_started_event])
+async def events(request):
+    """Vista de eventos y actividades (asíncrona)"""
+    upcoming_events, past_events = event_lists(timezone.now())
+    upcoming_events, past_events = await gather_queries(
+        lambda: list(upcoming_events),
+        lambda: list(past_events),
+    )
+    context = {
+        'upcoming_events': upcoming_events,
+        'past_events': past_events,
+    }
+    return await arender(request, 'main/events.html', context)
+
+
+@query_budget(5)
+@public_page(Book, Genre)
+async def library(request):
+    """Vista de biblioteca recomendada (asíncrona)"""
+    genre_filter = request.GET.get('genre')
+    search_query = request.GET.get('search')
+
+    books, ordering = await sync_to_async(library_books)(genre_filter, search_query)
+    paginator = KeysetPaginator(books, 12, ordering, count='approximate')
+    genres, page_obj, _ = await gather_queries(
+        lambda: list(Genre.objects.all()),
+        lambda: paginator.get_page(request.GET.get('cursor')),
+        lambda: paginator.count,
+    )
+
+    context = {
+        'page_obj': page_obj,
+        'genres': genres,
+        'current_genre': genre_filter,
+        'search_query': search_query,
+    }
+    return await arender(request, 'main/library.html', context)
+
+
+@query_budget(3)
+@public_page(Gallery, Event)
+async def gallery(request):
+    """Vista de galería (asíncrona)"""
+    images = Gallery.objects.all().order_by('-upload_date').select_related('event')
+    paginator = KeysetPaginator(images, 12, ('-upload_date', '-id'))
+    featured_images, page_obj = await gather_queries(
+        lambda: list(images.filter(is_featured=True)[:6]),
+        lambda: paginator.get_page(request.GET.get('cursor')),
+    )
+
+    context = {
+        'page_obj': page_obj,
+        'featured_images': featured_images,
+    }
+    return await arender(request, 'main/gallery.html', context)
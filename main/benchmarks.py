@@ -0,0 +1,531 @@
+import itertools
+import random
+import socket
+import socketserver
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import BlogPost, Book, BookReview, BookSuggestion, Event, Gallery, Genre, Member
+
+GENRE_NAMES = [
+    'Ficción', 'No Ficción', 'Misterio', 'Romance', 'Ciencia Ficción',
+    'Fantasía', 'Biografía', 'Historia', 'Filosofía', 'Poesía',
+]
+
+AUTHORS = [
+    'Gabriel García Márquez', 'Isabel Allende', 'Jorge Luis Borges', 'Julio Cortázar',
+    'Mario Vargas Llosa', 'Pablo Neruda', 'Gabriela Mistral', 'Octavio Paz',
+    'Juan Rulfo', 'Elena Poniatowska', 'Roberto Bolaño', 'Laura Esquivel',
+    'Carlos Fuentes', 'Rosario Castellanos', 'José Donoso', 'María Luisa Bombal',
+]
+
+WORDS = [
+    'amor', 'soledad', 'tiempo', 'memoria', 'ciudad', 'río', 'montaña', 'sueño',
+    'corazón', 'guerra', 'silencio', 'jardín', 'noche', 'camino', 'espejo', 'historia',
+    'canción', 'pájaro', 'isla', 'fuego', 'días', 'años', 'sombra', 'océano',
+    'laberinto', 'casa', 'espíritus', 'rayuela', 'pedro', 'páramo', 'lluvia', 'invierno',
+]
+
+
+def seed_genres():
+    """Crea (si faltan) los géneros base y devuelve la lista completa"""
+    Genre.objects.bulk_create([Genre(name=name) for name in GENRE_NAMES], ignore_conflicts=True)
+    return list(Genre.objects.filter(name__in=GENRE_NAMES))
+
+
+def seed_books(count, batch_size=5000, seed=0, reading_status='completed', offset=0):
+    """Inserta ``count`` libros con géneros usando bulk_create y devuelve sus ids"""
+    rng = random.Random(seed)
+    genres = seed_genres()
+    through = Book.genres.through
+    today = date.today()
+    book_ids = []
+
+    for start in range(0, count, batch_size):
+        books = []
+        for n in range(start, min(start + batch_size, count)):
+            title_words = rng.sample(WORDS, rng.randint(2, 4))
+            books.append(Book(
+                title=' '.join(title_words).capitalize(),
+                author=rng.choice(AUTHORS),
+                isbn='978%010d' % (offset + n),
+                publication_year=rng.randint(1900, 2024),
+                synopsis=' '.join(rng.choice(WORDS) for _ in range(40)).capitalize() + '.',
+                reading_status=reading_status,
+                reading_end_date=today - timedelta(days=rng.randint(0, 3650)),
+                average_rating=round(rng.uniform(1, 5), 2),
+            ))
+        created = Book.objects.bulk_create(books)
+        links = [
+            through(book_id=book.pk, genre_id=genre.pk)
+            for book in created
+            for genre in rng.sample(genres, rng.randint(1, 3))
+        ]
+        through.objects.bulk_create(links)
+        book_ids.extend(book.pk for book in created)
+
+    return book_ids
+
+
+def seed_site(events=30, posts=30, images=40, seed=0):
+    """
+    Contenido del resto de páginas: lectura actual, eventos próximos y pasados,
+    entradas publicadas (algunas destacadas) e imágenes de galería.
+    Devuelve los ids creados por modelo para poder borrarlos después.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    current = Book.objects.create(
+        title='Cien años de soledad', author=AUTHORS[0], synopsis=' '.join(WORDS), reading_status='current',
+    )
+    current.genres.set(seed_genres()[:3])
+    created_events = Event.objects.bulk_create([
+        Event(
+            title=f'Encuentro {n}', description='Conversación sobre la lectura del mes.',
+            date=now + timedelta(days=n - events // 2, hours=1), location='Biblioteca', book=current,
+        )
+        for n in range(events)
+    ])
+    created_posts = BlogPost.objects.bulk_create([
+        BlogPost(
+            title=f'Reflexión {n}', author_name=rng.choice(AUTHORS), book=current,
+            content=' '.join(rng.choice(WORDS) for _ in range(200)),
+            featured_quote=' '.join(rng.sample(WORDS, 8)) if n % 5 == 0 else '',
+            is_featured=n % 7 == 0,
+        )
+        for n in range(posts)
+    ])
+    created_images = Gallery.objects.bulk_create([
+        Gallery(
+            title=f'Foto {n}', image_url=f'https://example.com/fotos/{n}.jpg',
+            event=rng.choice(created_events), is_featured=n % 4 == 0,
+        )
+        for n in range(images)
+    ])
+    return {
+        Book: [current.pk],
+        Event: [event.pk for event in created_events],
+        BlogPost: [post.pk for post in created_posts],
+        Gallery: [image.pk for image in created_images],
+    }
+
+
+def seed_reviews(book_ids, per_book, batch_size=5000, seed=0):
+    """Entre 0 y ``2 * per_book`` reseñas por libro (de media ``per_book``); devuelve cuántas creó"""
+    rng = random.Random(seed)
+    total = 0
+    for start in range(0, len(book_ids), batch_size):
+        reviews = [
+            BookReview(
+                book_id=book_id, author_name=rng.choice(AUTHORS), rating=rng.randint(1, 5),
+                review_text=' '.join(rng.choice(WORDS) for _ in range(30)).capitalize() + '.',
+                is_featured=rng.random() < 0.05,
+            )
+            for book_id in book_ids[start:start + batch_size]
+            for _ in range(rng.randint(0, 2 * per_book))
+        ]
+        BookReview.objects.bulk_create(reviews, batch_size=batch_size)
+        total += len(reviews)
+    return total
+
+
+def seed_members(count, batch_size=5000, seed=0):
+    """Inserta ``count`` miembros con sus géneros favoritos y devuelve sus ids"""
+    rng = random.Random(seed)
+    genres = seed_genres()
+    through = Member.favorite_genres.through
+    member_ids = []
+    for start in range(0, count, batch_size):
+        created = Member.objects.bulk_create([
+            Member(
+                name=f'{rng.choice(AUTHORS).split()[0]} {n}', email=f'miembro{n}@example.com',
+                bio=' '.join(rng.sample(WORDS, 12)).capitalize() + '.', is_active=rng.random() < 0.9,
+            )
+            for n in range(start, min(start + batch_size, count))
+        ])
+        through.objects.bulk_create([
+            through(member_id=member.pk, genre_id=genre.pk)
+            for member in created
+            for genre in rng.sample(genres, rng.randint(1, 4))
+        ])
+        member_ids.extend(member.pk for member in created)
+    return member_ids
+
+
+def seed_suggestions(count, seed=0):
+    """Sugerencias de libros en los tres estados y devuelve sus ids"""
+    rng = random.Random(seed)
+    created = BookSuggestion.objects.bulk_create([
+        BookSuggestion(
+            title=' '.join(rng.sample(WORDS, 3)).capitalize(), author=rng.choice(AUTHORS),
+            suggested_by_name=f'Lector {n}', suggested_by_email=f'lector{n}@example.com',
+            reason=' '.join(rng.choice(WORDS) for _ in range(20)).capitalize() + '.',
+            status=rng.choice(['pending', 'approved', 'rejected']),
+        )
+        for n in range(count)
+    ])
+    return [suggestion.pk for suggestion in created]
+
+
+_latency = {'seconds': 0.0}
+
+
+def public_paths():
+    """
+    Una URL por cada ruta pública de ``main.urls`` (las de detalle con el primer
+    objeto que exista), en el orden en que se declaran.
+    """
+    from . import urls
+
+    event = Event.objects.order_by('pk').first()
+    # El feed de un libro, con el primero que tenga reflexiones
+    book = Book.objects.filter(blogpost__isnull=False).order_by('pk').first()
+    detail_objects = {
+        'event_detail': event,
+        'event_ics': event,
+        'blog_detail': BlogPost.objects.order_by('pk').first(),
+        'book_blog_rss': book,
+        'book_blog_atom': book,
+    }
+    paths = []
+    for pattern in urls.urlpatterns:
+        name = f'{urls.app_name}:{pattern.name}'
+        if 'pk' in pattern.pattern.converters:
+            if detail_objects.get(pattern.name):
+                paths.append(reverse(name, kwargs={'pk': detail_objects[pattern.name].pk}))
+        else:
+            paths.append(reverse(name))
+    return paths
+
+
+def admin_paths():
+    """El listado del admin de cada modelo registrado"""
+    from django.contrib import admin
+
+    return sorted(
+        reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+        for model in admin.site._registry
+    )
+
+
+def run_requests(paths, total, concurrency, warmup=0, cookies=None):
+    """
+    ``total`` peticiones GET a ``paths`` (en turno) repartidas entre ``concurrency``
+    hilos, cada una por el manejador WSGI completo (abre y cierra o devuelve la
+    conexión como gunicorn). Devuelve ``([(ruta, segundos, consultas)], duración)``;
+    las ``warmup`` primeras no cuentan.
+    """
+    handler = WSGIHandler()
+    factory = RequestFactory()
+    if cookies:
+        factory.cookies.update(cookies)
+    counter = itertools.count()
+    results, spans, errors = [], [], []
+    lock = threading.Lock()
+
+    def worker():
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count))
+            while not errors and (n := next(counter)) < total + warmup:
+                path = paths[n % len(paths)]
+                queries[0] = 0
+                started = time.perf_counter()
+                response = handler(factory.get(path, secure=True).environ, lambda status, headers: None)
+                b''.join(response)
+                # request_finished: cierra la conexión, la conserva o la devuelve al pool
+                response.close()
+                finished = time.perf_counter()
+                with lock:
+                    if response.status_code >= 400:
+                        errors.append(f'{path} respondió {response.status_code}')
+                    elif n >= warmup:
+                        results.append((path, finished - started, queries[0]))
+                        spans.append((started, finished))
+        connections.close_all()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise RuntimeError(errors[0])
+    # El calentamiento (abrir conexiones, llenar el pool o la caché) no cuenta para el rendimiento
+    wall = max(end for _, end in spans) - min(start for start, _ in spans)
+    return results, wall
+
+
+def _sleep_before_query(execute, sql, params, many, context):
+    if _latency['seconds']:
+        time.sleep(_latency['seconds'])
+    return execute(sql, params, many, context)
+
+
+def _install_latency(sender, connection, **kwargs):
+    if _sleep_before_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_sleep_before_query)
+
+
+@contextmanager
+def simulated_latency(seconds):
+    """
+    Simula una base de datos lenta: cada consulta espera ``seconds`` antes de ejecutarse.
+
+    Se aplica a las conexiones ya abiertas en este hilo y a todas las que se
+    abran mientras dure el bloque, en cualquier hilo.
+    """
+    connection_created.connect(_install_latency)
+    for connection in connections.all(initialized_only=True):
+        _install_latency(None, connection)
+    _latency['seconds'] = seconds
+    try:
+        yield
+    finally:
+        _latency['seconds'] = 0.0
+        connection_created.disconnect(_install_latency)
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply('220 localhost SMTP de pruebas')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250 localhost')
+            elif command.startswith('RCPT') and server.reject and server.reject in command.lower():
+                self.reply('550 Buzón no disponible')
+            elif command == 'DATA':
+                self.reply('354 Fin con <CRLF>.<CRLF>')
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                with server.lock:
+                    server.messages += 1
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Adiós')
+                return
+            else:
+                # MAIL, RCPT, RSET, NOOP
+                self.reply('250 OK')
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """
+    Servidor SMTP mínimo en un puerto local que descarta los mensajes.
+
+    Cuenta conexiones y mensajes aceptados; rechaza (550) los destinatarios que
+    contienen ``reject``. Se usa como contexto y expone ``host`` y ``port``.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, reject=None):
+        super().__init__(('127.0.0.1', 0), _SMTPHandler)
+        self.reject = reject
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = 0
+        self.host, self.port = self.server_address
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+class _ImageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests.append(self.path)
+        body = self.server.files.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalImageServer(ThreadingHTTPServer):
+    """
+    Servidor HTTP en un puerto local que sirve ``files`` (ruta -> bytes), en
+    lugar de los hosts de imágenes reales. Registra las rutas pedidas en
+    ``requests``; ``url(path)`` da la URL completa. Se usa como contexto.
+    """
+    daemon_threads = True
+
+    def __init__(self, files):
+        super().__init__(('127.0.0.1', 0), _ImageHandler)
+        self.files = files
+        self.lock = threading.Lock()
+        self.requests = []
+
+    def url(self, path):
+        return f'http://127.0.0.1:{self.server_address[1]}{path}'
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+class _ProxyHandler(socketserver.BaseRequestHandler):
+    def pump(self, source, target):
+        try:
+            while chunk := source.recv(65536):
+                time.sleep(self.server.delay)
+                target.sendall(chunk)
+        except OSError:
+            pass
+        finally:
+            for sock in (source, target):
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def handle(self):
+        with self.server.lock:
+            self.server.connections += 1
+        upstream = socket.create_connection(self.server.target)
+        with upstream:
+            upstream.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            reply = threading.Thread(target=self.pump, args=(upstream, self.request), daemon=True)
+            reply.start()
+            self.pump(self.request, upstream)
+            reply.join()
+
+
+class LatencyProxy(socketserver.ThreadingTCPServer):
+    """
+    Proxy TCP en un puerto local hacia ``target`` (host, puerto) que retrasa
+    cada envío ``rtt / 2`` segundos en cada sentido, como una base de datos
+    remota. Al ir por debajo del protocolo, el arranque de la conexión
+    (incluido TLS) paga varios viajes de ida y vuelta, igual que en producción.
+    Cuenta las conexiones aceptadas; se usa como contexto.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, target, rtt):
+        super().__init__(('127.0.0.1', 0), _ProxyHandler)
+        self.target = target
+        self.delay = rtt / 2
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.host, self.port = self.server_address
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+@contextmanager
+def database_settings(**overrides):
+    """
+    Sustituye la configuración de la base de datos ``default`` mientras dure el
+    bloque (p. ej. otro HOST/PORT, CONN_MAX_AGE u OPTIONS['pool']).
+
+    Cierra la conexión y el pool del hilo actual al entrar y al salir; los demás
+    hilos deben cerrar las suyas antes de que termine el bloque.
+    """
+    def reset():
+        connection = connections['default']
+        connection.close()
+        if getattr(connection, 'pool', None):
+            connection.close_pool()
+        del connections['default']
+
+    original = connections.settings['default']
+    reset()
+    connections.settings['default'] = {**original, **overrides}
+    try:
+        yield
+    finally:
+        reset()
+        connections.settings['default'] = original
+
+
+def measure(function, repeat=10, warmup=1):
+    """Ejecuta ``function`` varias veces y devuelve los tiempos en segundos"""
+    for _ in range(warmup):
+        function()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    """Resumen en milisegundos: p50, p95, p99, media, mínimo y máximo"""
+    if not samples:
+        return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'mean': 0.0, 'min': 0.0, 'max': 0.0}
+    return {
+        'p50': percentile(samples, 50) * 1000,
+        'p95': percentile(samples, 95) * 1000,
+        'p99': percentile(samples, 99) * 1000,
+        'mean': sum(samples) / len(samples) * 1000,
+        'min': min(samples) * 1000,
+        'max': max(samples) * 1000,
+    }
+
+
+@contextmanager
+def rollback_unless(keep):
+    """Transacción que se revierte al salir salvo que ``keep`` sea verdadero"""
+    with transaction.atomic():
+        yield
+        if not keep:
+            transaction.set_rollback(True)
@@ -0,0 +1,240 @@
+import hashlib
+import threading
+from collections import Counter
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .concurrency import gather_queries
+from .images import get_manifest
+from .instrumentation import record_cache
+from .models import BlogPost, Book, Event, Genre
+
+HOME_BLOCKS = ('current_book', 'upcoming_events', 'featured_posts', 'featured_quote')
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def record_cache_access(namespace, hits=0, misses=0):
+    """Suma aciertos/fallos de caché del proceso actual bajo ``namespace``"""
+    with _stats_lock:
+        _stats[(namespace, 'hits')] += hits
+        _stats[(namespace, 'misses')] += misses
+    # Y en la petición en curso, para la cabecera Server-Timing
+    record_cache(hits, misses)
+
+
+def cache_stats():
+    """Contadores por espacio de nombres: ``{'home': {'hits': 10, 'misses': 4}}``"""
+    with _stats_lock:
+        stats = {}
+        for (namespace, kind), value in _stats.items():
+            stats.setdefault(namespace, {'hits': 0, 'misses': 0})[kind] = value
+        return stats
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def home_block_key(name):
+    return f'home:{name}'
+
+
+def _home_timeout():
+    return getattr(settings, 'HOME_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def build_current_book():
+    genres = Prefetch('genres', queryset=Genre.objects.only('id', 'name'))
+    return Book.objects.filter(reading_status='current').prefetch_related(genres).first(), None
+
+
+def build_upcoming_events():
+    now = timezone.now()
+    events = list(Event.objects.filter(date__gte=now, is_active=True)[:3])
+    timeout = _home_timeout()
+    if events:
+        # El bloque caduca cuando empieza el primer evento y deja de ser "próximo"
+        timeout = max(1, min(timeout, int((events[0].date - now).total_seconds()) + 1))
+    return events, timeout
+
+
+def build_featured_posts():
+    return list(BlogPost.objects.filter(is_published=True, is_featured=True).select_related('book')[:2]), None
+
+
+def build_featured_quote():
+    quote = BlogPost.objects.filter(
+        is_published=True, featured_quote__isnull=False,
+    ).exclude(featured_quote='').select_related('book').first()
+    return quote, None
+
+
+HOME_BUILDERS = {
+    'current_book': build_current_book,
+    'upcoming_events': build_upcoming_events,
+    'featured_posts': build_featured_posts,
+    'featured_quote': build_featured_quote,
+}
+
+
+def _cached_home_blocks():
+    keys = {name: home_block_key(name) for name in HOME_BLOCKS}
+    cached = cache.get_many(keys.values())
+    blocks = {name: cached[key] for name, key in keys.items() if key in cached}
+    missing = [name for name in HOME_BLOCKS if name not in blocks]
+    record_cache_access('home', hits=len(blocks), misses=len(missing))
+    return blocks, missing
+
+
+def build_home_block(name):
+    value, timeout = HOME_BUILDERS[name]()
+    cache.set(home_block_key(name), value, timeout if timeout is not None else _home_timeout())
+    return value
+
+
+def get_home_blocks():
+    """Bloques de la portada, leídos de la caché con un único get_many"""
+    blocks, missing = _cached_home_blocks()
+    for name in missing:
+        blocks[name] = build_home_block(name)
+    return blocks
+
+
+async def aget_home_blocks():
+    """Como get_home_blocks, pero los bloques que faltan se consultan a la vez"""
+    blocks, missing = await sync_to_async(_cached_home_blocks)()
+    values = await gather_queries(*(partial(build_home_block, name) for name in missing))
+    blocks.update(zip(missing, values))
+    return blocks
+
+
+def invalidate_home_blocks(*names):
+    """Borra los bloques indicados cuando se confirme la transacción en curso"""
+    keys = [home_block_key(name) for name in names]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _cached_block(name):
+    return cache.get(home_block_key(name))
+
+
+def invalidate_home_for_book(book):
+    """Un libro aparece como lectura actual y en las entradas/cita destacadas"""
+    stale = []
+    current = _cached_block('current_book')
+    if book.reading_status == 'current' or (current is not None and current.pk == book.pk):
+        stale.append('current_book')
+    posts = _cached_block('featured_posts') or []
+    if any(post.book_id == book.pk for post in posts):
+        stale.append('featured_posts')
+    quote = _cached_block('featured_quote')
+    if quote is not None and quote.book_id == book.pk:
+        stale.append('featured_quote')
+    invalidate_home_blocks(*stale)
+
+
+def invalidate_home_for_books(book_ids):
+    current = _cached_block('current_book')
+    if book_ids is None or (current is not None and current.pk in book_ids):
+        invalidate_home_blocks('current_book')
+
+
+def invalidate_home_for_genre(genre):
+    current = _cached_block('current_book')
+    if current is not None and any(g.pk == genre.pk for g in current.genres.all()):
+        invalidate_home_blocks('current_book')
+
+
+def invalidate_home_for_event(event):
+    events = _cached_block('upcoming_events') or []
+    if any(cached.pk == event.pk for cached in events) or (event.is_active and not event.is_past):
+        invalidate_home_blocks('upcoming_events')
+
+
+def invalidate_home_for_post(post):
+    stale = []
+    posts = _cached_block('featured_posts') or []
+    if any(cached.pk == post.pk for cached in posts) or (post.is_published and post.is_featured):
+        stale.append('featured_posts')
+    quote = _cached_block('featured_quote')
+    if (quote is not None and quote.pk == post.pk) or (post.is_published and post.featured_quote):
+        stale.append('featured_quote')
+    invalidate_home_blocks(*stale)
+
+
+def _image_version(url):
+    entry = get_manifest().get(url) if url else None
+    return (entry or {}).get('hash')
+
+
+def book_card_version(book):
+    # Los géneros vienen precargados (genre_badges); renombrarlos no cambia updated_at
+    genres = [(genre.pk, genre.name) for genre in book.genres.all()]
+    return book.updated_at, genres, _image_version(book.cover_image)
+
+
+def post_card_version(post):
+    return post.updated_at, post.book.title if post.book else None
+
+
+def gallery_card_version(image):
+    return image.updated_at, image.event.title if image.event else None, _image_version(image.image_url)
+
+
+# Tarjeta -> (plantilla, nombre del objeto en la plantilla, versión)
+CARDS = {
+    'book': ('main/cards/book.html', 'book', book_card_version),
+    'post': ('main/cards/post.html', 'post', post_card_version),
+    'gallery': ('main/cards/gallery.html', 'image', gallery_card_version),
+    'gallery_featured': ('main/cards/gallery_featured.html', 'image', gallery_card_version),
+}
+
+
+def card_template_version(template):
+    """
+    Versión de lo que produce una plantilla de tarjeta: su código, el despliegue
+    (``CARD_CACHE_VERSION``: etiquetas, filtros y plantillas que incluye) y el
+    manifiesto de estáticos (las URLs con hash que aparezcan en ella).
+    """
+    parts = [template.template.source, settings.CARD_CACHE_VERSION, getattr(staticfiles_storage, 'manifest_hash', '')]
+    return hashlib.md5('\0'.join(parts).encode()).hexdigest()[:12]
+
+
+def card_key(name, obj, template_digest=''):
+    """
+    Clave de la tarjeta de ``obj``: cambia cuando se guarda (``updated_at``), con
+    los datos relacionados que muestra y con la versión de la plantilla, así que
+    nunca hace falta borrarlas; las antiguas caducan solas.
+    """
+    version = hashlib.md5(repr(CARDS[name][2](obj)).encode()).hexdigest()
+    return f'card:{name}:{template_digest}:{obj.pk}:{version}'
+
+
+def render_cards(name, objects):
+    """HTML de las tarjetas de un listado con un único get_many; sólo se renderizan las que faltan"""
+    template_name, variable, _ = CARDS[name]
+    template = get_template(template_name)
+    digest = card_template_version(template)
+    objects = list(objects)
+    keys = [card_key(name, obj, digest) for obj in objects]
+    cached = cache.get_many(keys)
+    rendered = {
+        key: template.render({variable: obj})
+        for key, obj in zip(keys, objects) if key not in cached
+    }
+    if rendered:
+        cache.set_many(rendered, settings.CARD_CACHE_TIMEOUT)
+    record_cache_access('cards', hits=len(cached), misses=len(rendered))
+    return ''.join(cached[key] if key in cached else rendered[key] for key in keys)
@@ -0,0 +1,209 @@
+"""
+Importación masiva del catálogo de libros desde CSV o JSONL.
+
+Las filas se leen en streaming y se procesan en lotes de ``batch_size``, cada
+uno en su propia transacción: los libros nuevos y las filas de la tabla
+intermedia de géneros se insertan con ``bulk_create``, los ya existentes (mismo
+ISBN) se actualizan con ``bulk_create(update_conflicts=True)`` y los géneros se resuelven con un
+diccionario en memoria que sólo consulta la base de datos para crear los que
+faltan. La memoria usada depende del tamaño de lote, no del archivo.
+"""
+import csv
+import io
+import json
+import sys
+import time
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .caching import invalidate_home_for_books
+from .http_cache import touch_content
+from .models import Book, Genre
+from .search import update_search_index
+
+BOOK_FIELDS = [
+    'title', 'author', 'isbn', 'publication_year', 'synopsis', 'cover_image',
+    'reading_status', 'reading_start_date', 'reading_end_date',
+]
+REQUIRED_FIELDS = ['title', 'author']
+# En CSV la columna ``genres`` separa los nombres con "|"
+GENRE_SEPARATOR = '|'
+
+
+def read_rows(path, format=None):
+    """Genera diccionarios a partir de un archivo CSV o JSONL (``-`` es la entrada estándar)"""
+    if format is None:
+        format = 'csv' if path.endswith('.csv') else 'jsonl'
+    stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8') if path == '-' else open(path, encoding='utf-8', newline='')
+    with stream:
+        if format == 'csv':
+            yield from csv.DictReader(stream)
+        else:
+            for line in stream:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class BookImporter:
+    """
+    Importa filas de libros por lotes, con upsert por ISBN.
+
+    ``import_rows(rows)`` devuelve las estadísticas acumuladas: libros creados y
+    actualizados, géneros creados, filas descartadas (con sus errores) y tiempo.
+    ``progress(stats)`` se llama tras confirmar cada lote.
+    """
+
+    def __init__(self, batch_size=5000, using='default', progress=None):
+        self.batch_size = batch_size
+        self.using = using
+        self.progress = progress
+        self.genre_ids = {}
+        self.stats = {'rows': 0, 'created': 0, 'updated': 0, 'genres_created': 0, 'skipped': 0, 'errors': []}
+
+    def import_rows(self, rows):
+        self.genre_ids = dict(Genre.objects.using(self.using).values_list('name', 'pk'))
+        started = time.perf_counter()
+        rows = iter(rows)
+        touched_current = False
+        updated_ids = set()
+
+        while batch := list(islice(rows, self.batch_size)):
+            books = self._parse(batch)
+            with transaction.atomic(using=self.using):
+                created_ids, batch_updated = self._save(books)
+                update_search_index(created_ids + batch_updated, using=self.using)
+            updated_ids.update(batch_updated)
+            touched_current = touched_current or any(book.reading_status == 'current' for book, _ in books.values())
+            self.stats['rows'] += len(batch)
+            self.stats['seconds'] = time.perf_counter() - started
+            if self.progress:
+                self.progress(self.stats)
+
+        self.stats['seconds'] = time.perf_counter() - started
+        # bulk_create/bulk_update no emiten señales: se invalida aquí lo que harían los receptores
+        if self.stats['created'] or self.stats['updated']:
+            touch_content(Book)
+            if self.stats['genres_created']:
+                touch_content(Genre)
+            invalidate_home_for_books(None if touched_current else updated_ids)
+        return self.stats
+
+    def _parse(self, batch):
+        """Convierte un lote en ``{clave: (Book, nombres de género o None)}``; el último ISBN repetido gana"""
+        books = {}
+        first_row = self.stats['rows'] + 1
+        for number, row in enumerate(batch, start=first_row):
+            try:
+                if not isinstance(row, dict):
+                    raise ValidationError('la fila no es un objeto')
+                book = self._book(row)
+                genres = self._genre_names(row.get('genres'))
+            except (ValidationError, TypeError, ValueError) as error:
+                messages = error.messages if isinstance(error, ValidationError) else [f'valor no válido ({error})']
+                self.stats['skipped'] += 1
+                if len(self.stats['errors']) < 20:
+                    self.stats['errors'].append(f'fila {number}: {"; ".join(messages)}')
+                continue
+            key = book.isbn or ('row', number)
+            books[key] = (book, genres)
+        return books
+
+    def _book(self, row):
+        values = {}
+        present = []
+        for name in BOOK_FIELDS:
+            value = row.get(name)
+            if isinstance(value, str):
+                value = value.strip()
+            field = Book._meta.get_field(name)
+            if value in (None, ''):
+                if name in REQUIRED_FIELDS:
+                    raise ValidationError(f'falta {name}')
+                if not field.has_default() and not field.null:
+                    value = ''
+                elif field.has_default():
+                    continue
+                else:
+                    value = None
+            else:
+                value = field.to_python(value)
+                if field.choices and value not in dict(field.flatchoices):
+                    raise ValidationError(f'{name} no válido: {value}')
+                if getattr(field, 'max_length', None) and len(str(value)) > field.max_length:
+                    raise ValidationError(f'{name} supera {field.max_length} caracteres')
+            values[name] = value
+            if name in row:
+                present.append(name)
+        book = Book(**values)
+        # Al actualizar un libro existente sólo se tocan las columnas presentes en la fila
+        book.import_fields = tuple(name for name in present if name != 'isbn')
+        return book
+
+    def _genre_names(self, value):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = value.split(GENRE_SEPARATOR)
+        if not isinstance(value, list) or not all(isinstance(name, str) for name in value):
+            raise ValidationError('genres no válido')
+        return list(dict.fromkeys(name.strip() for name in value if name and name.strip()))
+
+    def _resolve_genres(self, names):
+        missing = [name for name in names if name not in self.genre_ids]
+        if missing:
+            Genre.objects.using(self.using).bulk_create([Genre(name=name) for name in missing], ignore_conflicts=True)
+            self.genre_ids.update(Genre.objects.using(self.using).filter(name__in=missing).values_list('name', 'pk'))
+            self.stats['genres_created'] += len(missing)
+
+    def _save(self, books):
+        isbns = [key for key in books if isinstance(key, str)]
+        existing = {}
+        for start in range(0, len(isbns), 900):
+            existing.update(
+                Book.objects.using(self.using)
+                .filter(isbn__in=isbns[start:start + 900])
+                .order_by('pk')
+                .values_list('isbn', 'pk')
+            )
+
+        new, changed = [], []
+        for key, (book, _) in books.items():
+            if key in existing:
+                book.pk = existing[key]
+                changed.append(book)
+            else:
+                new.append(book)
+
+        self._resolve_genres({name for _, names in books.values() for name in names or ()})
+        Book.objects.using(self.using).bulk_create(new)
+        if changed:
+            now = timezone.now()
+            by_fields = {}
+            for book in changed:
+                book.updated_at = now
+                by_fields.setdefault(book.import_fields, []).append(book)
+            for fields, group in by_fields.items():
+                # INSERT ... ON CONFLICT (id) DO UPDATE: mucho más rápido que el CASE de bulk_update
+                Book.objects.using(self.using).bulk_create(
+                    group, update_conflicts=True, unique_fields=['id'],
+                    update_fields=list(fields) + ['updated_at'],
+                )
+
+        # Los géneros de una fila sustituyen a los del libro; sin columna se conservan
+        through = Book.genres.through
+        regenred = [book.pk for book in changed if books[book.isbn][1] is not None]
+        if regenred:
+            through.objects.using(self.using).filter(book_id__in=regenred).delete()
+        links = [
+            through(book_id=book.pk, genre_id=self.genre_ids[name])
+            for book, names in books.values()
+            for name in names or ()
+        ]
+        through.objects.using(self.using).bulk_create(links, ignore_conflicts=True)
+
+        self.stats['created'] += len(new)
+        self.stats['updated'] += len(changed)
+        return [book.pk for book in new], [book.pk for book in changed]
@@ -0,0 +1,41 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.functional import SimpleLazyObject
+
+# Hilos para consultas concurrentes; con CONN_MAX_AGE cada uno conserva una conexión,
+# así que su número acota las conexiones abiertas por proceso
+query_executor = SimpleLazyObject(
+    lambda: ThreadPoolExecutor(settings.ASYNC_QUERY_WORKERS, thread_name_prefix='orm-query')
+)
+
+
+def _in_own_connection(function):
+    def run():
+        try:
+            return function()
+        finally:
+            # Cada hilo abre su propia conexión: se cierra (o se conserva según CONN_MAX_AGE)
+            close_old_connections()
+    return run
+
+
+async def gather_queries(*functions):
+    """
+    Ejecuta funciones síncronas de ORM independientes y devuelve sus resultados en orden.
+
+    Con ``ASYNC_CONCURRENT_QUERIES`` cada función corre a la vez en un hilo propio,
+    con su propia conexión, así que la espera total es la de la consulta más lenta.
+    Sin él se ejecutan una tras otra en el hilo de la petición (tests, conteo de
+    consultas). Las funciones deben materializar sus resultados (``list()``,
+    ``first()``...), nunca devolver querysets perezosos.
+    """
+    if not settings.ASYNC_CONCURRENT_QUERIES:
+        return [await sync_to_async(function)() for function in functions]
+    return await asyncio.gather(*(
+        sync_to_async(_in_own_connection(function), thread_sensitive=False, executor=query_executor)()
+        for function in functions
+    ))
@@ -0,0 +1,94 @@
+"""
+Lecturas desde réplicas sin perder "leer lo que uno escribe".
+
+Las réplicas se declaran con ``DATABASE_REPLICA_URLS`` (alias ``replica_0``,
+``replica_1``...). ``ReplicaRouter`` sólo las usa dentro de ``replica_reads()``,
+que activan las páginas públicas (``public_page``) en GET/HEAD; todo lo demás
+(formularios, admin, comandos, workers) lee y escribe en ``default``.
+
+Cuando una petición escribe, ``ReplicaRoutingMiddleware`` deja una cookie que
+dura ``REPLICA_STICKY_SECONDS``: mientras exista, las peticiones de ese cliente
+también leen de la primaria y ve su propio cambio aunque la réplica vaya con
+retraso. Las páginas públicas hacen lo mismo durante ese tiempo tras cualquier
+cambio que marque ``touch_content`` (ver ``PageVersion``). El estado va en una ``ContextVar``, así que sigue a la petición a los
+hilos de ``sync_to_async`` y de ``gather_queries``.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+STICKY_COOKIE = 'primary_db'
+
+_routing = ContextVar('db_routing', default=None)
+
+
+class RoutingState:
+    def __init__(self, sticky=False):
+        self.sticky = sticky
+        self.replica = None
+        self.wrote = False
+
+
+@contextmanager
+def request_routing(request):
+    """Estado de enrutado mientras se atiende ``request``"""
+    state = RoutingState(sticky=STICKY_COOKIE in request.COOKIES)
+    token = _routing.set(state)
+    try:
+        yield state
+    finally:
+        _routing.reset(token)
+
+
+def pin_to_primary(state, response):
+    """Si la petición escribió, el cliente lee de la primaria durante REPLICA_STICKY_SECONDS"""
+    if state.wrote and settings.DATABASE_REPLICAS:
+        response.set_cookie(
+            STICKY_COOKIE, '1', max_age=settings.REPLICA_STICKY_SECONDS,
+            secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax',
+        )
+    return response
+
+
+@contextmanager
+def replica_reads():
+    """
+    Las lecturas del bloque van a una réplica (la misma para todo el bloque),
+    salvo que la petición esté fijada a la primaria o ya haya escrito.
+    """
+    state = _routing.get()
+    if state is None or state.sticky or state.wrote or not settings.DATABASE_REPLICAS:
+        yield
+        return
+    state.replica = random.choice(settings.DATABASE_REPLICAS)
+    try:
+        yield
+    finally:
+        state.replica = None
+
+
+def read_from_primary():
+    """Dentro de ``replica_reads()``, el resto del bloque lee de la primaria"""
+    state = _routing.get()
+    if state is not None:
+        state.replica = None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is not None and state.replica and not state.wrote:
+            return state.replica
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primaria y réplicas tienen los mismos datos
+        return True
@@ -0,0 +1,129 @@
+"""
+Feeds RSS y Atom de las reflexiones (todas o las de un libro) y de las
+lecturas actual y próximas, con ``django.contrib.syndication``.
+
+Las vistas de main/views.py los envuelven con ``public_page``: cada feed se
+renderiza una vez por cambio de contenido y se guarda entero en la caché, y un
+lector que vuelve a pedirlo cuesta la consulta de la versión (304 si ya lo
+tiene).
+"""
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+
+from .models import BlogPost, Book
+
+# Elementos por feed: los lectores sólo necesitan lo último
+FEED_ITEMS = 20
+SUMMARY_WORDS = 60
+
+
+class BlogFeed(Feed):
+    """Últimas reflexiones publicadas; con ``pk`` sólo las de ese libro"""
+    description = 'Pensamientos y análisis de nuestra comunidad lectora'
+    url_name = 'blog_rss'
+
+    def get_object(self, request, pk=None):
+        return get_object_or_404(Book, pk=pk) if pk is not None else None
+
+    def title(self, book):
+        if book:
+            return f'Reflexiones sobre {book.title} - Club de Lectura ELIXIR'
+        return 'Reflexiones - Club de Lectura ELIXIR'
+
+    def link(self, book):
+        return reverse('main:blog')
+
+    def feed_url(self, book):
+        if book:
+            return reverse(f'main:book_{self.url_name}', kwargs={'pk': book.pk})
+        return reverse(f'main:{self.url_name}')
+
+    def items(self, book):
+        posts = BlogPost.objects.filter(is_published=True).select_related('book').order_by('-created_at', '-id')
+        if book:
+            posts = posts.filter(book=book)
+        return posts[:FEED_ITEMS]
+
+    def item_title(self, post):
+        return post.title
+
+    def item_description(self, post):
+        summary = Truncator(post.content).words(SUMMARY_WORDS)
+        return f'«{post.featured_quote}»\n\n{summary}' if post.featured_quote else summary
+
+    def item_author_name(self, post):
+        return post.author_name
+
+    def item_pubdate(self, post):
+        return post.created_at
+
+    def item_updateddate(self, post):
+        return post.updated_at
+
+    def item_categories(self, post):
+        return [post.book.title] if post.book else []
+
+
+class BlogAtomFeed(BlogFeed):
+    feed_type = Atom1Feed
+    subtitle = BlogFeed.description
+    url_name = 'blog_atom'
+
+
+class ReadingsFeed(Feed):
+    """
+    Lectura actual y próximas lecturas. El identificador de cada entrada lleva
+    el estado del libro, así que pasar de próxima a actual aparece como nueva.
+    """
+    title = 'Lecturas - Club de Lectura ELIXIR'
+    description = 'La lectura actual y los libros que exploraremos en los próximos meses'
+    url_name = 'readings_rss'
+
+    def link(self):
+        return reverse('main:upcoming_readings')
+
+    def feed_url(self):
+        return reverse(f'main:{self.url_name}')
+
+    def items(self):
+        # 'current' se ordena antes que 'upcoming'
+        return Book.objects.filter(
+            reading_status__in=['current', 'upcoming'],
+        ).order_by('reading_status', 'reading_start_date', 'id').prefetch_related('genres')[:FEED_ITEMS]
+
+    def item_title(self, book):
+        return f'{book.get_reading_status_display()}: {book.title} ({book.author})'
+
+    def item_description(self, book):
+        return Truncator(book.synopsis).words(SUMMARY_WORDS)
+
+    def item_link(self, book):
+        if book.reading_status == 'current':
+            return reverse('main:current_reading')
+        return f"{reverse('main:upcoming_readings')}#libro-{book.pk}"
+
+    def item_guid(self, book):
+        return f'libro-{book.pk}-{book.reading_status}'
+
+    item_guid_is_permalink = False
+
+    def item_author_name(self, book):
+        return book.author
+
+    def item_pubdate(self, book):
+        return book.created_at
+
+    def item_updateddate(self, book):
+        return book.updated_at
+
+    def item_categories(self, book):
+        return [genre.name for genre in book.genres.all()]
+
+
+class ReadingsAtomFeed(ReadingsFeed):
+    feed_type = Atom1Feed
+    subtitle = ReadingsFeed.description
+    url_name = 'readings_atom'
@@ -0,0 +1,205 @@
+import datetime
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, quote_etag
+
+from .caching import record_cache_access
+from .db_router import read_from_primary, replica_reads
+from .models import Event
+
+
+def content_stamp_key(model):
+    return f'content-changed:{model._meta.label_lower}'
+
+
+def touch_content(model):
+    """Marca el modelo como modificado ahora (cubre borrados y modelos sin updated_at)"""
+    key = content_stamp_key(model)
+    transaction.on_commit(lambda: cache.set(key, timezone.now(), None))
+
+
+def latest(model, field='updated_at'):
+    return model.objects.order_by(f'-{field}').values(field)[:1]
+
+
+def latest_started_event():
+    # Cuando un evento empieza pasa de "próximo" a "pasado" sin que se escriba nada
+    return Event.objects.filter(date__lt=timezone.now()).order_by('-date').values('date')[:1]
+
+
+def _as_datetime(value):
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if isinstance(value, datetime.datetime) and timezone.is_naive(value):
+        value = timezone.make_aware(value, datetime.timezone.utc)
+    return value
+
+
+def content_timestamps(sources, using=None):
+    """
+    Último cambio de cada fuente en una sola consulta.
+
+    Cada fuente es un queryset de una fila y una columna (``latest(Book)``);
+    se combinan como subconsultas escalares: ``SELECT (...), (...)``.
+    """
+    if not sources:
+        return []
+    using = using or router.db_for_read(sources[0].model)
+    connection = connections[using]
+    parts, params = [], []
+    for queryset in sources:
+        sql, sql_params = queryset.query.get_compiler(using).as_sql()
+        parts.append(f'({sql})')
+        params.extend(sql_params)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT ' + ', '.join(parts), params)
+        row = cursor.fetchone()
+    return [_as_datetime(value) for value in row]
+
+
+class PageVersion:
+    """
+    ETag y Last-Modified de una página a partir de sus dependencias.
+
+    Las marcas de ``touch_content`` se guardan al confirmar en la primaria: si
+    alguna tiene menos de ``REPLICA_STICKY_SECONDS`` la réplica puede no tener
+    aún el cambio (un borrado no mueve sus fechas), así que la versión y la
+    página se leen de la primaria. Si no, la clave nueva guardaría la página
+    vieja hasta que caducara.
+    """
+
+    def __init__(self, request, models, extra_sources=()):
+        sources = [latest(model, _timestamp_field(model)) for model in models if _timestamp_field(model)]
+        sources += [source() for source in extra_sources]
+        keys = [content_stamp_key(model) for model in models]
+        stamps = cache.get_many(keys)
+        recent = timezone.now() - datetime.timedelta(seconds=settings.REPLICA_STICKY_SECONDS)
+        if any(stamp > recent for stamp in stamps.values()):
+            read_from_primary()
+        timestamps = content_timestamps(sources) + [stamps.get(key) for key in keys]
+        known = [value for value in timestamps if value is not None]
+        self.last_modified = max(known) if known else None
+        digest = hashlib.sha1(repr((
+            request.get_host(), request.get_full_path(),
+            [value.isoformat() if value else None for value in timestamps],
+        )).encode()).hexdigest()
+        self.etag = quote_etag(digest[:32])
+        self.cache_key = f'page:{self.etag}'
+
+
+def _timestamp_field(model):
+    # Los modelos sin fecha (Genre) dependen sólo de la marca en caché
+    names = {field.name for field in model._meta.concrete_fields}
+    for name in ('updated_at', 'created_at'):
+        if name in names:
+            return name
+    return None
+
+
+def has_session(request):
+    return settings.SESSION_COOKIE_NAME in request.COOKIES
+
+
+def public_page(*models, extra_sources=()):
+    """
+    Respuestas condicionales y caché compartida para páginas públicas de sólo lectura.
+
+    ``models`` son los modelos cuyo contenido muestra la página. Con ellos se
+    calculan ETag y Last-Modified (una consulta), se responde 304 si el cliente
+    ya tiene la versión y, para visitantes anónimos, se sirve la respuesta ya
+    renderizada desde la caché bajo una clave que cambia con el contenido.
+    Sus lecturas van a una réplica si las hay (ver main/db_router.py).
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return await view_func(request, *args, **kwargs)
+                with replica_reads():
+                    version, response = await sync_to_async(_cached_response)(request, models, extra_sources)
+                    if response is None:
+                        response = await view_func(request, *args, **kwargs)
+                        await sync_to_async(_store_response)(request, response, version)
+                return response
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+            with replica_reads():
+                version, response = _cached_response(request, models, extra_sources)
+                if response is None:
+                    response = view_func(request, *args, **kwargs)
+                    _store_response(request, response, version)
+            return response
+        return wrapper
+    return decorator
+
+
+def _cached_response(request, models, extra_sources):
+    """Versión de la página y, si existe, la respuesta 304 o la guardada en caché"""
+    version = PageVersion(request, models, extra_sources)
+    response = get_conditional_response(
+        request, etag=version.etag,
+        last_modified=version.last_modified and int(version.last_modified.timestamp()),
+    )
+    if response is None and not has_session(request):
+        response = cache.get(version.cache_key)
+        record_cache_access('page', hits=int(response is not None), misses=int(response is None))
+    return version, response
+
+
+def _store_response(request, response, version):
+    if response.status_code != 200:
+        return
+    response['ETag'] = version.etag
+    if version.last_modified:
+        response['Last-Modified'] = http_date(version.last_modified.timestamp())
+    if not has_session(request) and _is_shareable(request, response):
+        patch_cache_control(response, public=True, max_age=settings.PAGE_CACHE_MAX_AGE)
+        if response.streaming:
+            response.streaming_content = _store_when_streamed(response, version.cache_key)
+        else:
+            cache.set(version.cache_key, response, settings.PAGE_CACHE_TIMEOUT)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+
+
+def _store_when_streamed(response, key):
+    """
+    Envía el contenido según se genera y, si llega al final, guarda en la caché
+    una respuesta normal con el documento completo (las siguientes no lo generan).
+    """
+    content = response.streaming_content
+    # Las cabeceras de ahora: las que añadan los middleware son de esta petición
+    status, headers = response.status_code, list(response.items())
+
+    def stream():
+        parts = []
+        for chunk in content:
+            parts.append(chunk)
+            yield chunk
+        stored = HttpResponse(b''.join(parts), status=status)
+        for header, value in headers:
+            stored[header] = value
+        cache.set(key, stored, settings.PAGE_CACHE_TIMEOUT)
+    return stream()
+
+
+def _is_shareable(request, response):
+    # Nada de cookies ni contenido por usuario (token CSRF, sesión)
+    if response.cookies or request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+        return False
+    session = getattr(request, 'session', None)
+    return not (session is not None and session.accessed)
@@ -0,0 +1,153 @@
+"""
+Calendario iCalendar (RFC 5545) de los encuentros.
+
+Cada evento se serializa a un bloque ``VEVENT`` que se guarda en la caché con
+una clave que cambia con los datos que muestra (como las tarjetas de
+main/caching.py). Al reconstruir el calendario se piden todos los bloques con
+``get_many`` por lotes y sólo se serializan los eventos nuevos o modificados;
+una inscripción cambia ``Event.updated_at`` pero no el bloque.
+
+Cada cambio de los datos que se publican sube ``Event.sequence`` y fecha
+``details_updated_at`` (ver main/signals.py), que salen como ``SEQUENCE`` y
+``LAST-MODIFIED``/``DTSTAMP`` para que los clientes sustituyan su copia. Los
+encuentros desactivados siguen en el calendario ``CANCELLED_WINDOW`` con
+``STATUS:CANCELLED``, así que desaparecen también de los calendarios suscritos.
+
+Las vistas van con ``public_page``: ETag y Last-Modified con una consulta, 304
+para los clientes que ya tienen la versión y la respuesta entera en caché.
+"""
+import hashlib
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .caching import record_cache_access
+
+PRODID = '-//Club de Lectura ELIXIR//Encuentros//ES'
+# Los eventos no tienen hora de fin: se anuncian con esta duración
+DEFAULT_DURATION = timedelta(hours=2)
+BATCH_SIZE = 1000
+# Tiempo que un encuentro desactivado sigue en el calendario como cancelado
+CANCELLED_WINDOW = timedelta(days=30)
+# Campos del evento que salen en el VEVENT (el libro, por su id): al cambiar alguno sube la revisión
+EVENT_FIELDS = ('title', 'description', 'event_type', 'date', 'location', 'online_link', 'is_active', 'book_id')
+
+
+def escape_text(value):
+    """Escapa un valor TEXT (barras, comas, punto y coma y saltos de línea)"""
+    return (
+        str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n')
+    )
+
+
+def fold(line):
+    """Parte la línea en trozos de 75 octetos como mucho sin cortar caracteres UTF-8"""
+    if len(line.encode()) <= 75:
+        return line
+    parts, current, size = [], [], 0
+    for char in line:
+        length = len(char.encode())
+        # Las continuaciones empiezan con un espacio que también cuenta
+        if size + length > (75 if not parts else 74):
+            parts.append(''.join(current))
+            current, size = [], 0
+        current.append(char)
+        size += length
+    parts.append(''.join(current))
+    return '\r\n '.join(parts)
+
+
+def format_datetime(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def event_version(event):
+    # Sólo lo que sale en el bloque: las inscripciones tocan updated_at pero no lo cambian
+    book = (event.book.title, event.book.author) if event.book else None
+    fields = tuple(getattr(event, name) for name in EVENT_FIELDS)
+    return fields + (event.sequence, event.details_updated_at, book)
+
+
+def event_key(event, host, scheme='https'):
+    version = hashlib.md5(repr((scheme, host, event_version(event))).encode()).hexdigest()
+    return f'ics:{event.pk}:{version}'
+
+
+def vevent(event, host, scheme='https'):
+    """Bloque VEVENT de ``event`` (líneas ya plegadas y terminadas en CRLF)"""
+    description = [event.description]
+    if event.book:
+        description.append(f'Libro: {event.book.title} ({event.book.author})')
+    if event.online_link:
+        description.append(f'Enlace online: {event.online_link}')
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:event-{event.pk}@{host}',
+        f'DTSTAMP:{format_datetime(event.details_updated_at)}',
+        f'LAST-MODIFIED:{format_datetime(event.details_updated_at)}',
+        f'SEQUENCE:{event.sequence}',
+        f'DTSTART:{format_datetime(event.date)}',
+        f'DTEND:{format_datetime(event.date + DEFAULT_DURATION)}',
+        f'SUMMARY:{escape_text(event.title)}',
+        f'DESCRIPTION:{escape_text(chr(10).join(description))}',
+        f'CATEGORIES:{escape_text(event.get_event_type_display())}',
+        f'URL:{scheme}://{host}{event.get_absolute_url()}',
+        f'STATUS:{"CONFIRMED" if event.is_active else "CANCELLED"}',
+    ]
+    if event.location:
+        lines.append(f'LOCATION:{escape_text(event.location)}')
+    elif event.online_link:
+        lines.append(f'LOCATION:{escape_text(event.online_link)}')
+    if event.online_link:
+        # Enlace de la videollamada para los clientes que lo muestran aparte
+        lines.append(f'CONFERENCE;VALUE=URI;FEATURE=VIDEO:{event.online_link}')
+    lines.append('END:VEVENT')
+    return ''.join(fold(line) + '\r\n' for line in lines)
+
+
+def render_vevents(events, host, scheme='https'):
+    """Bloques de ``events`` con un get_many por lote; sólo se serializan los que faltan"""
+    chunks = []
+    batch = []
+
+    def flush():
+        keys = [event_key(event, host, scheme) for event in batch]
+        cached = cache.get_many(keys)
+        missing = {key: vevent(event, host, scheme) for key, event in zip(keys, batch) if key not in cached}
+        if missing:
+            cache.set_many(missing, settings.CARD_CACHE_TIMEOUT)
+        record_cache_access('ics', hits=len(cached), misses=len(missing))
+        chunks.extend(cached[key] if key in cached else missing[key] for key in keys)
+        batch.clear()
+
+    for event in events:
+        batch.append(event)
+        if len(batch) >= BATCH_SIZE:
+            flush()
+    if batch:
+        flush()
+    return ''.join(chunks)
+
+
+def calendar(events, host, scheme='https', name='Club de Lectura ELIXIR'):
+    """Calendario VCALENDAR completo con los eventos indicados"""
+    header = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text(name)}',
+        f'X-WR-TIMEZONE:{timezone.get_default_timezone_name()}',
+        # Sugerencia de frecuencia para los clientes que la respetan
+        'REFRESH-INTERVAL;VALUE=DURATION:PT6H',
+        'X-PUBLISHED-TTL:PT6H',
+    ]
+    return (
+        ''.join(fold(line) + '\r\n' for line in header)
+        + render_vevents(events, host, scheme)
+        + 'END:VCALENDAR\r\n'
+    )
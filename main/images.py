@@ -0,0 +1,232 @@
+"""
+Variantes redimensionadas de las imágenes remotas (portadas, galería y perfiles).
+
+``build_image_variants`` descarga cada URL una sola vez, genera versiones WebP y
+JPEG a los anchos de ``IMAGE_VARIANT_WIDTHS`` y las guarda en
+``IMAGE_VARIANTS_ROOT`` con el hash del contenido en el nombre, así que se
+pueden cachear para siempre. Un manifiesto JSON relaciona cada URL original con
+sus variantes; las plantillas lo consultan con ``{% responsive_image %}`` (ver
+main/templatetags/images.py) sin tocar la base de datos, y mientras una URL no
+tenga variantes se sigue usando la original.
+"""
+import hashlib
+import http.client
+import io
+import ipaddress
+import json
+import os
+import re
+import socket
+import tempfile
+import threading
+import urllib.parse
+import urllib.request
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+from .models import Book, Gallery, Member
+
+IMAGE_FIELDS = [
+    (Book, 'cover_image'),
+    (Gallery, 'image_url'),
+    (Member, 'profile_image'),
+]
+FORMATS = [('webp', 'WEBP'), ('jpg', 'JPEG')]
+MANIFEST_NAME = 'manifest.json'
+VARIANT_NAME_RE = re.compile(r'[0-9a-f]{16}-\d+w\.(webp|jpg)')
+
+
+def image_sources():
+    """URLs de imagen distintas que usa el sitio"""
+    urls = set()
+    for model, field in IMAGE_FIELDS:
+        urls.update(model.objects.exclude(**{field: ''}).values_list(field, flat=True).distinct())
+    return sorted(urls)
+
+
+ALLOWED_SCHEMES = ('http', 'https')
+
+
+def check_public_address(address):
+    """``ValueError`` si la IP no es pública (loopback, privada, de enlace local...)"""
+    ip = ipaddress.ip_address(address.split('%')[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    if not ip.is_global and not settings.IMAGE_FETCH_ALLOW_PRIVATE:
+        raise ValueError(f'dirección no pública: {ip}')
+
+
+def check_image_url(url):
+    """``ValueError`` si la URL no es http(s) o su host resuelve a una dirección no pública"""
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme not in ALLOWED_SCHEMES or not parts.hostname:
+        raise ValueError(f'URL no permitida: {url}')
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    for *_, sockaddr in socket.getaddrinfo(parts.hostname, port, proto=socket.IPPROTO_TCP):
+        check_public_address(sockaddr[0])
+
+
+class _PublicAddressMixin:
+    # La IP se comprueba otra vez ya conectada: el DNS puede cambiar tras check_image_url
+    def connect(self):
+        super().connect()
+        check_public_address(self.sock.getpeername()[0])
+
+
+class _PublicHTTPConnection(_PublicAddressMixin, http.client.HTTPConnection):
+    pass
+
+
+class _PublicHTTPSConnection(_PublicAddressMixin, http.client.HTTPSConnection):
+    pass
+
+
+class _PublicHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(_PublicHTTPConnection, req)
+
+
+class _PublicHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(_PublicHTTPSConnection, req, context=self._context)
+
+
+class _RedirectHandler(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        check_image_url(newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+# Sin proxies del entorno: la dirección comprobada tiene que ser la del servidor de la imagen
+_opener = urllib.request.build_opener(
+    urllib.request.ProxyHandler({}), _PublicHTTPHandler, _PublicHTTPSHandler, _RedirectHandler,
+)
+
+
+def fetch_image(url):
+    """Contenido de la imagen; sólo http(s) hacia direcciones públicas, también tras redirecciones"""
+    check_image_url(url)
+    request = urllib.request.Request(url, headers={'User-Agent': 'djangocrug-images/1.0'})
+    with _opener.open(request, timeout=settings.IMAGE_FETCH_TIMEOUT) as response:
+        data = response.read(settings.IMAGE_MAX_BYTES + 1)
+    if len(data) > settings.IMAGE_MAX_BYTES:
+        raise ValueError(f'la imagen supera {settings.IMAGE_MAX_BYTES} bytes')
+    return data
+
+
+def _save_atomically(image, path, format):
+    handle, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as stream:
+            image.save(stream, format, quality=settings.IMAGE_VARIANT_QUALITY, optimize=True)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def build_variants(data, root=None):
+    """
+    Genera las variantes de una imagen y devuelve su entrada del manifiesto.
+
+    Nunca se amplía: si el original es más estrecho que algún ancho configurado,
+    su propio ancho es la variante mayor. Los archivos ya existentes (mismo
+    contenido, otra URL) no se vuelven a escribir.
+    """
+    root = root or settings.IMAGE_VARIANTS_ROOT
+    os.makedirs(root, exist_ok=True)
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode != 'RGB':
+            # JPEG no admite transparencia: se compone sobre fondo blanco
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.convert('RGBA').getchannel('A'))
+            image = background
+        width, height = image.size
+        widths = sorted({w for w in settings.IMAGE_VARIANT_WIDTHS if w < width} |
+                        {min(width, max(settings.IMAGE_VARIANT_WIDTHS))})
+        for variant_width in widths:
+            names = [(variant_name(digest, variant_width, ext), format) for ext, format in FORMATS]
+            if all(os.path.exists(os.path.join(root, name)) for name, _ in names):
+                continue
+            resized = image.resize((variant_width, max(round(height * variant_width / width), 1)), Image.LANCZOS)
+            for name, format in names:
+                _save_atomically(resized, os.path.join(root, name), format)
+    return {'hash': digest, 'width': width, 'height': height, 'widths': widths}
+
+
+def variant_name(digest, width, ext):
+    return f'{digest}-{width}w.{ext}'
+
+
+def variant_url(digest, width, ext):
+    return settings.IMAGE_VARIANTS_URL + variant_name(digest, width, ext)
+
+
+class VariantManifest:
+    """
+    Manifiesto URL original -> variantes, en ``<root>/manifest.json``.
+
+    Cada proceso lo guarda en memoria y lo relee sólo cuando cambia el archivo
+    (un ``stat`` por consulta), así que las variantes nuevas se ven sin reiniciar.
+    """
+
+    def __init__(self, root):
+        self.path = os.path.join(root, MANIFEST_NAME)
+        self.lock = threading.Lock()
+        self.mtime = None
+        self.entries = {}
+
+    def load(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        if mtime != self.mtime:
+            with self.lock:
+                with open(self.path, encoding='utf-8') as stream:
+                    self.entries = json.load(stream)
+                self.mtime = mtime
+        return self.entries
+
+    def get(self, url):
+        return self.load().get(url)
+
+    def save(self, entries):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        handle, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')
+        with os.fdopen(handle, 'w', encoding='utf-8') as stream:
+            json.dump(entries, stream, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+_manifests = {}
+
+
+def get_manifest(root=None):
+    root = str(root or settings.IMAGE_VARIANTS_ROOT)
+    if root not in _manifests:
+        _manifests[root] = VariantManifest(root)
+    return _manifests[root]
+
+
+def image_variants(url, default_width=None):
+    """
+    Atributos ``src``/``srcset`` de ``url`` para las plantillas, o None si aún
+    no tiene variantes (o su descarga falló).
+    """
+    entry = get_manifest().get(url) if url else None
+    if not entry or 'hash' not in entry:
+        return None
+    digest, widths = entry['hash'], entry['widths']
+    # ``src`` para navegadores sin srcset: la menor que cubre el ancho mostrado
+    fallback = min((w for w in widths if w >= default_width), default=widths[-1]) if default_width else widths[-1]
+    return {
+        'src': variant_url(digest, fallback, 'jpg'),
+        'srcset_jpeg': ', '.join(f'{variant_url(digest, w, "jpg")} {w}w' for w in widths),
+        'srcset_webp': ', '.join(f'{variant_url(digest, w, "webp")} {w}w' for w in widths),
+        'width': entry['width'],
+        'height': entry['height'],
+    }
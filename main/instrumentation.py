@@ -0,0 +1,276 @@
+"""
+Medición de cada petición: consultas SQL, tiempo de base de datos y de
+plantillas, y aciertos/fallos de las cachés de la aplicación.
+
+``PerformanceMiddleware`` crea un ``RequestMetrics`` por petición y lo guarda
+en una ``ContextVar``, así que también lo ven los hilos de ``sync_to_async`` y
+de ``gather_queries``. Lo alimentan:
+
+- un ``execute_wrapper`` instalado en cada conexión al abrirse (todas las
+  bases y todos los hilos), que además avisa de las consultas lentas;
+- ``TimedDjangoTemplates``, el motor de plantillas de ``TEMPLATES``, que mide
+  sólo la plantilla más externa para no contar dos veces las anidadas;
+- ``caching.record_cache_access``.
+
+Al terminar, la respuesta lleva la cabecera ``Server-Timing`` (con
+``SERVER_TIMING``; si no, sólo para staff o con ``METRICS_TOKEN``), se avisa de las
+consultas repetidas (N+1) y la duración se añade a la ventana de la vista,
+de la que ``prometheus_metrics()`` calcula los percentiles. Como
+``cache_stats()``, las ventanas son de cada proceso.
+"""
+import logging
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger('main.performance')
+
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = Counter()
+        self.slow_queries = 0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def add_query(self, sql, elapsed):
+        with self.lock:
+            self.queries += 1
+            self.db_time += elapsed
+            self.statements[sql] += 1
+
+    def duplicates(self):
+        """Sentencias (con sus parámetros sin sustituir) repetidas al menos DUPLICATE_QUERY_THRESHOLD veces"""
+        return [(sql, count) for sql, count in self.statements.items() if count >= settings.DUPLICATE_QUERY_THRESHOLD]
+
+    def server_timing(self, total):
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} consultas", '
+            f'tpl;dur={self.template_time * 1000:.1f}, '
+            f'cache;desc="{self.cache_hits} aciertos {self.cache_misses} fallos", '
+            f'app;dur={total * 1000:.1f}'
+        )
+
+
+def current_metrics():
+    return _current.get()
+
+
+@contextmanager
+def measure_request():
+    """Métricas de las consultas, plantillas y cachés que se usen dentro del bloque"""
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+def record_cache(hits, misses):
+    metrics = _current.get()
+    if metrics is not None:
+        with metrics.lock:
+            metrics.cache_hits += hits
+            metrics.cache_misses += misses
+
+
+def _timed_execute(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.add_query(sql, elapsed)
+        if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+            with metrics.lock:
+                metrics.slow_queries += 1
+            logger.warning(
+                'Consulta lenta (%.1f ms) en %s: %s',
+                elapsed * 1000, context['connection'].alias, sql,
+            )
+
+
+def _install(sender, connection, **kwargs):
+    if _timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_timed_execute)
+
+
+def install_query_timer():
+    """Mide las consultas de las conexiones que se abran a partir de ahora y de las ya abiertas en este hilo"""
+    connection_created.connect(_install, dispatch_uid='main.instrumentation')
+    for connection in connections.all(initialized_only=True):
+        _install(None, connection)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+        # Las plantillas renderizadas desde otra (tarjetas cacheadas) ya cuentan en la externa
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Motor de plantillas de Django que suma el tiempo de render a la petición en curso"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+class ViewStats:
+    def __init__(self, window):
+        self.durations = deque(maxlen=window)
+        self.count = 0
+        self.duration = 0.0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.queries = 0
+        self.slow_queries = 0
+        self.duplicate_queries = 0
+
+
+_views = {}
+_views_lock = threading.Lock()
+
+
+def record_request(view, duration, metrics, duplicates=()):
+    with _views_lock:
+        stats = _views.get(view)
+        if stats is None:
+            stats = _views[view] = ViewStats(settings.PERFORMANCE_WINDOW)
+        stats.durations.append(duration)
+        stats.count += 1
+        stats.duration += duration
+        stats.db_time += metrics.db_time
+        stats.template_time += metrics.template_time
+        stats.queries += metrics.queries
+        stats.slow_queries += metrics.slow_queries
+        stats.duplicate_queries += len(duplicates)
+
+
+def reset_view_stats():
+    with _views_lock:
+        _views.clear()
+
+
+def quantile(ordered, q):
+    """Percentil por rango más cercano de una lista ya ordenada"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+
+def view_percentiles():
+    """``{vista: {0.5: s, 0.9: s, ...}}`` sobre las últimas PERFORMANCE_WINDOW peticiones"""
+    with _views_lock:
+        windows = {view: sorted(stats.durations) for view, stats in _views.items()}
+    return {view: {q: quantile(ordered, q) for q in QUANTILES} for view, ordered in windows.items()}
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_metrics():
+    """Percentiles y totales por vista y contadores de caché en el formato de texto de Prometheus"""
+    from .caching import cache_stats
+
+    with _views_lock:
+        views = {
+            view: (sorted(stats.durations), vars(stats).copy())
+            for view, stats in sorted(_views.items())
+        }
+    lines = [
+        '# HELP djangocrug_request_duration_seconds Duración de las peticiones por vista (ventana móvil).',
+        '# TYPE djangocrug_request_duration_seconds summary',
+    ]
+    for view, (ordered, stats) in views.items():
+        for q in QUANTILES:
+            lines.append(
+                f'djangocrug_request_duration_seconds{{view="{_label(view)}",quantile="{q}"}} {quantile(ordered, q):.6f}'
+            )
+        lines.append(f'djangocrug_request_duration_seconds_sum{{view="{_label(view)}"}} {stats["duration"]:.6f}')
+        lines.append(f'djangocrug_request_duration_seconds_count{{view="{_label(view)}"}} {stats["count"]}')
+
+    counters = [
+        ('request_db_seconds_total', 'db_time', 'Tiempo en la base de datos por vista.'),
+        ('request_template_seconds_total', 'template_time', 'Tiempo de render de plantillas por vista.'),
+        ('request_queries_total', 'queries', 'Consultas SQL por vista.'),
+        ('slow_queries_total', 'slow_queries', 'Consultas por encima de SLOW_QUERY_MS por vista.'),
+        ('duplicate_queries_total', 'duplicate_queries', 'Sentencias repetidas en una misma petición por vista.'),
+    ]
+    for name, key, help_text in counters:
+        lines.append(f'# HELP djangocrug_{name} {help_text}')
+        lines.append(f'# TYPE djangocrug_{name} counter')
+        for view, (_, stats) in views.items():
+            value = stats[key]
+            value = f'{value:.6f}' if isinstance(value, float) else value
+            lines.append(f'djangocrug_{name}{{view="{_label(view)}"}} {value}')
+
+    lines.append('# HELP djangocrug_cache_requests_total Lecturas de las cachés de la aplicación.')
+    lines.append('# TYPE djangocrug_cache_requests_total counter')
+    for namespace, counts in sorted(cache_stats().items()):
+        for result, key in (('hit', 'hits'), ('miss', 'misses')):
+            lines.append(
+                f'djangocrug_cache_requests_total{{namespace="{_label(namespace)}",result="{result}"}} {counts[key]}'
+            )
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_authorized(request):
+    """Staff o la cabecera ``Authorization: Bearer METRICS_TOKEN``"""
+    token = settings.METRICS_TOKEN
+    if token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    # Sin cookie de sesión no hay staff, y leer la sesión añadiría Vary: Cookie
+    if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        return False
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_active and user.is_staff)
+
+
+def finish_request(request, response, metrics, started):
+    """Cabecera Server-Timing, avisos de consultas repetidas y estadísticas de la vista"""
+    duration = time.perf_counter() - started
+    match = getattr(request, 'resolver_match', None)
+    view = match.view_name if match else 'sin_ruta'
+    duplicates = metrics.duplicates()
+    for sql, count in duplicates:
+        logger.warning('%s repitió %d veces la misma consulta: %s', view, count, sql)
+    record_request(view, duration, metrics, duplicates)
+    # Los tiempos delatan qué partes van a la base de datos o a la caché: no para cualquiera
+    if settings.SERVER_TIMING or metrics_authorized(request):
+        response['Server-Timing'] = metrics.server_timing(duration)
+    return response
@@ -0,0 +1,112 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import ThreadSensitiveContext
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+from django.urls import reverse
+
+from main import async_views, views
+from main.benchmarks import seed_books, seed_site, simulated_latency, summarize
+from main.models import Book
+
+VIEWS = ['home', 'events', 'library', 'gallery']
+
+
+def run_wsgi(view, path, total, concurrency):
+    """Vista síncrona en ``concurrency`` hilos, como workers de gunicorn"""
+    factory = RequestFactory()
+
+    def one(_):
+        request = factory.get(path, secure=True)
+        started = time.perf_counter()
+        view(request)
+        elapsed = time.perf_counter() - started
+        close_old_connections()
+        return elapsed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        samples = list(pool.map(one, range(total)))
+    return samples, time.perf_counter() - started
+
+
+def run_asgi(view, path, total, concurrency):
+    """Vista asíncrona con ``concurrency`` peticiones en vuelo en un único bucle de eventos"""
+    factory = AsyncRequestFactory()
+
+    async def one(semaphore):
+        async with semaphore:
+            # Como el manejador ASGI de Django: cada petición con su propio hilo síncrono
+            async with ThreadSensitiveContext():
+                request = factory.get(path, secure=True)
+                started = time.perf_counter()
+                await view(request)
+                return time.perf_counter() - started
+
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+        started = time.perf_counter()
+        samples = await asyncio.gather(*(one(semaphore) for _ in range(total)))
+        return samples, time.perf_counter() - started
+
+    return asyncio.run(main())
+
+
+class Command(BaseCommand):
+    help = 'Compara la latencia de las vistas síncronas (WSGI) y asíncronas (ASGI) con una base de datos lenta simulada'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help='Peticiones por vista y nivel')
+        parser.add_argument('--concurrency', type=int, action='append', help='Peticiones simultáneas (repetible)')
+        parser.add_argument('--latency-ms', type=float, default=20, help='Espera añadida a cada consulta')
+        parser.add_argument('--view', action='append', dest='views', choices=VIEWS)
+        parser.add_argument('--books', type=int, default=200)
+        parser.add_argument('--keep', action='store_true', help='Conservar los datos sembrados')
+
+    def handle(self, *args, **options):
+        levels = options['concurrency'] or [1, 10, 50]
+        names = options['views'] or VIEWS
+
+        # Los datos se confirman: las consultas concurrentes usan otras conexiones
+        self.stdout.write('Sembrando datos...')
+        book_ids = seed_books(options['books'])
+        created = seed_site()
+        try:
+            self.stdout.write(
+                f"Latencia simulada: {options['latency_ms']:.0f} ms por consulta, "
+                f"{options['requests']} peticiones por vista y nivel (sin caché)"
+            )
+            self.stdout.write(
+                f"{'vista':<10}{'conc.':>6}{'ruta':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}"
+            )
+            # Sin caché para medir siempre el camino que llega a la base de datos
+            cache_off = override_settings(
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+                ALLOWED_HOSTS=['testserver'],
+            )
+            with cache_off, simulated_latency(options['latency_ms'] / 1000):
+                for name in names:
+                    path = reverse(f'main:{name}')
+                    for concurrency in levels:
+                        self.report(name, concurrency, 'wsgi', run_wsgi(
+                            getattr(views, name), path, options['requests'], concurrency,
+                        ))
+                        self.report(name, concurrency, 'asgi', run_asgi(
+                            getattr(async_views, name), path, options['requests'], concurrency,
+                        ))
+        finally:
+            if not options['keep']:
+                for model, ids in created.items():
+                    model.objects.filter(pk__in=ids).delete()
+                Book.objects.filter(pk__in=book_ids).delete()
+
+    def report(self, name, concurrency, label, result):
+        samples, wall = result
+        stats = summarize(samples)
+        self.stdout.write(
+            f"{name:<10}{concurrency:>6}{label:>6}{stats['p50']:>10.1f}{stats['p95']:>10.1f}"
+            f"{stats['p99']:>10.1f}{len(samples) / wall:>10.1f}"
+        )
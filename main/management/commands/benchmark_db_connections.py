@@ -0,0 +1,95 @@
+import dj_database_url
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from decouple import config
+
+from main.benchmarks import LatencyProxy, database_settings, public_paths, run_requests, seed_books, seed_site, summarize
+from main.models import Book
+
+MODES = ['none', 'persistent', 'pool']
+
+
+def mode_settings(mode, concurrency, options):
+    """Claves de DATABASES['default'] de cada modo de reutilización"""
+    if mode == 'none':
+        return {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': options}
+    if mode == 'persistent':
+        return {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True, 'OPTIONS': options}
+    # Como en producción: tantas conexiones como hilos atienden peticiones
+    pool = {'min_size': concurrency, 'max_size': concurrency, 'timeout': 30}
+    return {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': True, 'OPTIONS': {**options, 'pool': pool}}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara la latencia de las páginas sin reutilizar conexiones, con conexiones persistentes '
+        'y con el pool de psycopg contra un PostgreSQL local con latencia de red simulada'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database-url', default=config('BENCHMARK_DATABASE_URL', default='postgres://postgres@127.0.0.1:5432/postgres'),
+            help='PostgreSQL de pruebas (se migra y se siembran datos que luego se borran)',
+        )
+        parser.add_argument('--rtt-ms', type=float, default=20, help='Ida y vuelta añadida a cada envío por la red')
+        parser.add_argument('--requests', type=int, default=200, help='Peticiones por modo y nivel')
+        parser.add_argument('--concurrency', type=int, action='append', help='Hilos en paralelo (repetible)')
+        parser.add_argument('--mode', action='append', dest='modes', choices=MODES)
+        parser.add_argument('--books', type=int, default=200)
+        parser.add_argument('--keep', action='store_true', help='Conservar los datos sembrados')
+
+    def handle(self, *args, **options):
+        target = dj_database_url.parse(options['database_url'])
+        if target['ENGINE'] != 'django.db.backends.postgresql':
+            raise CommandError('El benchmark necesita una base de datos PostgreSQL')
+        levels = options['concurrency'] or [1, 8]
+        modes = options['modes'] or MODES
+
+        with database_settings(**target):
+            call_command('migrate', verbosity=0)
+            self.stdout.write('Sembrando datos...')
+            book_ids = seed_books(options['books'])
+            created = seed_site()
+            paths = public_paths()
+            try:
+                self.benchmark(target, paths, modes, levels, options)
+            finally:
+                if not options['keep']:
+                    for model, ids in created.items():
+                        model.objects.filter(pk__in=ids).delete()
+                    Book.objects.filter(pk__in=book_ids).delete()
+
+    def benchmark(self, target, paths, modes, levels, options):
+        self.stdout.write(
+            f"RTT simulado: {options['rtt_ms']:.0f} ms, {options['requests']} peticiones por modo y nivel "
+            f"sobre {len(paths)} rutas (sin caché)"
+        )
+        self.stdout.write(
+            f"{'modo':<12}{'conc.':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'conexiones':>12}"
+        )
+        # Sin caché para que todas las peticiones lleguen a la base de datos
+        cache_off = override_settings(
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+            ALLOWED_HOSTS=['testserver'],
+        )
+        address = (target['HOST'] or '127.0.0.1', int(target['PORT'] or 5432))
+        with cache_off, LatencyProxy(address, options['rtt_ms'] / 1000) as proxy:
+            for mode in modes:
+                for concurrency in levels:
+                    overrides = mode_settings(mode, concurrency, target.get('OPTIONS', {}))
+                    with database_settings(HOST=proxy.host, PORT=proxy.port, **overrides):
+                        opened = proxy.connections
+                        try:
+                            results, wall = run_requests(paths, options['requests'], concurrency, warmup=concurrency)
+                        except RuntimeError as error:
+                            raise CommandError(error)
+                        samples = [elapsed for _, elapsed, _ in results]
+                        self.report(mode, concurrency, samples, wall, proxy.connections - opened)
+
+    def report(self, mode, concurrency, samples, wall, opened):
+        stats = summarize(samples)
+        self.stdout.write(
+            f"{mode:<12}{concurrency:>6}{stats['p50']:>10.1f}{stats['p95']:>10.1f}"
+            f"{stats['p99']:>10.1f}{len(samples) / wall:>10.1f}{opened:>12}"
+        )
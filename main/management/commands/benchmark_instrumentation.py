@@ -0,0 +1,78 @@
+import time
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory, override_settings
+
+from main.benchmarks import public_paths, seed_books, seed_site, summarize
+from main.instrumentation import reset_view_stats
+from main.models import Book
+
+
+def timed_get(handler, factory, path):
+    started = time.perf_counter()
+    response = handler(factory.get(path, secure=True).environ, lambda status, headers: None)
+    b''.join(response)
+    response.close()
+    if response.status_code >= 500:
+        raise CommandError(f'{path} respondió {response.status_code}')
+    return time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = 'Mide lo que añade PerformanceMiddleware (Server-Timing, consultas y plantillas) a cada petición'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Peticiones por ruta y modo')
+        parser.add_argument('--books', type=int, default=200)
+        parser.add_argument('--keep', action='store_true', help='Conservar los datos sembrados')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Sembrando datos...')
+        book_ids = seed_books(options['books'])
+        created = seed_site()
+        try:
+            self.benchmark(public_paths(), options['requests'])
+        finally:
+            reset_view_stats()
+            if not options['keep']:
+                for model, ids in created.items():
+                    model.objects.filter(pk__in=ids).delete()
+                Book.objects.filter(pk__in=book_ids).delete()
+
+    def benchmark(self, paths, total):
+        # Sin caché para que cada petición consulte y renderice de verdad
+        cache_off = override_settings(
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+            ALLOWED_HOSTS=['testserver'],
+        )
+        with cache_off:
+            with override_settings(PERFORMANCE_INSTRUMENTATION=False):
+                handlers = {'sin medir': WSGIHandler()}
+            with override_settings(PERFORMANCE_INSTRUMENTATION=True):
+                handlers['medido'] = WSGIHandler()
+            factory = RequestFactory()
+
+            self.stdout.write(f'{total} peticiones por ruta y modo, alternando los modos (sin caché)')
+            self.stdout.write(f"{'ruta':<28}{'sin medir ms':>14}{'medido ms':>12}{'extra ms':>10}{'extra %':>9}")
+            totals = {name: [] for name in handlers}
+            for path in paths:
+                samples = {name: [] for name in handlers}
+                for name, handler in handlers.items():
+                    timed_get(handler, factory, path)
+                # Alternando, el ruido de la máquina afecta por igual a los dos modos
+                for _ in range(total):
+                    for name, handler in handlers.items():
+                        samples[name].append(timed_get(handler, factory, path))
+                for name in handlers:
+                    totals[name].extend(samples[name])
+                self.report(path, samples)
+            self.report('todas', totals)
+
+    def report(self, label, samples):
+        off = summarize(samples['sin medir'])['p50']
+        on = summarize(samples['medido'])['p50']
+        extra = on - off
+        self.stdout.write(
+            f"{label:<28}{off:>14.2f}{on:>12.2f}{extra:>10.2f}{extra / off * 100 if off else 0:>8.1f}%"
+        )
@@ -0,0 +1,67 @@
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from main.benchmarks import LocalSMTPServer
+from main.models import Newsletter, NewsletterCampaign
+from main.newsletter import CampaignSender
+
+BACKENDS = {
+    'smtp': 'django.core.mail.backends.smtp.EmailBackend',
+    'locmem': 'django.core.mail.backends.locmem.EmailBackend',
+    'file': 'django.core.mail.backends.filebased.EmailBackend',
+}
+
+
+class Command(BaseCommand):
+    help = 'Mide el envío de una campaña (mensajes/s) a N suscriptores sembrados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=100000)
+        parser.add_argument('--workers', type=int, action='append',
+                            help='Número de workers a medir (repetible, por defecto 1 y 4)')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--backend', choices=sorted(BACKENDS), default='smtp',
+                            help='smtp usa un servidor SMTP local de pruebas')
+        parser.add_argument('--keep', action='store_true', help='Conservar suscriptores y campañas')
+
+    def handle(self, *args, **options):
+        count = options['subscribers']
+        self.stdout.write(f'Sembrando {count} suscriptores...')
+        first_id = (Newsletter.objects.order_by('-pk').values_list('pk', flat=True).first() or 0) + 1
+        Newsletter.objects.bulk_create(
+            [Newsletter(email=f'bench{n}@example.com', name=f'Lector {n}') for n in range(count)],
+            batch_size=5000, ignore_conflicts=True,
+        )
+        campaigns = []
+        mail_dir = tempfile.mkdtemp(prefix='newsletter-')
+        try:
+            with LocalSMTPServer() as smtp:
+                mail_settings = override_settings(
+                    EMAIL_BACKEND=BACKENDS[options['backend']], EMAIL_HOST=smtp.host,
+                    EMAIL_PORT=smtp.port, EMAIL_FILE_PATH=mail_dir,
+                )
+                with mail_settings:
+                    active = Newsletter.objects.filter(is_active=True).count()
+                    self.stdout.write(f"{active} suscriptores activos, backend {options['backend']}")
+                    self.stdout.write(f"{'workers':>8}{'enviados':>10}{'fallidos':>10}{'segundos':>10}{'msg/s':>10}{'conexiones':>12}")
+                    for workers in options['workers'] or [1, 4]:
+                        connections_before = smtp.connections
+                        campaign = NewsletterCampaign.objects.create(
+                            subject='Novedades de $name', body='Este mes leemos Pedro Páramo.',
+                        )
+                        campaigns.append(campaign)
+                        result = CampaignSender(campaign, workers=workers, batch_size=options['batch_size']).send()
+                        connections = smtp.connections - connections_before if options['backend'] == 'smtp' else '-'
+                        self.stdout.write(
+                            f"{workers:>8}{result['sent']:>10}{result['failed']:>10}"
+                            f"{result['seconds']:>10.1f}{result['rate']:>10.0f}{connections:>12}"
+                        )
+        finally:
+            shutil.rmtree(mail_dir, ignore_errors=True)
+            if not options['keep']:
+                for campaign in campaigns:
+                    campaign.delete()
+                Newsletter.objects.filter(pk__gte=first_id, email__startswith='bench').delete()
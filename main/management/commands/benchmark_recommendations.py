@@ -0,0 +1,79 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from main.recommendations import BATCH_SIZE, TOP_N, book_weights, genre_matrix, top_books
+
+
+def loop_top_books(member_genres, book_genres, weights, n):
+    """Lo mismo miembro a miembro y libro a libro en Python, como referencia"""
+    results = []
+    for favorites in member_genres:
+        scores = []
+        for book, genres in enumerate(book_genres):
+            common = len(favorites & genres)
+            if common:
+                scores.append((common / (len(favorites) * len(genres)) ** 0.5 * weights[book], book))
+        results.append(sorted(scores, reverse=True)[:n])
+    return results
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el cálculo de recomendaciones (matrices de géneros y top N por lotes) sobre datos '
+        'sintéticos en memoria, sin base de datos, y lo compara con un bucle por miembro'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=100000)
+        parser.add_argument('--books', type=int, default=50000)
+        parser.add_argument('--genres', type=int, default=30)
+        parser.add_argument('--top', type=int, default=TOP_N)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--loop-sample', type=int, default=20,
+                            help='Miembros con los que se mide el bucle en Python (0 = no medirlo)')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        members, books, genres = options['members'], options['books'], options['genres']
+        # De 0 a 4 géneros favoritos por miembro y de 1 a 3 por libro; reseñas con cola larga
+        member_counts = rng.integers(0, 5, members)
+        book_counts = rng.integers(1, 4, books)
+        member_pairs = np.column_stack([
+            np.repeat(np.arange(members), member_counts), rng.integers(0, genres, member_counts.sum()),
+        ])
+        book_pairs = np.column_stack([
+            np.repeat(np.arange(books), book_counts), rng.integers(0, genres, book_counts.sum()),
+        ])
+        rating_count = rng.zipf(2.0, books).clip(max=500) - 1
+        rating_sum = (rating_count * rng.uniform(1, 5, books)).round()
+
+        started = time.perf_counter()
+        member_matrix = genre_matrix(member_pairs, np.arange(members), np.arange(genres))
+        book_matrix = genre_matrix(book_pairs, np.arange(books), np.arange(genres))
+        weights = book_weights(rating_sum, rating_count)
+        built = time.perf_counter()
+        top, scores = top_books(member_matrix, book_matrix, weights, options['top'], options['batch_size'])
+        finished = time.perf_counter()
+
+        self.stdout.write(f'{members} miembros × {books} libros, {genres} géneros, top {options["top"]}')
+        self.stdout.write(f"{'matrices':<24}{built - started:>10.2f} s")
+        self.stdout.write(f"{'top N por lotes':<24}{finished - built:>10.2f} s")
+        self.stdout.write(f"{'total':<24}{finished - started:>10.2f} s  ({members / (finished - started):.0f} miembros/s)")
+
+        sample = min(options['loop_sample'], members)
+        if sample:
+            member_genres = [set() for _ in range(sample)]
+            for member, genre in member_pairs[member_pairs[:, 0] < sample].tolist():
+                member_genres[member].add(genre)
+            book_genres = [set() for _ in range(books)]
+            for book, genre in book_pairs.tolist():
+                book_genres[book].add(genre)
+            started = time.perf_counter()
+            loop_top_books(member_genres, book_genres, weights.tolist(), options['top'])
+            per_member = (time.perf_counter() - started) / sample
+            self.stdout.write(
+                f"{'bucle en Python':<24}{per_member * members:>10.2f} s  (estimado con {sample} miembros)"
+            )
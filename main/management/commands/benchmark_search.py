@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from main.benchmarks import measure, rollback_unless, seed_books, summarize
+from main.models import Book
+from main.search import search_backend, search_books, update_search_index
+
+DEFAULT_QUERIES = ['Garcia', 'García Márquez', 'soledad', 'rio', 'corazon invierno', 'Borges laberinto']
+
+
+def legacy_search(queryset, query):
+    """Búsqueda original de la vista library (ILIKE '%x%' sobre título y autor)"""
+    return queryset.filter(Q(title__icontains=query) | Q(author__icontains=query))
+
+
+class Command(BaseCommand):
+    help = 'Compara la búsqueda icontains con el motor de texto completo sobre un catálogo sembrado'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=100000, help='Libros a sembrar (0 = usar los existentes)')
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--query', action='append', dest='queries', help='Consulta a medir (repetible)')
+        parser.add_argument('--keep', action='store_true', help='Conservar los libros sembrados')
+
+    def handle(self, *args, **options):
+        queries = options['queries'] or DEFAULT_QUERIES
+        with rollback_unless(options['keep']):
+            if options['books']:
+                self.stdout.write(f"Sembrando {options['books']} libros...")
+                seed_books(options['books'])
+                update_search_index()
+
+            books = Book.objects.filter(reading_status='completed').order_by('-reading_end_date')
+            self.stdout.write(
+                f'Catálogo: {books.count()} libros, motor: {search_backend()}, repeticiones: {options["repeat"]}'
+            )
+            self.stdout.write(f"{'consulta':<22}{'ruta':<12}{'resultados':>11}{'p50 ms':>10}{'p95 ms':>10}")
+
+            for query in queries:
+                for label, build in (('icontains', legacy_search), ('search', search_books)):
+                    queryset = build(books, query)
+
+                    # Lo mismo que hace la vista: contar y leer la primera página
+                    def run():
+                        queryset.count()
+                        list(queryset[:12])
+
+                    stats = summarize(measure(run, repeat=options['repeat']))
+                    self.stdout.write(
+                        f"{query:<22}{label:<12}{queryset.count():>11}{stats['p50']:>10.2f}{stats['p95']:>10.2f}"
+                    )
@@ -0,0 +1,138 @@
+import json
+import platform
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+
+from main.benchmarks import admin_paths, public_paths, run_requests, summarize
+
+
+def compare(results, baseline, max_regression):
+    """
+    Cambios respecto a ``baseline`` de cada ruta y nivel medidos en ambos:
+    ``[(ruta, nivel, p95 antes, p95 ahora, consultas antes, consultas ahora, ¿regresión?)]``.
+    Es regresión si el p95 empeora más de ``max_regression`` % o hay más consultas.
+    """
+    changes = []
+    for path, levels in results.items():
+        for level, now in levels.items():
+            before = baseline.get(path, {}).get(level)
+            if before is None:
+                continue
+            slower = now['p95'] > before['p95'] * (1 + max_regression / 100)
+            more_queries = now['queries'] > before['queries']
+            changes.append((
+                path, level, before['p95'], now['p95'], before['queries'], now['queries'], slower or more_queries,
+            ))
+    return changes
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide p50/p95/p99, peticiones por segundo y consultas de cada ruta pública y de cada '
+        'listado del admin a varios niveles de concurrencia; guarda el resultado en JSON y lo '
+        'compara con una ejecución anterior'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help='Peticiones por ruta y nivel')
+        parser.add_argument('--concurrency', type=int, action='append', help='Hilos en paralelo (repetible)')
+        parser.add_argument('--path', action='append', dest='paths', help='Sólo las rutas que contengan este texto')
+        parser.add_argument('--no-admin', action='store_true', help='Sin los listados del admin')
+        parser.add_argument('--no-cache', action='store_true', help='Sin caché: todas las peticiones van a la base de datos')
+        parser.add_argument('--output', default='benchmark.json', help='Archivo JSON con los resultados')
+        parser.add_argument('--baseline', help='JSON de una ejecución anterior con el que comparar')
+        parser.add_argument(
+            '--max-regression', type=float, default=None,
+            help='Falla si el p95 de alguna ruta empeora más de este porcentaje o ejecuta más consultas',
+        )
+
+    def handle(self, *args, **options):
+        levels = options['concurrency'] or [1, 8, 32]
+        paths = public_paths()
+        if not options['no_admin']:
+            paths += admin_paths()
+        if options['paths']:
+            paths = [path for path in paths if any(text in path for text in options['paths'])]
+        if not paths:
+            raise CommandError('Ninguna ruta coincide con --path')
+
+        overrides = {'ALLOWED_HOSTS': ['testserver']}
+        if options['no_cache']:
+            overrides['CACHES'] = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+        user, created = User.objects.get_or_create(
+            username='benchmark', defaults={'is_staff': True, 'is_superuser': True},
+        )
+        try:
+            with override_settings(**overrides):
+                client = Client()
+                client.force_login(user)
+                results = self.benchmark(paths, levels, options['requests'], client.cookies)
+        finally:
+            if created:
+                user.delete()
+
+        report = {
+            'meta': {
+                'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'requests': options['requests'],
+                'concurrency': levels,
+                'cache': not options['no_cache'],
+                'database': connection.vendor,
+                'server_mode': settings.SERVER_MODE,
+                'python': platform.python_version(),
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as stream:
+            json.dump(report, stream, indent=2, ensure_ascii=False)
+        self.stdout.write(f"Resultados en {options['output']}")
+
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as stream:
+                baseline = json.load(stream)['results']
+            self.compare(results, baseline, options['max_regression'])
+
+    def benchmark(self, paths, levels, total, cookies):
+        self.stdout.write(
+            f"{'ruta':<40}{'conc.':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'consultas':>11}"
+        )
+        results = {}
+        for path in paths:
+            results[path] = {}
+            for concurrency in levels:
+                try:
+                    # El calentamiento llena la caché y abre las conexiones de cada hilo
+                    samples, wall = run_requests([path], total, concurrency, warmup=concurrency, cookies=cookies)
+                except RuntimeError as error:
+                    raise CommandError(error)
+                stats = summarize([elapsed for _, elapsed, _ in samples])
+                stats['rps'] = len(samples) / wall if wall else 0.0
+                stats['queries'] = sum(queries for _, _, queries in samples) / len(samples)
+                results[path][str(concurrency)] = {key: round(value, 2) for key, value in stats.items()}
+                self.stdout.write(
+                    f"{path:<40}{concurrency:>6}{stats['p50']:>10.1f}{stats['p95']:>10.1f}"
+                    f"{stats['p99']:>10.1f}{stats['rps']:>10.1f}{stats['queries']:>11.1f}"
+                )
+        return results
+
+    def compare(self, results, baseline, max_regression):
+        changes = compare(results, baseline, max_regression or 0)
+        self.stdout.write(f"\n{'ruta':<40}{'conc.':>6}{'p95 antes':>11}{'p95 ahora':>11}{'cambio':>9}{'consultas':>13}")
+        for path, level, before, now, queries_before, queries_now, regressed in changes:
+            change = (now - before) / before * 100 if before else 0.0
+            line = (
+                f'{path:<40}{level:>6}{before:>11.1f}{now:>11.1f}{change:>8.1f}%'
+                f'{queries_before:>6.1f} → {queries_now:<5.1f}'
+            )
+            self.stdout.write(self.style.ERROR(line) if regressed and max_regression is not None else line)
+        regressions = [change for change in changes if change[-1]]
+        if max_regression is not None and regressions:
+            raise CommandError(
+                f'Rutas que empeoran más de un {max_regression:g} % o hacen más consultas que la línea base: {len(regressions)}'
+            )
@@ -0,0 +1,70 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main import assets
+from main.benchmarks import public_paths
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera en GENERATED_ASSETS_DIR main/css/elixir.css (Bootstrap, Font Awesome y estilos del sitio '
+        'sin las reglas no usadas), el CSS crítico en línea y las fuentes de iconos recortadas'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Falla si los archivos generados no están al día')
+        parser.add_argument('--report', action='store_true', help='Muestra el peso del HTML de cada página')
+        parser.add_argument('--save-report', metavar='JSON', help='Guarda el peso de cada página en JSON')
+        parser.add_argument('--baseline', metavar='JSON', help='Compara con un informe guardado antes')
+
+    def handle(self, *args, **options):
+        outputs = assets.build()
+        stale = [
+            name for name, data in outputs.items()
+            if not assets.output_path(name).exists() or assets.output_path(name).read_bytes() != data
+        ]
+        if options['check']:
+            if stale:
+                raise CommandError(f'Archivos sin regenerar (python manage.py build_assets): {", ".join(stale)}')
+            self.stdout.write('Archivos generados al día.')
+        else:
+            for name in stale:
+                path = assets.output_path(name)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(outputs[name])
+            self.stdout.write(self.style.SUCCESS(f'{len(stale)} archivos actualizados.'))
+        self.asset_report(outputs)
+        if options['report'] or options['save_report'] or options['baseline']:
+            self.page_report(options)
+
+    def asset_report(self, outputs):
+        css = b''.join(path.read_bytes() for path in assets.SOURCES)
+        fonts = b''.join((assets.FONTS_DIR / f'{name}.ttf').read_bytes() for name in assets.FONTS)
+        built_fonts = b''.join(data for name, data in outputs.items() if name.endswith('.woff2'))
+        rows = [
+            ('CSS (Bootstrap + Font Awesome + sitio)', assets.sizes(css), assets.sizes(outputs[assets.BUNDLE])),
+            ('Fuentes de iconos (ttf -> woff2)', assets.sizes(fonts), assets.sizes(built_fonts)),
+            ('CSS crítico en línea', None, assets.sizes(outputs[assets.CRITICAL])),
+        ]
+        for label, before, after in rows:
+            source = f'{before[0]:>8} B ({before[1]:>7} B gzip) -> ' if before else ''
+            self.stdout.write(f'  {label:<40} {source}{after[0]:>8} B ({after[1]:>7} B gzip)')
+
+    def page_report(self, options):
+        weights = assets.page_weights(public_paths())
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as stream:
+                baseline = json.load(stream)
+        self.stdout.write(f'  {"Página":<28} {"HTML":>8} {"gzip":>7} {"en línea":>9} {"ahorro":>8} {"ahorro gzip":>12}')
+        for path, weight in weights.items():
+            line = f'  {path:<28} {weight["html"]:>8} {weight["html_gzip"]:>7} {weight["inline"]:>9}'
+            if path in baseline:
+                saved = baseline[path]['html'] - weight['html']
+                saved_gzip = baseline[path]['html_gzip'] - weight['html_gzip']
+                line += f' {saved:>8} {saved_gzip:>12}'
+            self.stdout.write(line)
+        if options['save_report']:
+            with open(options['save_report'], 'w', encoding='utf-8') as stream:
+                json.dump(weights, stream, indent=2)
@@ -0,0 +1,73 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from main.http_cache import touch_content
+from main.images import IMAGE_FIELDS, build_variants, fetch_image, get_manifest, image_sources
+
+
+def process(url):
+    try:
+        return url, build_variants(fetch_image(url))
+    except Exception as error:
+        return url, {'error': f'{type(error).__name__}: {error}'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Descarga las imágenes de portadas, galería y perfiles y genera sus variantes WebP/JPEG '
+        'redimensionadas (IMAGE_VARIANT_WIDTHS) en IMAGE_VARIANTS_ROOT'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Descargas en paralelo')
+        parser.add_argument('--force', action='store_true', help='Regenera también las ya procesadas')
+        parser.add_argument('--retry-failed', action='store_true', help='Reintenta las que fallaron')
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Segundos entre pasadas; con 0 hace una sola (modo worker si es mayor)',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            self.build(options)
+            if not options['interval']:
+                break
+            close_old_connections()
+            time.sleep(options['interval'])
+
+    def build(self, options):
+        manifest = get_manifest()
+        entries = dict(manifest.load())
+        pending = [
+            url for url in image_sources()
+            if options['force'] or url not in entries
+            or (options['retry_failed'] and 'error' in entries[url])
+        ]
+        if not pending:
+            if options['verbosity'] > 1:
+                self.stdout.write('Sin imágenes nuevas.')
+            return
+
+        start = time.perf_counter()
+        built = failed = 0
+        # Las descargas y el redimensionado van en hilos; el manifiesto sólo lo escribe este
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for url, entry in executor.map(process, pending):
+                entries[url] = entry
+                if 'error' in entry:
+                    failed += 1
+                    self.stderr.write(f'  {url}: {entry["error"]}')
+                else:
+                    built += 1
+        manifest.save(entries)
+        if built:
+            # Las páginas cacheadas siguen con las URLs originales hasta que cambie su versión
+            for model, _ in IMAGE_FIELDS:
+                touch_content(model)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{built} imágenes procesadas y {failed} fallidas en {time.perf_counter() - start:.1f}s.'
+        ))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.catalog_import import BookImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa libros desde CSV o JSONL por lotes (bulk_create), creando los géneros que falten '
+        'y actualizando los libros cuyo ISBN ya existe'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Archivo .csv o .jsonl ("-" para la entrada estándar)')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Por defecto según la extensión')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Filas por transacción')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        def progress(stats):
+            if options['verbosity'] > 0:
+                rate = stats['rows'] / stats['seconds'] if stats['seconds'] else 0
+                self.stdout.write(
+                    f"  {stats['rows']} filas ({stats['created']} nuevos, {stats['updated']} actualizados) "
+                    f"- {rate:.0f} filas/s"
+                )
+
+        importer = BookImporter(
+            batch_size=options['batch_size'], using=options['database'], progress=progress,
+        )
+        try:
+            stats = importer.import_rows(read_rows(options['path'], options['format']))
+        except (OSError, ValueError) as error:
+            raise CommandError(f'No se pudo leer {options["path"]}: {error}')
+
+        for error in stats['errors']:
+            self.stderr.write(f'  {error}')
+        rate = stats['rows'] / stats['seconds'] if stats['seconds'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['rows']} filas en {stats['seconds']:.1f}s ({rate:.0f} filas/s): "
+            f"{stats['created']} libros creados, {stats['updated']} actualizados, "
+            f"{stats['genres_created']} géneros nuevos, {stats['skipped']} descartadas."
+        ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from main.models import Book
+from main.search import search_backend, update_search_index
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda de libros (tsvector en PostgreSQL, FTS5 en SQLite)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        backend = search_backend(using)
+        if backend == 'icontains':
+            self.stdout.write(self.style.WARNING(
+                'La base de datos no tiene índice de texto completo; se usará icontains.'
+            ))
+            return
+
+        batch_size = options['batch_size']
+        book_ids = Book.objects.using(using).order_by('pk').values_list('pk', flat=True)
+        total = 0
+        batch = []
+        for book_id in book_ids.iterator(chunk_size=batch_size):
+            batch.append(book_id)
+            if len(batch) >= batch_size:
+                total += update_search_index(batch, using=using)
+                batch = []
+        if batch:
+            total += update_search_index(batch, using=using)
+
+        self.stdout.write(self.style.SUCCESS(f'{total} libros indexados ({backend}).'))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.ratings import recompute_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recalcula por lotes el promedio, el número y el histograma de calificaciones de cada libro'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--book', type=int, action='append', dest='book_ids',
+                            help='Recalcula sólo este libro (se puede repetir)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = recompute_ratings(
+            options['book_ids'], using=options['database'], batch_size=options['batch_size'],
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'{total} libros recalculados en {elapsed:.2f}s.'))
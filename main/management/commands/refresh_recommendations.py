@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.recommendations import BATCH_SIZE, TOP_N, refresh_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Recalcula las recomendaciones de libros de todos los miembros activos y sustituye las guardadas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=TOP_N, help='Libros por miembro')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Filas por multiplicación')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = refresh_recommendations(options['top'], options['batch_size'], using=options['database'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'{total} recomendaciones guardadas en {elapsed:.2f}s.'))
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main.benchmarks import seed_books, seed_members, seed_reviews, seed_site, seed_suggestions
+from main.caching import HOME_BLOCKS, invalidate_home_blocks
+from main.models import Book
+from main.ratings import recompute_ratings
+from main.search import search_backend, update_search_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Siembra datos realistas a la escala indicada (libros con géneros y reseñas, eventos, '
+        'entradas, miembros, galería y sugerencias) con inserciones por lotes, para benchmark_site'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=2000, help='Libros ya leídos')
+        parser.add_argument('--upcoming', type=int, default=12, help='Libros por leer')
+        parser.add_argument('--reviews', type=int, default=3, help='Reseñas por libro (de media)')
+        parser.add_argument('--events', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=200)
+        parser.add_argument('--images', type=int, default=300)
+        parser.add_argument('--members', type=int, default=1000)
+        parser.add_argument('--suggestions', type=int, default=100)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0, help='Semilla: la misma escala da los mismos datos')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        seed = options['seed']
+        batch_size = options['batch_size']
+        with transaction.atomic():
+            book_ids = seed_books(options['books'], batch_size=batch_size, seed=seed)
+            book_ids += seed_books(
+                options['upcoming'], batch_size=batch_size, seed=seed + 1,
+                reading_status='upcoming', offset=options['books'],
+            )
+            created = seed_site(options['events'], options['posts'], options['images'], seed=seed)
+            reviews = seed_reviews(book_ids, options['reviews'], batch_size=batch_size, seed=seed)
+            members = seed_members(options['members'], batch_size=batch_size, seed=seed)
+            suggestions = seed_suggestions(options['suggestions'], seed=seed)
+            # bulk_create no envía señales: agregados, índice de búsqueda y portada se rehacen aquí
+            recompute_ratings(book_ids, batch_size=batch_size)
+            if search_backend() != 'icontains':
+                update_search_index(book_ids + created[Book])
+            invalidate_home_blocks(*HOME_BLOCKS)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(book_ids) + 1} libros, {reviews} reseñas, {options["events"]} eventos, '
+            f'{options["posts"]} entradas, {options["images"]} imágenes, {len(members)} miembros y '
+            f'{len(suggestions)} sugerencias en {elapsed:.1f}s.'
+        ))
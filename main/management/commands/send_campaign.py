@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main.models import NewsletterCampaign
+from main.newsletter import CampaignSender
+
+
+class Command(BaseCommand):
+    help = 'Envía (o reanuda) una campaña de newsletter a los suscriptores activos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('campaign_id', type=int)
+        parser.add_argument('--workers', type=int, default=settings.NEWSLETTER_WORKERS,
+                            help='Hilos de envío (al reanudar se usa el de la primera ejecución)')
+        parser.add_argument('--batch-size', type=int, default=settings.NEWSLETTER_BATCH_SIZE)
+        parser.add_argument('--backend', help='Backend de correo (por defecto EMAIL_BACKEND)')
+
+    def handle(self, *args, **options):
+        try:
+            campaign = NewsletterCampaign.objects.get(pk=options['campaign_id'])
+        except NewsletterCampaign.DoesNotExist:
+            raise CommandError(f"No existe la campaña {options['campaign_id']}.")
+        if campaign.status == 'sent':
+            raise CommandError(f'La campaña "{campaign}" ya se envió.')
+
+        def progress(index, sent, failed):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  worker {index}: +{sent} enviados, +{failed} fallidos')
+
+        sender = CampaignSender(
+            campaign, workers=options['workers'], batch_size=options['batch_size'],
+            backend=options['backend'], progress=progress,
+        )
+        self.stdout.write(f'Enviando "{campaign}" con {sender.workers} workers...')
+        result = sender.send()
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['sent']} enviados, {result['failed']} fallidos en {result['seconds']:.1f}s "
+            f"({result['rate']:.0f} mensajes/s)."
+        ))
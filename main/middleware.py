@@ -0,0 +1,111 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import Resolver404
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .db_router import pin_to_primary, request_routing
+from .images import VARIANT_NAME_RE
+from .instrumentation import finish_request, install_query_timer, measure_request
+from .query_budget import check_query_budget
+
+
+class QueryBudgetMiddleware:
+    """
+    En desarrollo (DEBUG y QUERY_BUDGET_ENFORCE) falla la petición si la vista
+    supera el número de consultas declarado con ``@query_budget``.
+    """
+
+    def __init__(self, get_response):
+        if not (settings.DEBUG and getattr(settings, 'QUERY_BUDGET_ENFORCE', False)):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.get_response(request)
+        try:
+            check_query_budget(request.path_info, captured.captured_queries)
+        except Resolver404:
+            pass
+        return response
+
+
+class PerformanceMiddleware:
+    """
+    Consultas, tiempo de base de datos y de plantillas y aciertos de caché de
+    cada petición en la cabecera ``Server-Timing``, con avisos de consultas
+    lentas o repetidas y percentiles por vista (ver main/instrumentation.py).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        install_query_timer()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with measure_request() as metrics:
+            response = self.get_response(request)
+        return finish_request(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with measure_request() as metrics:
+            response = await self.get_response(request)
+        return finish_request(request, response, metrics, started)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Estado de enrutado de cada petición para ``main.db_router.ReplicaRouter``;
+    si la petición escribe, fija al cliente a la primaria unos segundos.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with request_routing(request) as state:
+            response = self.get_response(request)
+        return pin_to_primary(state, response)
+
+    async def __acall__(self, request):
+        with request_routing(request) as state:
+            response = await self.get_response(request)
+        return pin_to_primary(state, response)
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise que además sirve las variantes de imágenes (``IMAGE_VARIANTS_ROOT``)
+    con caché de un año e ``immutable``: su nombre lleva el hash del contenido.
+    Las generadas después de arrancar las sirve ``views.image_variant``.
+    """
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings=settings)
+        if self.autorefresh or settings.IMAGE_VARIANTS_ROOT.is_dir():
+            self.add_files(settings.IMAGE_VARIANTS_ROOT, prefix=settings.IMAGE_VARIANTS_URL)
+
+    def immutable_file_test(self, path, url):
+        if url.startswith(settings.IMAGE_VARIANTS_URL):
+            return VARIANT_NAME_RE.fullmatch(url[len(settings.IMAGE_VARIANTS_URL):]) is not None
+        return super().immutable_file_test(path, url)
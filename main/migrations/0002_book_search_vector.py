@@ -0,0 +1,72 @@
+# Generated by Django 5.2.5 on 2026-10-18 01:54
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.utils import OperationalError
+
+
+def create_search_structures(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS main_book_search_vector_gin '
+            'ON main_book USING gin (search_vector)'
+        )
+    elif vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                'CREATE VIRTUAL TABLE IF NOT EXISTS main_book_fts USING fts5('
+                'title, author, synopsis, genres, '
+                "tokenize = 'unicode61 remove_diacritics 2')"
+            )
+            # Pesos de bm25() por columna, equivalentes a los pesos A/A/C/B de PostgreSQL
+            schema_editor.execute(
+                "INSERT INTO main_book_fts (main_book_fts, rank) "
+                "VALUES ('rank', 'bm25(10.0, 10.0, 1.0, 4.0)')"
+            )
+        except OperationalError:
+            # SQLite compilado sin FTS5: main.search usa icontains como respaldo
+            return
+    else:
+        return
+
+    from main.search import update_search_index
+    update_search_index(using=schema_editor.connection.alias)
+
+
+def drop_search_structures(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS main_book_search_vector_gin')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS main_book_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='BookSearchEntry',
+            fields=[
+                ('book', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='main.book')),
+                ('document', models.TextField(db_column='main_book_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'main_book_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search_structures, drop_search_structures),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.5 on 2026-10-18 02:10
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_ratings(apps, schema_editor):
+    # Carga inicial desde las reseñas existentes; después la mantienen las señales
+    Book = apps.get_model('main', 'Book')
+    BookReview = apps.get_model('main', 'BookReview')
+    using = schema_editor.connection.alias
+    histogram = {f'rating_{r}_count': Count('id', filter=Q(rating=r)) for r in range(1, 6)}
+    rows = (
+        BookReview.objects.using(using).order_by().values('book_id')
+        .annotate(rating_count=Count('id'), rating_sum=Sum('rating'), **histogram)
+    )
+    # Sólo los libros con reseñas: los demás conservan el promedio escrito a mano
+    books = []
+    for row in rows:
+        book = Book(pk=row.pop('book_id'), **row)
+        book.average_rating = round(book.rating_sum / book.rating_count, 2)
+        books.append(book)
+    fields = ['rating_count', 'rating_sum', 'average_rating'] + list(histogram)
+    Book.objects.using(using).bulk_update(books, fields, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_book_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Número de Reseñas'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='average_rating',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=3, verbose_name='Calificación Promedio'),
+        ),
+        # Al revertir no hay datos que deshacer: AddField quita las columnas nuevas y
+        # average_rating queda con el promedio de las reseñas, válido para el campo anterior
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
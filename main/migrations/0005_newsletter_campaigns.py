@@ -0,0 +1,65 @@
+# Generated by Django 5.2.5 on 2026-10-18 02:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_content_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsletterCampaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=200, verbose_name='Asunto')),
+                ('body', models.TextField(help_text='Texto del correo. $name y $email se sustituyen por los datos de cada suscriptor.', verbose_name='Contenido')),
+                ('status', models.CharField(choices=[('draft', 'Borrador'), ('sending', 'Enviando'), ('sent', 'Enviada')], default='draft', max_length=20, verbose_name='Estado')),
+                ('workers', models.PositiveSmallIntegerField(blank=True, editable=False, help_text='Número de particiones fijado en el primer envío; se reutiliza al reanudar', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Inicio del Envío')),
+                ('finished_at', models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Fin del Envío')),
+            ],
+            options={
+                'verbose_name': 'Campaña de Newsletter',
+                'verbose_name_plural': 'Campañas de Newsletter',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CampaignFailure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254, verbose_name='Email')),
+                ('error', models.TextField(verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('subscriber', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='main.newsletter')),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='failures', to='main.newslettercampaign')),
+            ],
+            options={
+                'verbose_name': 'Envío Fallido',
+                'verbose_name_plural': 'Envíos Fallidos',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CampaignShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField()),
+                ('last_subscriber_id', models.BigIntegerField(default=0)),
+                ('sent_count', models.PositiveIntegerField(default=0)),
+                ('failed_count', models.PositiveIntegerField(default=0)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='main.newslettercampaign')),
+            ],
+            options={
+                'verbose_name': 'Progreso de Campaña',
+                'verbose_name_plural': 'Progreso de Campañas',
+                'constraints': [models.UniqueConstraint(fields=('campaign', 'index'), name='unique_campaign_shard')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 02:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_newsletter_campaigns'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='book',
+            name='isbn',
+            field=models.CharField(blank=True, db_index=True, max_length=13, verbose_name='ISBN'),
+        ),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:18
+
+from django.db import migrations, models
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    """
+    ``CREATE INDEX CONCURRENTLY`` en PostgreSQL, que no bloquea las escrituras
+    mientras se construye; en el resto de motores, un índice normal.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            if schema_editor.connection.vendor == 'postgresql':
+                schema_editor.add_index(model, self.index, concurrently=True)
+            else:
+                schema_editor.add_index(model, self.index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            if schema_editor.connection.vendor == 'postgresql':
+                schema_editor.remove_index(model, self.index, concurrently=True)
+            else:
+                schema_editor.remove_index(model, self.index)
+
+
+class Migration(migrations.Migration):
+    # CONCURRENTLY no puede ejecutarse dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('main', '0006_book_isbn_index'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='blogpost',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['-created_at', '-id'], name='blogpost_published_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='blogpost',
+            index=models.Index(condition=models.Q(('is_featured', True), ('is_published', True)), fields=['-created_at'], name='blogpost_featured_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='blogpost',
+            index=models.Index(fields=['updated_at'], name='blogpost_updated_at_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='bookreview',
+            index=models.Index(fields=['created_at'], name='bookreview_created_at_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='book',
+            index=models.Index(fields=['reading_status', '-reading_end_date', '-id'], name='book_status_end_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='book',
+            index=models.Index(fields=['reading_status', 'reading_start_date'], name='book_status_start_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='book',
+            index=models.Index(fields=['updated_at'], name='book_updated_at_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='booksuggestion',
+            index=models.Index(fields=['status', '-created_at'], name='suggestion_status_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='event',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['date'], name='event_active_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='event',
+            index=models.Index(fields=['date'], name='event_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='event',
+            index=models.Index(fields=['updated_at'], name='event_updated_at_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='gallery',
+            index=models.Index(fields=['-upload_date', '-id'], name='gallery_upload_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='gallery',
+            index=models.Index(condition=models.Q(('is_featured', True)), fields=['-upload_date'], name='gallery_featured_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='gallery',
+            index=models.Index(fields=['updated_at'], name='gallery_updated_at_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='member',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['name'], name='member_active_name_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='member',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-join_date'], name='member_active_joined_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='member',
+            index=models.Index(fields=['updated_at'], name='member_updated_at_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:30
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='confirmed_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Plazas Confirmadas'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='waitlist_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='En Lista de Espera'),
+        ),
+        migrations.CreateModel(
+            name='EventRegistration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Nombre')),
+                ('email', models.EmailField(max_length=254, verbose_name='Email')),
+                ('status', models.CharField(choices=[('confirmed', 'Confirmada'), ('waitlisted', 'En lista de espera'), ('cancelled', 'Cancelada')], max_length=20, verbose_name='Estado')),
+                ('token', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='registrations', to='main.event', verbose_name='Evento')),
+            ],
+            options={
+                'verbose_name': 'Inscripción',
+                'verbose_name_plural': 'Inscripciones',
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['event', 'status', 'created_at', 'id'], name='registration_queue_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status', 'cancelled'), _negated=True), fields=('event', 'email'), name='unique_active_registration')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_event_registrations'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['id', 'updated_at'], name='blogpost_sitemap_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['id', 'created_at'], name='event_sitemap_idx'),
+        ),
+    ]
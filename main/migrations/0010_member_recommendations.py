@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_sitemap_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Posición')),
+                ('score', models.FloatField(verbose_name='Puntuación')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.book', verbose_name='Libro')),
+                ('member', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='main.member', verbose_name='Miembro')),
+            ],
+            options={
+                'verbose_name': 'Recomendación',
+                'verbose_name_plural': 'Recomendaciones',
+                'ordering': ['member', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('member', 'rank'), name='unique_member_recommendation_rank')],
+            },
+        ),
+    ]
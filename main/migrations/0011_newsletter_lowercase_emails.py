@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:03
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models.functions import Lower, Trim
+
+
+def merge_emails(apps, schema_editor):
+    """
+    Pasa los emails a minúsculas y funde las filas que sólo se distinguían por
+    mayúsculas: queda la más antigua, activa si alguna lo estaba y con el
+    primer nombre no vacío; los fallos de campañas pasan a apuntar a ella.
+    """
+    Newsletter = apps.get_model('main', 'Newsletter')
+    CampaignFailure = apps.get_model('main', 'CampaignFailure')
+    using = schema_editor.connection.alias
+    subscribers = Newsletter.objects.using(using).annotate(normalized=Lower(Trim('email')))
+    changed = sorted(set(subscribers.exclude(email=models.F('normalized')).values_list('normalized', flat=True)))
+    for start in range(0, len(changed), 500):
+        groups = {}
+        rows = subscribers.filter(normalized__in=changed[start:start + 500]).order_by('subscribed_at', 'pk')
+        for subscriber in rows:
+            groups.setdefault(subscriber.normalized, []).append(subscriber)
+        for email, (kept, *duplicates) in groups.items():
+            duplicate_ids = [subscriber.pk for subscriber in duplicates]
+            CampaignFailure.objects.using(using).filter(subscriber_id__in=duplicate_ids).update(subscriber_id=kept.pk)
+            Newsletter.objects.using(using).filter(pk__in=duplicate_ids).delete()
+            kept.email = email
+            kept.is_active = any(subscriber.is_active for subscriber in [kept] + duplicates)
+            kept.name = next((subscriber.name for subscriber in [kept] + duplicates if subscriber.name), '')
+            kept.save(update_fields=['email', 'is_active', 'name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_member_recommendations'),
+    ]
+
+    operations = [
+        # Las filas fundidas no se pueden separar de nuevo: al revertir se quedan en minúsculas
+        migrations.RunPython(merge_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='newsletter',
+            constraint=models.CheckConstraint(condition=models.Q(('email', django.db.models.functions.text.Lower('email'))), name='newsletter_email_lowercase', violation_error_message='El email debe estar en minúsculas.'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def copy_updated_at(apps, schema_editor):
+    # Sin historial: el último cambio conocido de cada evento
+    Event = apps.get_model('main', 'Event')
+    Event.objects.using(schema_editor.connection.alias).update(details_updated_at=models.F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_newsletter_lowercase_emails'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='details_updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Última Modificación de los Datos'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='sequence',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Revisión'),
+        ),
+        migrations.RunPython(copy_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('is_active', False)), fields=['details_updated_at'], name='event_cancelled_idx'),
+        ),
+    ]
@@ -1,4 +1,8 @@
+import uuid
+
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils import timezone
@@ -23,7 +27,7 @@ class Book(models.Model):
     
     title = models.CharField(max_length=200, verbose_name="Título")
     author = models.CharField(max_length=200, verbose_name="Autor")
-    isbn = models.CharField(max_length=13, blank=True, verbose_name="ISBN")
+    isbn = models.CharField(max_length=13, blank=True, db_index=True, verbose_name="ISBN")
     publication_year = models.IntegerField(blank=True, null=True, verbose_name="Año de Publicación")
     synopsis = models.TextField(verbose_name="Sinopsis")
     cover_image = models.URLField(blank=True, verbose_name="URL de Portada")
@@ -31,16 +35,55 @@ class Book(models.Model):
     reading_status = models.CharField(max_length=20, choices=READING_STATUS_CHOICES, default='upcoming', verbose_name="Estado de Lectura")
     reading_start_date = models.DateField(blank=True, null=True, verbose_name="Fecha de Inicio")
     reading_end_date = models.DateField(blank=True, null=True, verbose_name="Fecha de Finalización")
-    average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0, verbose_name="Calificación Promedio")
+    # Agregados de BookReview mantenidos por main.ratings (no se editan a mano)
+    average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0, editable=False, verbose_name="Calificación Promedio")
+    rating_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Número de Reseñas")
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Mantenido por main.search (PostgreSQL); en SQLite se usa la tabla FTS5 main_book_fts
+    search_vector = SearchVectorField(null=True, editable=False)
     
     def __str__(self):
         return f"{self.title} - {self.author}"
     
+    @property
+    def rating_histogram(self):
+        """Distribución de calificaciones de 5 a 1 estrellas con su porcentaje"""
+        histogram = []
+        for stars in range(5, 0, -1):
+            count = getattr(self, f'rating_{stars}_count')
+            percent = round(count * 100 / self.rating_count) if self.rating_count else 0
+            histogram.append({'stars': stars, 'count': count, 'percent': percent})
+        return histogram
+    
     class Meta:
         verbose_name = "Libro"
         verbose_name_plural = "Libros"
         ordering = ['-created_at']
+        indexes = [
+            # Biblioteca: completados por fecha de lectura, paginados por cursor
+            models.Index(fields=['reading_status', '-reading_end_date', '-id'], name='book_status_end_date_idx'),
+            models.Index(fields=['reading_status', 'reading_start_date'], name='book_status_start_date_idx'),
+            # Versión de las páginas públicas (http_cache.latest)
+            models.Index(fields=['updated_at'], name='book_updated_at_idx'),
+        ]
+
+class BookSearchEntry(models.Model):
+    """Fila de la tabla FTS5 main_book_fts (sólo existe en SQLite; ver main.search)"""
+    book = models.OneToOneField(Book, primary_key=True, db_column='rowid', on_delete=models.DO_NOTHING, related_name='search_entry')
+    # Columna oculta con el nombre de la tabla, usada como operando de MATCH
+    document = models.TextField(db_column='main_book_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'main_book_fts'
 
 class BookReview(models.Model):
     book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='reviews')
@@ -53,10 +96,21 @@ class BookReview(models.Model):
     def __str__(self):
         return f"Reseña de {self.book.title} por {self.author_name}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valores leídos de la base: main.ratings aplica sólo la diferencia al guardar
+        instance._loaded_rating = (instance.__dict__.get('book_id'), instance.__dict__.get('rating'))
+        return instance
+    
     class Meta:
         verbose_name = "Reseña"
         verbose_name_plural = "Reseñas"
         ordering = ['-created_at']
+        indexes = [
+            # Versión de la página de la lectura actual (http_cache.latest)
+            models.Index(fields=['created_at'], name='bookreview_created_at_idx'),
+        ]
 
 class Event(models.Model):
     EVENT_TYPE_CHOICES = [
@@ -75,8 +129,16 @@ class Event(models.Model):
     online_link = models.URLField(blank=True, verbose_name="Enlace Online")
     book = models.ForeignKey(Book, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Libro Relacionado")
     max_participants = models.IntegerField(blank=True, null=True, verbose_name="Máximo de Participantes")
+    # Contadores de inscripciones: los mantiene main/registrations.py con UPDATE condicionales
+    confirmed_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Plazas Confirmadas")
+    waitlist_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="En Lista de Espera")
     is_active = models.BooleanField(default=True, verbose_name="Activo")
+    # Revisión de los datos que publica el calendario (SEQUENCE y LAST-MODIFIED de
+    # main/ical.py); las inscripciones cambian updated_at pero no estos
+    sequence = models.PositiveIntegerField(default=0, editable=False, verbose_name="Revisión")
+    details_updated_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name="Última Modificación de los Datos")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.title} - {self.date.strftime('%d/%m/%Y')}"
@@ -88,10 +150,62 @@ class Event(models.Model):
     def is_past(self):
         return self.date < timezone.now()
     
+    @property
+    def seats_left(self):
+        """Plazas libres según el contador (None si no hay máximo)"""
+        if self.max_participants is None:
+            return None
+        return max(self.max_participants - self.confirmed_count, 0)
+    
     class Meta:
         verbose_name = "Evento"
         verbose_name_plural = "Eventos"
         ordering = ['date']
+        indexes = [
+            # Próximos encuentros: sólo los activos
+            models.Index(fields=['date'], condition=models.Q(is_active=True), name='event_active_date_idx'),
+            # Encuentros pasados y último encuentro empezado (sin filtrar por activo)
+            models.Index(fields=['date'], name='event_date_idx'),
+            models.Index(fields=['updated_at'], name='event_updated_at_idx'),
+            # Mapa del sitio: recorrido por pk de los activos sin leer la tabla
+            models.Index(fields=['id', 'created_at'], condition=models.Q(is_active=True), name='event_sitemap_idx'),
+            # Calendario: los cancelados hace poco siguen saliendo como CANCELLED
+            models.Index(fields=['details_updated_at'], condition=models.Q(is_active=False), name='event_cancelled_idx'),
+        ]
+
+class EventRegistration(models.Model):
+    STATUS_CHOICES = [
+        ('confirmed', 'Confirmada'),
+        ('waitlisted', 'En lista de espera'),
+        ('cancelled', 'Cancelada'),
+    ]
+    
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='registrations', verbose_name="Evento")
+    name = models.CharField(max_length=100, verbose_name="Nombre")
+    email = models.EmailField(verbose_name="Email")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, verbose_name="Estado")
+    # Va en el enlace de cancelación del correo de confirmación
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} - {self.event.title} ({self.get_status_display()})"
+    
+    class Meta:
+        verbose_name = "Inscripción"
+        verbose_name_plural = "Inscripciones"
+        ordering = ['created_at', 'id']
+        constraints = [
+            # Una inscripción vigente por email y evento (las canceladas no cuentan)
+            models.UniqueConstraint(
+                fields=['event', 'email'], condition=~models.Q(status='cancelled'), name='unique_active_registration',
+            ),
+        ]
+        indexes = [
+            # Lista de espera por orden de llegada
+            models.Index(fields=['event', 'status', 'created_at', 'id'], name='registration_queue_idx'),
+        ]
 
 class BlogPost(models.Model):
     title = models.CharField(max_length=200, verbose_name="Título")
@@ -114,6 +228,18 @@ class BlogPost(models.Model):
         verbose_name = "Entrada de Blog"
         verbose_name_plural = "Entradas de Blog"
         ordering = ['-created_at']
+        indexes = [
+            # Sólo las publicadas: los borradores nunca se listan en el sitio
+            models.Index(
+                fields=['-created_at', '-id'], condition=models.Q(is_published=True), name='blogpost_published_idx',
+            ),
+            models.Index(
+                fields=['-created_at'], condition=models.Q(is_published=True, is_featured=True),
+                name='blogpost_featured_idx',
+            ),
+            models.Index(fields=['updated_at'], name='blogpost_updated_at_idx'),
+            models.Index(fields=['id', 'updated_at'], condition=models.Q(is_published=True), name='blogpost_sitemap_idx'),
+        ]
 
 class Member(models.Model):
     name = models.CharField(max_length=100, verbose_name="Nombre")
@@ -124,6 +250,7 @@ class Member(models.Model):
     join_date = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Ingreso")
     is_active = models.BooleanField(default=True, verbose_name="Activo")
     profile_image = models.URLField(blank=True, verbose_name="Foto de Perfil")
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return self.name
@@ -132,6 +259,30 @@ class Member(models.Model):
         verbose_name = "Miembro"
         verbose_name_plural = "Miembros"
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['name'], condition=models.Q(is_active=True), name='member_active_name_idx'),
+            models.Index(fields=['-join_date'], condition=models.Q(is_active=True), name='member_active_joined_idx'),
+            models.Index(fields=['updated_at'], name='member_updated_at_idx'),
+        ]
+
+class MemberRecommendation(models.Model):
+    """Libros recomendados a cada miembro, precalculados por main.recommendations"""
+    # Sin índice propio: lo cubre unique_member_recommendation_rank (member, rank)
+    member = models.ForeignKey(Member, on_delete=models.CASCADE, db_index=False, related_name='recommendations', verbose_name="Miembro")
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+', verbose_name="Libro")
+    rank = models.PositiveSmallIntegerField(verbose_name="Posición")
+    score = models.FloatField(verbose_name="Puntuación")
+    
+    def __str__(self):
+        return f"{self.member_id} #{self.rank}: {self.book_id}"
+    
+    class Meta:
+        verbose_name = "Recomendación"
+        verbose_name_plural = "Recomendaciones"
+        ordering = ['member', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['member', 'rank'], name='unique_member_recommendation_rank'),
+        ]
 
 class BookSuggestion(models.Model):
     STATUS_CHOICES = [
@@ -155,6 +306,10 @@ class BookSuggestion(models.Model):
         verbose_name = "Sugerencia de Libro"
         verbose_name_plural = "Sugerencias de Libros"
         ordering = ['-created_at']
+        indexes = [
+            # Admin: sugerencias pendientes, las más recientes primero
+            models.Index(fields=['status', '-created_at'], name='suggestion_status_idx'),
+        ]
 
 class Newsletter(models.Model):
     email = models.EmailField(unique=True, verbose_name="Email")
@@ -168,6 +323,13 @@ class Newsletter(models.Model):
     class Meta:
         verbose_name = "Suscriptor Newsletter"
         verbose_name_plural = "Suscriptores Newsletter"
+        constraints = [
+            # subscribe() resuelve los duplicados con ON CONFLICT (email): sólo vale si todo está en minúsculas
+            models.CheckConstraint(
+                condition=models.Q(email=Lower('email')), name='newsletter_email_lowercase',
+                violation_error_message='El email debe estar en minúsculas.',
+            ),
+        ]
 
 class Gallery(models.Model):
     title = models.CharField(max_length=200, verbose_name="Título")
@@ -175,6 +337,7 @@ class Gallery(models.Model):
     image_url = models.URLField(verbose_name="URL de Imagen")
     event = models.ForeignKey(Event, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Evento Relacionado")
     upload_date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     is_featured = models.BooleanField(default=False, verbose_name="Destacada")
     
     def __str__(self):
@@ -184,3 +347,71 @@ class Gallery(models.Model):
         verbose_name = "Imagen de Galería"
         verbose_name_plural = "Galería"
         ordering = ['-upload_date']
+        indexes = [
+            models.Index(fields=['-upload_date', '-id'], name='gallery_upload_date_idx'),
+            models.Index(fields=['-upload_date'], condition=models.Q(is_featured=True), name='gallery_featured_idx'),
+            models.Index(fields=['updated_at'], name='gallery_updated_at_idx'),
+        ]
+
+class NewsletterCampaign(models.Model):
+    STATUS_CHOICES = [
+        ('draft', 'Borrador'),
+        ('sending', 'Enviando'),
+        ('sent', 'Enviada'),
+    ]
+    
+    subject = models.CharField(max_length=200, verbose_name="Asunto")
+    body = models.TextField(
+        verbose_name="Contenido",
+        help_text="Texto del correo. $name y $email se sustituyen por los datos de cada suscriptor.",
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft', verbose_name="Estado")
+    workers = models.PositiveSmallIntegerField(
+        null=True, blank=True, editable=False,
+        help_text="Número de particiones fijado en el primer envío; se reutiliza al reanudar",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Inicio del Envío")
+    finished_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Fin del Envío")
+    
+    def __str__(self):
+        return self.subject
+    
+    class Meta:
+        verbose_name = "Campaña de Newsletter"
+        verbose_name_plural = "Campañas de Newsletter"
+        ordering = ['-created_at']
+
+# Progreso de cada worker de una campaña: recorre los suscriptores con id % workers == index
+class CampaignShard(models.Model):
+    campaign = models.ForeignKey(NewsletterCampaign, on_delete=models.CASCADE, related_name='shards')
+    index = models.PositiveSmallIntegerField()
+    last_subscriber_id = models.BigIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.campaign} [{self.index}]"
+    
+    class Meta:
+        verbose_name = "Progreso de Campaña"
+        verbose_name_plural = "Progreso de Campañas"
+        constraints = [
+            models.UniqueConstraint(fields=['campaign', 'index'], name='unique_campaign_shard'),
+        ]
+
+class CampaignFailure(models.Model):
+    campaign = models.ForeignKey(NewsletterCampaign, on_delete=models.CASCADE, related_name='failures')
+    subscriber = models.ForeignKey(Newsletter, on_delete=models.SET_NULL, null=True, blank=True)
+    email = models.EmailField(verbose_name="Email")
+    error = models.TextField(verbose_name="Error")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.email}: {self.error[:50]}"
+    
+    class Meta:
+        verbose_name = "Envío Fallido"
+        verbose_name_plural = "Envíos Fallidos"
+        ordering = ['-created_at']
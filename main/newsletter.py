@@ -0,0 +1,198 @@
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from smtplib import SMTPServerDisconnected
+from string import Template
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.db.models.functions import Mod
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import escape
+
+from .models import CampaignFailure, CampaignShard, Newsletter, NewsletterCampaign
+
+
+class RenderedCampaign:
+    """
+    Campaña renderizada una sola vez.
+
+    Las plantillas de Django se evalúan al crear el objeto; cada destinatario
+    sólo cuesta una sustitución de ``$name`` y ``$email`` en las cadenas ya
+    renderizadas (escapadas en la versión HTML).
+    """
+
+    def __init__(self, campaign):
+        context = {'campaign': campaign}
+        self.subject = Template(campaign.subject)
+        self.text = Template(render_to_string('main/email/newsletter.txt', context))
+        self.html = Template(render_to_string('main/email/newsletter.html', context))
+
+    def message(self, email, name, connection=None):
+        values = {'email': email, 'name': name or email}
+        html_values = {key: escape(value) for key, value in values.items()}
+        message = EmailMultiAlternatives(
+            subject=self.subject.safe_substitute(values),
+            body=self.text.safe_substitute(values),
+            to=[email],
+            connection=connection,
+        )
+        message.attach_alternative(self.html.safe_substitute(html_values), 'text/html')
+        return message
+
+
+class CampaignSender:
+    """
+    Envía una campaña a los suscriptores activos con ``workers`` hilos en paralelo.
+
+    Cada worker recorre su partición (``id % workers``) en orden de id con
+    ``.iterator(chunk_size=batch_size)`` y envía por una única conexión de correo
+    que abre al empezar y reutiliza en todos sus lotes. Tras cada lote guarda su
+    progreso (último id, enviados, fallidos) y los fallos por destinatario, así
+    que una campaña interrumpida se reanuda desde el último lote confirmado.
+    """
+
+    def __init__(self, campaign, workers=4, batch_size=500, backend=None, progress=None):
+        self.campaign = campaign
+        self.workers = campaign.workers or workers
+        self.batch_size = batch_size
+        self.backend = backend
+        self.progress = progress
+        self.rendered = RenderedCampaign(campaign)
+
+    def send(self):
+        """Envía lo pendiente y devuelve ``{'sent', 'failed', 'seconds', 'rate'}``"""
+        self._start()
+        shards = list(self.campaign.shards.filter(finished_at__isnull=True).order_by('index'))
+        started = time.perf_counter()
+        if self.workers == 1 or len(shards) <= 1:
+            results = [self._send_shard(shard, self._checkpoint) for shard in shards]
+        else:
+            results = self._send_parallel(shards)
+        seconds = time.perf_counter() - started
+
+        self._finish()
+        sent = sum(result[0] for result in results)
+        failed = sum(result[1] for result in results)
+        return {
+            'sent': sent,
+            'failed': failed,
+            'seconds': seconds,
+            'rate': (sent + failed) / seconds if seconds else 0.0,
+        }
+
+    def _send_parallel(self, shards):
+        # Los workers sólo leen y envían; este hilo es el único que escribe los
+        # checkpoints. Así un iterador abierto nunca comparte conexión con una
+        # escritura ajena (en SQLite eso bloquea la base de datos)
+        checkpoints = queue.Queue()
+
+        def run(shard):
+            try:
+                return self._send_shard(shard, lambda *args: checkpoints.put(args))
+            finally:
+                checkpoints.put(None)
+                close_old_connections()
+
+        with ThreadPoolExecutor(len(shards), thread_name_prefix='newsletter') as pool:
+            futures = [pool.submit(run, shard) for shard in shards]
+            running = len(shards)
+            while running:
+                checkpoint = checkpoints.get()
+                if checkpoint is None:
+                    running -= 1
+                else:
+                    self._checkpoint(*checkpoint)
+            return [future.result() for future in futures]
+
+    def _start(self):
+        campaign = self.campaign
+        if campaign.workers is None:
+            campaign.workers = self.workers
+            campaign.started_at = timezone.now()
+        campaign.status = 'sending'
+        campaign.save(update_fields=['workers', 'started_at', 'status'])
+        CampaignShard.objects.bulk_create(
+            [CampaignShard(campaign=campaign, index=index) for index in range(campaign.workers)],
+            ignore_conflicts=True,
+        )
+
+    def _finish(self):
+        if not self.campaign.shards.filter(finished_at__isnull=True).exists():
+            self.campaign.status = 'sent'
+            self.campaign.finished_at = timezone.now()
+            self.campaign.save(update_fields=['status', 'finished_at'])
+
+    def subscribers(self, shard):
+        return (
+            Newsletter.objects.filter(is_active=True, pk__gt=shard.last_subscriber_id)
+            .alias(shard_index=Mod('id', self.workers))
+            .filter(shard_index=shard.index)
+            .order_by('pk')
+            .values_list('pk', 'email', 'name')
+        )
+
+    def _send_shard(self, shard, checkpoint):
+        connection = get_connection(self.backend)
+        connection.open()
+        sent = failed = 0
+        batch = []
+        try:
+            for row in self.subscribers(shard).iterator(chunk_size=self.batch_size):
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    connection, failures = self._send_batch(batch, connection)
+                    checkpoint(shard, batch[-1][0], len(batch) - len(failures), failures)
+                    sent, failed, batch = sent + len(batch) - len(failures), failed + len(failures), []
+            if batch:
+                connection, failures = self._send_batch(batch, connection)
+                checkpoint(shard, batch[-1][0], len(batch) - len(failures), failures)
+                sent, failed = sent + len(batch) - len(failures), failed + len(failures)
+        finally:
+            connection.close()
+        checkpoint(shard, None, 0, [])
+        return sent, failed
+
+    def _send_batch(self, batch, connection):
+        failures = []
+        for subscriber_id, email, name in batch:
+            try:
+                self.rendered.message(email, name, connection).send()
+            except Exception as error:
+                failures.append(CampaignFailure(
+                    campaign=self.campaign, subscriber_id=subscriber_id, email=email,
+                    error=f'{type(error).__name__}: {error}',
+                ))
+                if isinstance(error, SMTPServerDisconnected):
+                    # Conexión perdida: se abre otra para el resto del lote
+                    connection.close()
+                    connection = get_connection(self.backend)
+                    connection.open()
+        return connection, failures
+
+    def _checkpoint(self, shard, last_subscriber_id, sent, failures):
+        """Guarda el avance de un lote; ``last_subscriber_id=None`` marca la partición como terminada"""
+        if last_subscriber_id is None:
+            CampaignShard.objects.filter(pk=shard.pk).update(finished_at=timezone.now())
+            return
+        with transaction.atomic():
+            CampaignFailure.objects.bulk_create(failures)
+            CampaignShard.objects.filter(pk=shard.pk).update(
+                last_subscriber_id=last_subscriber_id,
+                sent_count=F('sent_count') + sent,
+                failed_count=F('failed_count') + len(failures),
+            )
+        if self.progress:
+            self.progress(shard.index, sent, len(failures))
+
+
+def send_campaign(campaign, **options):
+    """Atajo: ``send_campaign(campaign, workers=4, batch_size=500)``"""
+    if isinstance(campaign, int):
+        campaign = NewsletterCampaign.objects.get(pk=campaign)
+    options.setdefault('workers', settings.NEWSLETTER_WORKERS)
+    options.setdefault('batch_size', settings.NEWSLETTER_BATCH_SIZE)
+    return CampaignSender(campaign, **options).send()
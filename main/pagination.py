@@ -0,0 +1,201 @@
+import base64
+import binascii
+import datetime
+import json
+import math
+from functools import reduce
+from operator import and_, or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder recorta las fechas a milisegundos; el cursor necesita el valor exacto
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def approximate_count(queryset):
+    """
+    Número aproximado de filas sin ``COUNT(*)``.
+
+    En PostgreSQL usa la estimación del planificador (``EXPLAIN``); en el
+    resto de motores recurre al conteo exacto.
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.count()
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPaginator:
+    """
+    Paginación por cursor sobre un orden fijo (por ejemplo ``('-created_at', '-id')``).
+
+    Cada página se obtiene con ``WHERE (clave) < (cursor) ... LIMIT n + 1``, de modo
+    que su coste no depende de la profundidad. El último campo del orden debe ser
+    único (normalmente ``id``). Los valores nulos se ordenan como los menores.
+    ``count`` puede ser ``None`` (sin total), ``'exact'`` o ``'approximate'``.
+    """
+
+    def __init__(self, queryset, per_page, ordering, count=None):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.keys = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+        self.count_mode = count
+
+    @cached_property
+    def count(self):
+        if self.count_mode == 'approximate':
+            return approximate_count(self.queryset)
+        if self.count_mode == 'exact':
+            return self.queryset.count()
+        return None
+
+    def get_page(self, cursor=None):
+        """Página indicada por ``cursor``; un cursor ausente o inválido da la primera"""
+        try:
+            direction, values = self.decode_cursor(cursor) if cursor else (FORWARD, None)
+        except InvalidCursor:
+            direction, values = FORWARD, None
+
+        backward = direction == BACKWARD
+        queryset = self.queryset.order_by(*self._order_by(reverse=backward))
+        if values is not None:
+            queryset = queryset.filter(self._after(values, reverse=backward))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backward:
+            rows.reverse()
+            return KeysetPage(rows, self, has_next=True, has_previous=has_more)
+        return KeysetPage(rows, self, has_next=has_more, has_previous=values is not None)
+
+    def encode_cursor(self, obj, direction):
+        values = [getattr(obj, name) for name, _ in self.keys]
+        payload = json.dumps([direction, values], cls=CursorEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """``(dirección, valores)`` del cursor; cualquier cursor mal formado es ``InvalidCursor``"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if direction not in (FORWARD, BACKWARD) or not isinstance(values, list) or len(values) != len(self.keys):
+                raise InvalidCursor(cursor)
+            return direction, [self._to_python(name, value) for (name, _), value in zip(self.keys, values)]
+        except (TypeError, ValueError, OverflowError, binascii.Error, ValidationError):
+            raise InvalidCursor(cursor)
+
+    def _to_python(self, name, value):
+        if value is None:
+            return None
+        try:
+            field = self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Anotaciones (p. ej. search_rank): sólo números finitos, se comparan tal como vienen en el JSON
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+                raise ValueError(value)
+            return value
+        value = field.to_python(value)
+        if isinstance(value, float) and not math.isfinite(value):
+            raise ValueError(value)
+        # Los validadores de los enteros llevan el rango de la columna: un id enorme no llega a la base de datos
+        field.run_validators(value)
+        return value
+
+    def _is_nullable(self, name):
+        try:
+            return self.queryset.model._meta.get_field(name).null
+        except FieldDoesNotExist:
+            return False
+
+    def _order_by(self, reverse=False):
+        order = []
+        for name, descending in self.keys:
+            if descending != reverse:
+                order.append(F(name).desc(nulls_last=True))
+            else:
+                order.append(F(name).asc(nulls_first=True))
+        return order
+
+    def _after(self, values, reverse=False):
+        """Condición "estrictamente después del cursor" en el sentido de recorrido"""
+        clauses = []
+        equal_so_far = []
+        for (name, descending), value in zip(self.keys, values):
+            beyond = self._beyond(name, value, descending != reverse)
+            if beyond is not None:
+                clauses.append(reduce(and_, equal_so_far + [beyond]))
+            equal_so_far.append(Q(**{f'{name}__isnull': True}) if value is None else Q(**{name: value}))
+        if not clauses:
+            # Cursor sobre el último elemento posible: no hay nada después
+            return Q(pk__in=[])
+        return reduce(or_, clauses)
+
+    def _beyond(self, name, value, descending):
+        nullable = self._is_nullable(name)
+        if descending:
+            # Hacia valores menores; los nulos (los menores) van al final
+            if value is None:
+                return None
+            beyond = Q(**{f'{name}__lt': value})
+            return beyond | Q(**{f'{name}__isnull': True}) if nullable else beyond
+        if value is None:
+            return Q(**{f'{name}__isnull': False})
+        return Q(**{f'{name}__gt': value})
+
+
+class KeysetPage:
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next and bool(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous and bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @cached_property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1], FORWARD)
+
+    @cached_property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return self.paginator.encode_cursor(self.object_list[0], BACKWARD)
@@ -0,0 +1,46 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(max_queries):
+    """Declara el máximo de consultas SQL que puede ejecutar una vista"""
+    def decorator(view_func):
+        view_func.query_budget = max_queries
+        return view_func
+    return decorator
+
+
+def get_query_budget(path):
+    """Presupuesto declarado para la vista que atiende ``path`` (o None)"""
+    return getattr(resolve(path).func, 'query_budget', None)
+
+
+def format_queries(captured):
+    return '\n'.join(f"{n}. {query['sql']}" for n, query in enumerate(captured, start=1))
+
+
+def check_query_budget(path, captured):
+    budget = get_query_budget(path)
+    if budget is not None and len(captured) > budget:
+        raise QueryBudgetExceeded(
+            f'{path} ejecutó {len(captured)} consultas (presupuesto: {budget}):\n{format_queries(captured)}'
+        )
+
+
+class QueryBudgetTestMixin:
+    """Aserciones para TestCase: la respuesta no supera el presupuesto de su vista"""
+
+    def assertWithinQueryBudget(self, path, data=None, method='get', **extra):
+        self.assertIsNotNone(get_query_budget(path), f'{path} no declara @query_budget')
+        with CaptureQueriesContext(connection) as captured:
+            response = getattr(self.client, method)(path, data, **extra)
+            if response.streaming:
+                # Las respuestas en streaming consultan mientras se envían
+                response.streaming_content = [response.getvalue()]
+        check_query_budget(path, captured.captured_queries)
+        return response, len(captured)
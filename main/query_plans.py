@@ -0,0 +1,63 @@
+"""
+Planes de ejecución de las consultas capturadas en una petición.
+
+``sequential_scans`` pasa cada SELECT por ``EXPLAIN`` (``EXPLAIN QUERY PLAN``
+en SQLite, ``EXPLAIN (FORMAT JSON)`` en PostgreSQL) y devuelve las tablas
+que se recorren enteras en lugar de por un índice. Los tests lo usan sobre
+todas las páginas públicas para que ningún filtro u orden nuevo se quede
+sin su índice en ``Meta.indexes``.
+"""
+import json
+import re
+
+from django.db import connections
+
+SQLITE_SCAN_RE = re.compile(r'^SCAN (?P<table>\S+)(?: AS \S+)?$')
+
+
+def explain(sql, using='default'):
+    """Plan de ``sql`` (con los parámetros ya sustituidos) como filas o JSON"""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql)
+            plan = cursor.fetchone()[0]
+            return json.loads(plan) if isinstance(plan, str) else plan
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        return cursor.fetchall()
+
+
+def _postgresql_seq_scans(node):
+    if node.get('Node Type') == 'Seq Scan':
+        yield node['Relation Name']
+    for child in node.get('Plans', []):
+        yield from _postgresql_seq_scans(child)
+
+
+def scanned_tables(sql, using='default'):
+    """Tablas que el plan de ``sql`` recorre de forma secuencial"""
+    plan = explain(sql, using)
+    if connections[using].vendor == 'postgresql':
+        return list(_postgresql_seq_scans(plan[0]['Plan']))
+    tables = []
+    for row in plan:
+        match = SQLITE_SCAN_RE.match(row[-1])
+        if match and match['table'] != 'CONSTANT':
+            tables.append(match['table'])
+    return tables
+
+
+def sequential_scans(captured, using='default', allowed=()):
+    """
+    ``[(tabla, sql)]`` de los recorridos secuenciales en las consultas
+    capturadas (``CaptureQueriesContext``), salvo las tablas de ``allowed``.
+    """
+    scans = []
+    for query in captured:
+        sql = query['sql']
+        if not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        for table in scanned_tables(sql, using):
+            if table.strip('"') not in allowed:
+                scans.append((table, sql))
+    return scans
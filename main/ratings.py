@@ -0,0 +1,116 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, FloatField, Q, Sum, When
+from django.db.models.functions import Cast
+from django.db.models.lookups import GreaterThan
+from django.utils import timezone
+
+from .models import Book, BookReview
+
+RATING_VALUES = range(1, 6)
+
+
+def rating_field(rating):
+    """Columna del histograma para una calificación: 4 -> 'rating_4_count'"""
+    return f'rating_{rating}_count'
+
+
+def _average(count, total):
+    # Sin reseñas el promedio se deja como está (p. ej. el escrito a mano antes de las reseñas)
+    return Case(
+        When(GreaterThan(count, 0), then=Cast(total, FloatField()) / count),
+        default=F('average_rating'),
+        output_field=DecimalField(max_digits=3, decimal_places=2),
+    )
+
+
+def apply_rating_changes(changes, using='default'):
+    """
+    Aplica deltas a los agregados de calificación sin volver a agregar.
+
+    ``changes`` es una lista de ``(book_id, rating, delta)`` con delta +1 al
+    añadir una reseña y -1 al quitarla. Se ejecuta un ``UPDATE`` con ``F()`` por
+    libro afectado, de modo que las escrituras concurrentes no se pisan.
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    for book_id, rating, delta in changes:
+        if book_id is None or rating not in RATING_VALUES:
+            continue
+        deltas[book_id]['rating_count'] += delta
+        deltas[book_id]['rating_sum'] += delta * rating
+        deltas[book_id][rating_field(rating)] += delta
+
+    with transaction.atomic(using=using, savepoint=False):
+        for book_id, fields in deltas.items():
+            fields = {name: delta for name, delta in fields.items() if delta}
+            if not fields:
+                continue
+            updates = {name: F(name) + delta for name, delta in fields.items()}
+            updates['average_rating'] = _average(
+                F('rating_count') + fields.get('rating_count', 0),
+                F('rating_sum') + fields.get('rating_sum', 0),
+            )
+            # update() no aplica auto_now y updated_at alimenta el Last-Modified de las páginas
+            updates['updated_at'] = timezone.now()
+            Book.objects.using(using).filter(pk=book_id).update(**updates)
+
+
+def rating_aggregates(book_ids, using='default'):
+    """Agregados calculados desde BookReview para los libros indicados"""
+    histogram = {
+        rating_field(rating): Count('id', filter=Q(rating=rating)) for rating in RATING_VALUES
+    }
+    rows = (
+        BookReview.objects.using(using)
+        .filter(book_id__in=book_ids)
+        .order_by()
+        .values('book_id')
+        .annotate(rating_count=Count('id'), rating_sum=Sum('rating'), **histogram)
+    )
+    return {row.pop('book_id'): row for row in rows}
+
+
+def recompute_ratings(book_ids=None, using='default', batch_size=1000):
+    """
+    Recalcula desde cero los agregados de los libros indicados (o de todos).
+
+    Pensado para cargas iniciales o para corregir desajustes: agrega las reseñas
+    de cada lote con una consulta y guarda el lote con ``bulk_update``. Los
+    libros sin reseñas conservan su ``average_rating``.
+    """
+    books = Book.objects.using(using).order_by('pk')
+    if book_ids is not None:
+        books = books.filter(pk__in=book_ids)
+    fields = ['rating_count', 'rating_sum', 'average_rating', 'updated_at'] + [rating_field(r) for r in RATING_VALUES]
+    updated = 0
+    last_id = 0
+    while True:
+        # Lotes por pk en vez de un iterador abierto: se escribe en la misma tabla
+        batch = list(books.filter(pk__gt=last_id).values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return updated
+        with transaction.atomic(using=using):
+            updated += _recompute_batch(batch, fields, using)
+        last_id = batch[-1]
+
+
+def _recompute_batch(book_ids, fields, using):
+    aggregates = rating_aggregates(book_ids, using=using)
+    now = timezone.now()
+    books = []
+    for book_id in book_ids:
+        values = aggregates.get(book_id, {})
+        book = Book(pk=book_id, updated_at=now)
+        book.rating_count = values.get('rating_count', 0)
+        book.rating_sum = values.get('rating_sum') or 0
+        for rating in RATING_VALUES:
+            setattr(book, rating_field(rating), values.get(rating_field(rating), 0))
+        if book.rating_count:
+            book.average_rating = round(book.rating_sum / book.rating_count, 2)
+        books.append(book)
+    reviewed = [book for book in books if book.rating_count]
+    unreviewed = [book for book in books if not book.rating_count]
+    Book.objects.using(using).bulk_update(reviewed, fields)
+    Book.objects.using(using).bulk_update(unreviewed, [name for name in fields if name != 'average_rating'])
+    return len(books)
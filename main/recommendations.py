@@ -0,0 +1,180 @@
+"""
+Recomendaciones de libros para cada miembro, precalculadas.
+
+Los géneros favoritos de los miembros y los géneros de los libros forman dos
+matrices dispersas (miembro×género y libro×género, filas normalizadas). La
+afinidad de un miembro con un libro es el coseno entre sus filas, ponderado por
+la valoración del libro en las reseñas (media bayesiana: con pocas reseñas
+cuenta casi como la media del club). Todo se calcula con multiplicaciones de
+matrices por lotes, sin recorrer miembros ni libros en Python, y
+``argpartition`` por filas para quedarse con los ``TOP_N`` mejores (ver
+``top_books``).
+
+``refresh_recommendations`` (también ``manage.py refresh_recommendations``)
+guarda el resultado en ``MemberRecommendation``; ``recommended_books`` lo lee
+con una consulta sobre el índice único ``(member, rank)``. Los miembros sin
+géneros favoritos (o sin ningún libro de sus géneros) reciben los libros mejor
+valorados del club.
+"""
+import numpy as np
+from scipy import sparse
+from django.db import transaction
+
+from .models import Book, Genre, Member, MemberRecommendation
+
+TOP_N = 10
+# Combinaciones de miembros por multiplicación (la afinidad del lote es densa: lote × grupos de libros)
+BATCH_SIZE = 1024
+# Reseñas "virtuales" con la media del club que se suman a las de cada libro
+PRIOR_COUNT = 5
+# Parte de la puntuación que depende de las reseñas (el resto, sólo de los géneros)
+QUALITY_WEIGHT = 0.5
+
+
+def genre_matrix(pairs, row_ids, genre_ids):
+    """
+    Matriz dispersa ``len(row_ids) × len(genre_ids)`` con un 1 por cada par
+    ``(fila, género)`` (ids ordenados), con las filas normalizadas (L2).
+    Los pares de filas o géneros que no están en los ids se ignoran.
+    """
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    pairs = pairs[np.isin(pairs[:, 0], row_ids) & np.isin(pairs[:, 1], genre_ids)]
+    matrix = sparse.csr_array(
+        (
+            np.ones(len(pairs), dtype=np.float32),
+            (np.searchsorted(row_ids, pairs[:, 0]), np.searchsorted(genre_ids, pairs[:, 1])),
+        ),
+        shape=(len(row_ids), len(genre_ids)),
+    )
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1))).ravel()
+    norms[norms == 0] = 1
+    return sparse.csr_array(sparse.diags_array(1 / norms) @ matrix, dtype=np.float32)
+
+
+def book_weights(rating_sum, rating_count):
+    """Peso de cada libro por sus reseñas: de ``1 - QUALITY_WEIGHT`` (1 estrella) a 1 (5 estrellas)"""
+    rating_sum = np.asarray(rating_sum, dtype=np.float64)
+    rating_count = np.asarray(rating_count, dtype=np.float64)
+    total = rating_count.sum()
+    mean = rating_sum.sum() / total if total else 3.0
+    average = (rating_sum + PRIOR_COUNT * mean) / (rating_count + PRIOR_COUNT)
+    return ((1 - QUALITY_WEIGHT) + QUALITY_WEIGHT * (average - 1) / 4).astype(np.float32)
+
+
+def book_groups(books, weights, n):
+    """
+    Libros agrupados por combinación de géneros: ``(géneros de cada grupo,
+    índices de sus n libros de más peso)``, con -1 donde el grupo tiene menos.
+    Entre libros con los mismos géneros el orden sólo depende del peso.
+    """
+    genres, groups = np.unique(books.toarray(), axis=0, return_inverse=True)
+    groups = groups.ravel()
+    order = np.lexsort((-weights, groups))
+    sorted_groups = groups[order]
+    rank = np.arange(len(order)) - np.searchsorted(sorted_groups, sorted_groups)
+    keep = rank < n
+    best = np.full((len(genres), n), -1, dtype=np.int64)
+    best[sorted_groups[keep], rank[keep]] = order[keep]
+    return genres, best
+
+
+def top_books(members, books, weights, n=TOP_N, batch_size=BATCH_SIZE):
+    """
+    ``(índices de libro, puntuaciones)``, ambos ``miembros × n``, con los ``n``
+    mejores libros de cada miembro en orden. Sin ningún género en común
+    (puntuación 0) se rellena con los libros mejor valorados y puntuación 0.
+
+    Se puntúan combinaciones, no filas: los miembros con los mismos géneros
+    comparten resultado y los libros se agrupan por sus géneros. De cada
+    grupo sólo pueden entrar sus n libros de más peso, y sólo de los n grupos
+    cuyo mejor libro puntúa más (el n-ésimo de ellos ya es cota inferior del
+    top), así que cada miembro elige entre n × n candidatos.
+    """
+    n = min(n, books.shape[0])
+    if not n or not members.shape[0]:
+        return np.empty((members.shape[0], n), dtype=np.int64), np.empty((members.shape[0], n), dtype=np.float32)
+    profiles, inverse = np.unique(members.toarray(), axis=0, return_inverse=True)
+    group_genres, group_books = book_groups(books, weights, n)
+    # El índice -1 (hueco) lee el peso -1 añadido al final: nunca puntúa por encima de 0
+    group_weights = np.append(weights, -1).astype(np.float32)[group_books]
+    k = min(n, len(group_genres))
+    top = np.empty((len(profiles), n), dtype=np.int64)
+    top_scores = np.empty((len(profiles), n), dtype=np.float32)
+    for start in range(0, len(profiles), batch_size):
+        # Coseno de cada combinación de miembros con cada grupo: una multiplicación de BLAS
+        affinity = profiles[start:start + batch_size] @ group_genres.T
+        bound = affinity * group_weights[:, 0]
+        groups = np.argpartition(bound, -k, axis=1)[:, -k:]
+        candidates = group_books[groups].reshape(len(affinity), -1)
+        scores = (np.take_along_axis(affinity, groups, axis=1)[:, :, None] * group_weights[groups]).reshape(
+            len(affinity), -1,
+        )
+        best = np.argpartition(scores, -n, axis=1)[:, -n:]
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind='stable')
+        top[start:start + batch_size] = np.take_along_axis(candidates, np.take_along_axis(best, order, axis=1), axis=1)
+        top_scores[start:start + batch_size] = np.take_along_axis(best_scores, order, axis=1)
+
+    fallback = np.argsort(-weights, kind='stable')[:n]
+    # Sin ningún género en común: directamente los mejor valorados
+    empty = top_scores[:, 0] <= 0
+    top[empty] = fallback
+    top_scores[empty] = 0
+    # Con algunos: los huecos se llenan con los mejor valorados que no estén ya (pocas filas)
+    for row in np.flatnonzero(~empty & (top_scores[:, -1] <= 0)):
+        useful = top[row][top_scores[row] > 0]
+        extra = fallback[~np.isin(fallback, useful)][:n - len(useful)]
+        top[row] = np.concatenate([useful, extra])
+        top_scores[row, len(useful):] = 0
+    inverse = inverse.ravel()
+    return top[inverse], top_scores[inverse]
+
+
+def load_matrices(using='default'):
+    """Ids de miembros activos y libros, sus matrices de géneros y el peso de cada libro"""
+    genre_ids = np.fromiter(Genre.objects.using(using).order_by('pk').values_list('pk', flat=True), dtype=np.int64)
+    member_ids = np.fromiter(
+        Member.objects.using(using).filter(is_active=True).order_by('pk').values_list('pk', flat=True), dtype=np.int64,
+    )
+    books = np.array(
+        list(Book.objects.using(using).order_by('pk').values_list('pk', 'rating_sum', 'rating_count')), dtype=np.int64,
+    ).reshape(-1, 3)
+    member_genres = Member.favorite_genres.through.objects.using(using).values_list('member_id', 'genre_id')
+    book_genres = Book.genres.through.objects.using(using).values_list('book_id', 'genre_id')
+    return (
+        member_ids,
+        books[:, 0],
+        genre_matrix(list(member_genres.iterator(chunk_size=10000)), member_ids, genre_ids),
+        genre_matrix(list(book_genres.iterator(chunk_size=10000)), books[:, 0], genre_ids),
+        book_weights(books[:, 1], books[:, 2]),
+    )
+
+
+def refresh_recommendations(n=TOP_N, batch_size=BATCH_SIZE, using='default', write_batch_size=500):
+    """Recalcula y sustituye las recomendaciones de todos los miembros; devuelve las filas guardadas"""
+    member_ids, book_ids, members, books, weights = load_matrices(using)
+    total = 0
+    with transaction.atomic(using=using):
+        # En la misma transacción: las lecturas ven las anteriores hasta el final
+        MemberRecommendation.objects.using(using).all().delete()
+        top, scores = top_books(members, books, weights, n, batch_size)
+        for start in range(0, len(member_ids), write_batch_size):
+            end = start + write_batch_size
+            rows = [
+                MemberRecommendation(member_id=member_id, book_id=book_id, rank=rank, score=score)
+                for member_id, books_row, scores_row in zip(
+                    member_ids[start:end].tolist(), book_ids[top[start:end]].tolist(), scores[start:end].tolist(),
+                )
+                for rank, (book_id, score) in enumerate(zip(books_row, scores_row))
+            ]
+            MemberRecommendation.objects.using(using).bulk_create(rows)
+            total += len(rows)
+    return total
+
+
+def recommended_books(member_id, limit=TOP_N):
+    """Libros recomendados al miembro, en orden (una consulta)"""
+    recommendations = MemberRecommendation.objects.filter(member_id=member_id).select_related('book')
+    return [recommendation.book for recommendation in recommendations.order_by('rank')[:limit]]
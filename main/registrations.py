@@ -0,0 +1,141 @@
+"""
+Inscripciones a eventos con aforo y lista de espera, sin carreras.
+
+El aforo se controla con ``Event.confirmed_count``: ``register`` suma la plaza
+con un único ``UPDATE ... WHERE confirmed_count < max_participants``, que la
+base de datos evalúa y aplica de forma atómica, en lugar de contar las
+inscripciones y luego insertar. Si no queda plaza la inscripción va a la lista
+de espera (``waitlist_count``). Ese ``UPDATE`` bloquea la fila del evento hasta
+el final de la transacción, así que ``cancel`` y ``fill_seats``, que la
+bloquean primero, ven siempre las altas ya confirmadas y ascienden a la lista
+de espera por orden de llegada.
+
+Las páginas muestran las plazas libres con los contadores, sin COUNT, y cada
+cambio toca ``Event.updated_at`` para renovar su versión en caché.
+"""
+from django.core.mail import EmailMessage, get_connection
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Event, EventRegistration
+
+CONFIRMED = 'confirmed'
+WAITLISTED = 'waitlisted'
+CANCELLED = 'cancelled'
+
+
+class RegistrationClosed(Exception):
+    """El evento no existe, está inactivo o ya empezó"""
+
+
+def register(event_id, name, email):
+    """
+    Inscribe ``email`` en el evento: ``(inscripción, True)`` con la plaza
+    confirmada o en lista de espera, o ``(inscripción vigente, False)`` si ya
+    estaba inscrito. ``email`` debe venir normalizado (``normalize_email``).
+    """
+    now = timezone.now()
+    name = (name or '').strip()[:EventRegistration._meta.get_field('name').max_length]
+    open_event = Event.objects.filter(pk=event_id, is_active=True, date__gte=now)
+    try:
+        with transaction.atomic():
+            confirmed = open_event.filter(
+                Q(max_participants__isnull=True) | Q(confirmed_count__lt=F('max_participants'))
+            ).update(confirmed_count=F('confirmed_count') + 1, updated_at=now)
+            if not confirmed and not open_event.update(waitlist_count=F('waitlist_count') + 1, updated_at=now):
+                raise RegistrationClosed
+            # Una inscripción repetida choca con unique_active_registration y deshace el contador
+            registration = EventRegistration.objects.create(
+                event_id=event_id, name=name or email, email=email,
+                status=CONFIRMED if confirmed else WAITLISTED,
+            )
+    except IntegrityError:
+        registration = EventRegistration.objects.exclude(status=CANCELLED).filter(
+            event_id=event_id, email=email,
+        ).first()
+        if registration is None:
+            raise
+        return registration, False
+    return registration, True
+
+
+def cancel(token):
+    """
+    Cancela la inscripción del ``token`` y, si tenía plaza, la pasa a la lista
+    de espera. Devuelve ``(inscripción, ascendidas)`` o ``(None, [])`` si el
+    token no existe o ya estaba cancelada.
+    """
+    registration = EventRegistration.objects.select_related('event').filter(token=token).first()
+    if registration is None:
+        return None, []
+    now = timezone.now()
+    with transaction.atomic():
+        # Primero el evento: las altas y ascensos en curso terminan antes y los nuevos esperan
+        Event.objects.select_for_update().filter(pk=registration.event_id).first()
+        # El estado se relee con el evento bloqueado (pudo ascender mientras tanto)
+        previous = EventRegistration.objects.filter(pk=registration.pk).values_list('status', flat=True).first()
+        if previous in (None, CANCELLED):
+            return None, []
+        EventRegistration.objects.filter(pk=registration.pk).update(status=CANCELLED, updated_at=now)
+        counter = 'confirmed_count' if previous == CONFIRMED else 'waitlist_count'
+        Event.objects.filter(pk=registration.event_id).update(**{counter: F(counter) - 1, 'updated_at': now})
+        promoted = fill_seats(registration.event_id) if previous == CONFIRMED else []
+    registration.status = CANCELLED
+    return registration, promoted
+
+
+def fill_seats(event_id):
+    """
+    Confirma por orden de llegada a tantas personas de la lista de espera como
+    plazas libres haya (al cancelar o al ampliar el aforo) y las devuelve.
+    """
+    with transaction.atomic():
+        event = Event.objects.select_for_update().filter(pk=event_id).first()
+        if event is None:
+            return []
+        waiting = EventRegistration.objects.filter(
+            event_id=event_id, status=WAITLISTED,
+        ).select_related('event').order_by('created_at', 'pk')
+        if event.max_participants is not None:
+            free = event.max_participants - event.confirmed_count
+            if free <= 0:
+                return []
+            waiting = waiting[:free]
+        promoted = list(waiting)
+        if promoted:
+            now = timezone.now()
+            EventRegistration.objects.filter(pk__in=[r.pk for r in promoted]).update(status=CONFIRMED, updated_at=now)
+            Event.objects.filter(pk=event_id).update(
+                confirmed_count=F('confirmed_count') + len(promoted),
+                waitlist_count=F('waitlist_count') - len(promoted),
+                updated_at=now,
+            )
+            for registration in promoted:
+                registration.status = CONFIRMED
+        return promoted
+
+
+def notify(registrations, event_url):
+    """
+    Correo a cada inscripción con su estado y el enlace para cancelar;
+    ``event_url`` es la URL absoluta de la página del evento.
+    """
+    messages = []
+    for registration in registrations:
+        context = {
+            'registration': registration,
+            'event': registration.event,
+            'cancel_url': f'{event_url}#cancelar={registration.token}',
+        }
+        messages.append(EmailMessage(
+            subject=f'{registration.get_status_display()}: {registration.event.title}',
+            body=render_to_string('main/email/registration.txt', context),
+            to=[registration.email],
+        ))
+    if messages:
+        # Un fallo del correo no deshace la inscripción
+        get_connection(fail_silently=True).send_messages(messages)
+    return len(messages)
+
@@ -0,0 +1,195 @@
+import re
+import unicodedata
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import F, FloatField, Func, Lookup, OuterRef, Q, Subquery, TextField, Value
+
+from .models import Book, BookSearchEntry
+
+SEARCH_CONFIG = 'spanish'
+SQLITE_FTS_TABLE = BookSearchEntry._meta.db_table
+
+# Alias de base de datos en los que ya se comprobó que existe la tabla FTS5
+_fts_ready = set()
+
+
+class Unaccent(Func):
+    function = 'UNACCENT'
+    output_field = TextField()
+
+
+class FTS5Match(Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return '%s MATCH %s' % (lhs, rhs), lhs_params + rhs_params
+
+
+BookSearchEntry._meta.get_field('document').register_lookup(FTS5Match)
+
+
+def fold_accents(text):
+    """Quita tildes y diacríticos y pasa a minúsculas ('García' -> 'garcia')"""
+    normalized = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in normalized if not unicodedata.combining(char)).lower()
+
+
+def search_backend(using='default'):
+    """Nombre del motor de búsqueda disponible para una base de datos"""
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        return 'postgresql'
+    if connection.vendor == 'sqlite' and _sqlite_fts_available(using):
+        return 'sqlite_fts5'
+    return 'icontains'
+
+
+def search_books(queryset, query):
+    """
+    Filtra ``queryset`` por ``query`` y lo ordena por relevancia.
+
+    Añade la anotación ``search_rank`` (mayor es más relevante) y usa el
+    vector de búsqueda mantenido en PostgreSQL o la tabla FTS5 en SQLite.
+    """
+    query = (query or '').strip()
+    if not query:
+        return queryset
+
+    backend = search_backend(queryset.db)
+    if backend == 'postgresql':
+        return _search_postgresql(queryset, query)
+    if backend == 'sqlite_fts5':
+        return _search_sqlite(queryset, query)
+    return _search_icontains(queryset, query)
+
+
+def _search_postgresql(queryset, query):
+    search_query = SearchQuery(fold_accents(query), config=SEARCH_CONFIG, search_type='websearch')
+    return queryset.filter(search_vector=search_query).annotate(
+        search_rank=SearchRank(F('search_vector'), search_query),
+    ).order_by('-search_rank', '-id')
+
+
+def _fts5_match_expression(query):
+    tokens = re.findall(r'\w+', fold_accents(query))
+    # Cada término entre comillas (sin operadores FTS5) y con búsqueda por prefijo
+    return ' '.join('"%s"*' % token for token in tokens)
+
+
+def _search_sqlite(queryset, query):
+    match = _fts5_match_expression(query)
+    if not match:
+        return queryset
+    # Unión con main_book_fts: SQLite recorre primero el índice FTS5 y luego busca por pk.
+    # El rango por defecto de la tabla es bm25() ponderado (negativo: menor es mejor).
+    return queryset.filter(search_entry__document__match=match).annotate(
+        search_rank=-F('search_entry__rank'),
+    ).order_by('-search_rank', '-id')
+
+
+def _search_icontains(queryset, query):
+    return queryset.filter(
+        Q(title__icontains=query) |
+        Q(author__icontains=query)
+    ).annotate(search_rank=Value(1.0, output_field=FloatField())).order_by('-search_rank', '-id')
+
+
+def _sqlite_fts_available(using):
+    if using in _fts_ready:
+        return True
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [SQLITE_FTS_TABLE]
+        )
+        if cursor.fetchone():
+            _fts_ready.add(using)
+            return True
+    return False
+
+
+def _genre_names():
+    through = Book.genres.through
+    return Subquery(
+        through.objects.filter(book=OuterRef('pk'))
+        .values('book')
+        .annotate(names=StringAgg('genre__name', delimiter=' '))
+        .values('names'),
+        output_field=TextField(),
+    )
+
+
+def search_vector_expression():
+    """Vector ponderado y sin tildes: título y autor (A), géneros (B), sinopsis (C)"""
+    return (
+        SearchVector(Unaccent(F('title')), config=SEARCH_CONFIG, weight='A') +
+        SearchVector(Unaccent(F('author')), config=SEARCH_CONFIG, weight='A') +
+        SearchVector(Unaccent(_genre_names()), config=SEARCH_CONFIG, weight='B') +
+        SearchVector(Unaccent(F('synopsis')), config=SEARCH_CONFIG, weight='C')
+    )
+
+
+def update_search_index(book_ids=None, using='default', batch_size=500):
+    """Recalcula el índice de búsqueda de los libros indicados (o de todos)"""
+    backend = search_backend(using)
+    if backend == 'postgresql':
+        books = Book.objects.using(using)
+        if book_ids is not None:
+            books = books.filter(pk__in=book_ids)
+        return books.update(search_vector=search_vector_expression())
+    if backend != 'sqlite_fts5':
+        return 0
+
+    if book_ids is None:
+        with connections[using].cursor() as cursor:
+            cursor.execute('DELETE FROM %s' % SQLITE_FTS_TABLE)
+            cursor.execute(_sqlite_index_sql(''))
+            return cursor.rowcount
+
+    book_ids = list(book_ids)
+    updated = 0
+    with connections[using].cursor() as cursor:
+        for start in range(0, len(book_ids), batch_size):
+            batch = book_ids[start:start + batch_size]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(
+                'DELETE FROM %s WHERE rowid IN (%s)' % (SQLITE_FTS_TABLE, placeholders), batch
+            )
+            cursor.execute(_sqlite_index_sql('WHERE b.id IN (%s)' % placeholders), batch)
+            updated += cursor.rowcount
+    return updated
+
+
+def remove_from_search_index(book_ids, using='default'):
+    """Elimina libros borrados del índice FTS5 (en PostgreSQL el vector se borra con la fila)"""
+    if search_backend(using) != 'sqlite_fts5':
+        return
+    book_ids = list(book_ids)
+    if not book_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(book_ids))
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            'DELETE FROM %s WHERE rowid IN (%s)' % (SQLITE_FTS_TABLE, placeholders), book_ids
+        )
+
+
+def _sqlite_index_sql(where):
+    through = Book.genres.through
+    genre_table = through._meta.get_field('genre').related_model._meta.db_table
+    return (
+        'INSERT INTO {fts} (rowid, title, author, synopsis, genres) '
+        'SELECT b.id, b.title, b.author, b.synopsis, '
+        '(SELECT group_concat(g.name, \' \') FROM {genre} g '
+        'INNER JOIN {through} bg ON bg.genre_id = g.id WHERE bg.book_id = b.id) '
+        'FROM {book} b {where}'
+    ).format(
+        fts=SQLITE_FTS_TABLE,
+        genre=genre_table,
+        through=through._meta.db_table,
+        book=Book._meta.db_table,
+        where=where,
+    )
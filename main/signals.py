@@ -0,0 +1,175 @@
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import caching
+from .http_cache import touch_content
+from .ical import EVENT_FIELDS
+from .models import BlogPost, Book, BookReview, Event, Gallery, Genre, Member
+from .ratings import apply_rating_changes, recompute_ratings
+from .search import remove_from_search_index, update_search_index
+
+
+@receiver(post_save, sender=Book)
+def index_book(sender, instance, raw=False, using='default', **kwargs):
+    """Mantiene actualizado el índice de búsqueda al guardar un libro"""
+    if raw:
+        return
+    update_search_index([instance.pk], using=using)
+
+
+@receiver(post_delete, sender=Book)
+def unindex_book(sender, instance, using='default', **kwargs):
+    remove_from_search_index([instance.pk], using=using)
+
+
+@receiver(m2m_changed, sender=Book.genres.through)
+def index_book_genres(sender, instance, action, reverse, pk_set, using='default', **kwargs):
+    """Los nombres de género forman parte del documento indexado"""
+    if action == 'pre_clear' and reverse:
+        instance._search_book_ids = list(instance.book_set.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove') and reverse:
+        update_search_index(pk_set, using=using)
+    elif action == 'post_clear' and reverse:
+        update_search_index(getattr(instance, '_search_book_ids', []), using=using)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        update_search_index([instance.pk], using=using)
+
+
+@receiver(post_save, sender=Genre)
+def index_genre_books(sender, instance, created, raw=False, using='default', **kwargs):
+    if raw or created:
+        return
+    book_ids = list(instance.book_set.values_list('pk', flat=True))
+    if book_ids:
+        update_search_index(book_ids, using=using)
+
+
+@receiver(pre_delete, sender=Genre)
+def remember_genre_books(sender, instance, **kwargs):
+    instance._search_book_ids = list(instance.book_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Genre)
+def reindex_genre_books(sender, instance, using='default', **kwargs):
+    book_ids = getattr(instance, '_search_book_ids', [])
+    if book_ids:
+        update_search_index(book_ids, using=using)
+
+
+# Caché de la portada: cada receptor invalida sólo los bloques afectados
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_home_book(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.invalidate_home_for_book(instance)
+
+
+@receiver(m2m_changed, sender=Book.genres.through)
+def invalidate_home_book_genres(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        caching.invalidate_home_for_books(None if action == 'post_clear' else pk_set)
+    else:
+        caching.invalidate_home_for_books({instance.pk})
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def invalidate_home_genre(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.invalidate_home_for_genre(instance)
+
+
+@receiver(pre_save, sender=Event)
+def revise_event(sender, instance, raw=False, using='default', update_fields=None, **kwargs):
+    """Sube ``sequence`` y fecha ``details_updated_at`` si cambia algo de lo que publica el calendario"""
+    if raw or instance._state.adding:
+        return
+    # update_fields puede nombrar la relación ('book') o su columna ('book_id')
+    if update_fields is not None and not {sender._meta.get_field(name).attname for name in update_fields} & set(EVENT_FIELDS):
+        return
+    old = sender.objects.using(using).filter(pk=instance.pk).values('sequence', *EVENT_FIELDS).first()
+    if old is None or all(old[name] == getattr(instance, name) for name in EVENT_FIELDS):
+        return
+    instance.sequence = old['sequence'] + 1
+    instance.details_updated_at = timezone.now()
+    if update_fields is not None:
+        # save(update_fields=...) no escribiría los dos campos; updated_at da la versión de las páginas
+        sender.objects.using(using).filter(pk=instance.pk).update(
+            sequence=F('sequence') + 1, details_updated_at=instance.details_updated_at,
+            updated_at=instance.details_updated_at,
+        )
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_home_event(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.invalidate_home_for_event(instance)
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+def invalidate_home_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.invalidate_home_for_post(instance)
+
+
+# Agregados de calificación: cada reseña suma o resta su valor en el libro
+
+@receiver(post_save, sender=BookReview)
+def count_review(sender, instance, created, raw=False, using='default', **kwargs):
+    if raw:
+        return
+    loaded = getattr(instance, '_loaded_rating', None)
+    current = (instance.book_id, instance.rating)
+    if created:
+        apply_rating_changes([current + (1,)], using=using)
+    elif loaded is None or None in loaded:
+        # Instancia sin valores previos conocidos: se recalcula el libro desde las reseñas
+        recompute_ratings([instance.book_id], using=using)
+    elif loaded != current:
+        apply_rating_changes([loaded + (-1,), current + (1,)], using=using)
+    instance._loaded_rating = current
+
+
+@receiver(post_delete, sender=BookReview)
+def uncount_review(sender, instance, using='default', **kwargs):
+    loaded = getattr(instance, '_loaded_rating', None)
+    if loaded is None or None in loaded:
+        loaded = (instance.book_id, instance.rating)
+    apply_rating_changes([loaded + (-1,)], using=using)
+
+
+# Marcas de última modificación para ETag/Last-Modified y la caché de páginas
+
+PUBLIC_CONTENT = [Book, Genre, BookReview, Event, BlogPost, Member, Gallery]
+
+
+def touch_public_content(sender, raw=False, **kwargs):
+    if not raw:
+        touch_content(sender)
+
+
+PUBLIC_RELATIONS = {
+    Book.genres.through: (Book, Genre),
+    Member.favorite_genres.through: (Member, Genre),
+}
+
+
+def touch_public_content_m2m(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        for model in PUBLIC_RELATIONS[sender]:
+            touch_content(model)
+
+
+for model in PUBLIC_CONTENT:
+    post_save.connect(touch_public_content, sender=model, dispatch_uid=f'touch-{model._meta.label_lower}')
+    post_delete.connect(touch_public_content, sender=model, dispatch_uid=f'untouch-{model._meta.label_lower}')
+
+for through in PUBLIC_RELATIONS:
+    m2m_changed.connect(touch_public_content_m2m, sender=through, dispatch_uid=f'touch-{through._meta.label_lower}')
@@ -0,0 +1,127 @@
+"""
+Mapa del sitio (protocolo sitemaps.org): un índice y un sitemap por sección,
+con las páginas fijas, los encuentros y las reflexiones.
+
+Así los buscadores llegan a cada ``event_detail`` y ``blog_detail`` sin
+recorrer los listados paginados. Las filas (pk y fecha, del índice parcial de
+cada sección) se leen dentro de la vista, como mucho ``LIMIT`` pares por
+archivo, y sólo el XML se genera y se envía por trozos: así las consultas
+ocurren dentro de ``replica_reads()`` y cuentan para el presupuesto y para
+Server-Timing, que ya han terminado cuando se envía el cuerpo. Una sección
+con más de ``LIMIT`` URLs se parte en varios archivos ``?desde=<pk>``, que se
+leen por rango de pk y nunca con OFFSET.
+
+Las vistas van con ``public_page``: la respuesta terminada se guarda en la
+caché y sólo se genera de nuevo cuando cambia el contenido.
+"""
+from datetime import timezone as dt_timezone
+from xml.sax.saxutils import escape
+
+from django.urls import reverse
+
+from .http_cache import content_timestamps, latest
+from .models import BlogPost, Book, Event, Gallery
+
+# Máximo de URLs por archivo según el protocolo; por encima la sección se parte
+LIMIT = 50000
+# Mayor pk posible (bigint); un ``?desde=`` por encima no corresponde a ningún archivo
+MAX_PK = 2 ** 63 - 1
+# Entradas por trozo de la respuesta
+CHUNK_SIZE = 1000
+XMLNS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+class Section:
+    """Páginas de detalle de un modelo: su sitemap, su vista y el campo de lastmod"""
+
+    def __init__(self, url_name, detail_url_name, queryset, lastmod_field):
+        self.url_name = url_name
+        self.detail_url_name = detail_url_name
+        self.queryset = queryset
+        self.lastmod_field = lastmod_field
+
+    def rows(self, start=None):
+        rows = self.queryset.order_by('pk').values_list('pk', self.lastmod_field)
+        return rows.filter(pk__gte=start) if start is not None else rows
+
+    def files(self):
+        """``(primer pk, último cambio)`` de cada archivo de LIMIT URLs, en una sola pasada"""
+        start = lastmod = None
+        for count, (pk, modified) in enumerate(self.rows().iterator(chunk_size=CHUNK_SIZE)):
+            if count % LIMIT == 0:
+                if start is not None:
+                    yield start, lastmod
+                start, lastmod = pk, modified
+            else:
+                lastmod = max(lastmod, modified)
+        if start is not None:
+            yield start, lastmod
+
+    def urls(self, start=None):
+        """Lista de ``(ruta, lastmod)`` de las LIMIT páginas a partir del pk ``start``"""
+        # reverse() una sola vez: por cada una de las 50.000 URLs sería lo más caro
+        pattern = reverse(self.detail_url_name, kwargs={'pk': 0}).replace('/0/', '/{}/')
+        rows = self.rows(start)[:LIMIT].iterator(chunk_size=CHUNK_SIZE)
+        return [(pattern.format(pk), modified) for pk, modified in rows]
+
+
+SECTIONS = {
+    'events': Section('main:sitemap_events', 'main:event_detail', Event.objects.filter(is_active=True), 'created_at'),
+    'posts': Section('main:sitemap_posts', 'main:blog_detail', BlogPost.objects.filter(is_published=True), 'updated_at'),
+}
+
+
+def page_urls():
+    """``(ruta, lastmod)`` de las páginas fijas; lastmod sale del contenido que listan"""
+    books, events, posts, gallery = content_timestamps([latest(Book), latest(Event), latest(BlogPost), latest(Gallery)])
+    known = [value for value in (books, events, posts, gallery) if value]
+    lastmods = {
+        'main:home': max(known, default=None),
+        'main:about': None,
+        'main:current_reading': books,
+        'main:upcoming_readings': books,
+        'main:events': events,
+        'main:library': books,
+        'main:blog': posts,
+        'main:gallery': gallery,
+        'main:join': None,
+        'main:suggest_book': None,
+        'main:contact': None,
+    }
+    return [(reverse(name), lastmod) for name, lastmod in lastmods.items()]
+
+
+def format_lastmod(value):
+    return value.astimezone(dt_timezone.utc).isoformat(timespec='seconds')
+
+
+def entry(tag, loc, lastmod=None):
+    lastmod = f'<lastmod>{format_lastmod(lastmod)}</lastmod>' if lastmod else ''
+    return f'<{tag}><loc>{escape(loc)}</loc>{lastmod}</{tag}>\n'
+
+
+def document(root, entries):
+    """Documento XML por trozos: cabecera, entradas de CHUNK_SIZE en CHUNK_SIZE y cierre"""
+    yield f'<?xml version="1.0" encoding="UTF-8"?>\n<{root} xmlns="{XMLNS}">\n'
+    chunk = []
+    for line in entries:
+        chunk.append(line)
+        if len(chunk) >= CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    yield ''.join(chunk) + f'</{root}>\n'
+
+
+def index(base):
+    """Índice con el sitemap de páginas fijas y los archivos de cada sección"""
+    pages = [lastmod for _, lastmod in page_urls() if lastmod]
+    entries = [entry('sitemap', base + reverse('main:sitemap_pages'), max(pages, default=None))]
+    for section in SECTIONS.values():
+        url = base + reverse(section.url_name)
+        for number, (start, lastmod) in enumerate(section.files()):
+            entries.append(entry('sitemap', url if number == 0 else f'{url}?desde={start}', lastmod))
+    return document('sitemapindex', entries)
+
+
+def urlset(base, urls):
+    return document('urlset', (entry('url', base + path, lastmod) for path, lastmod in urls))
@@ -0,0 +1,58 @@
+function toggleDarkMode() {
+    document.body.classList.toggle('dark-mode');
+    const isDark = document.body.classList.contains('dark-mode');
+    localStorage.setItem('darkMode', isDark);
+
+    const btn = document.querySelector('[onclick="toggleDarkMode()"]');
+    if (isDark) {
+        btn.innerHTML = '<i class="fas fa-sun me-1"></i>Modo Claro';
+    } else {
+        btn.innerHTML = '<i class="fas fa-moon me-1"></i>Modo Oscuro';
+    }
+}
+
+// Newsletter e inscripciones: el token CSRF se pide aparte para que las páginas se puedan cachear
+document.querySelectorAll('.newsletter-form, .ajax-form').forEach(function(form) {
+    form.addEventListener('submit', function(event) {
+        event.preventDefault();
+        const message = form.querySelector('.newsletter-message, .form-message');
+        fetch(form.dataset.csrfUrl, {credentials: 'same-origin'})
+            .then(function(response) { return response.json(); })
+            .then(function(data) {
+                return fetch(form.action, {
+                    method: 'POST',
+                    body: new FormData(form),
+                    headers: {'X-CSRFToken': data.csrfToken},
+                    credentials: 'same-origin'
+                });
+            })
+            .then(function(response) { return response.json(); })
+            .then(function(data) {
+                message.textContent = data.message;
+                if (data.success) {
+                    form.reset();
+                }
+            })
+            .catch(function() {
+                message.textContent = form.dataset.error || 'Error en la suscripción.';
+            });
+    });
+});
+
+// Enlace de cancelación del correo de inscripción: #cancelar=<token>
+if (location.hash.indexOf('#cancelar=') === 0) {
+    document.querySelectorAll('.rsvp-cancel').forEach(function(form) {
+        form.querySelector('[name="token"]').value = location.hash.slice('#cancelar='.length);
+        form.classList.remove('d-none');
+    });
+}
+
+// Load dark mode preference
+document.addEventListener('DOMContentLoaded', function() {
+    const isDark = localStorage.getItem('darkMode') === 'true';
+    if (isDark) {
+        document.body.classList.add('dark-mode');
+        const btn = document.querySelector('[onclick="toggleDarkMode()"]');
+        btn.innerHTML = '<i class="fas fa-sun me-1"></i>Modo Claro';
+    }
+});
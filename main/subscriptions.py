@@ -0,0 +1,132 @@
+"""
+Altas en el newsletter sin carreras.
+
+``subscribe`` hace el alta en una sola sentencia (``INSERT ... ON CONFLICT``,
+igual en PostgreSQL y SQLite): dos peticiones simultáneas con el mismo email
+nunca chocan con la restricción única (los emails se guardan en minúsculas, lo
+garantiza la restricción ``newsletter_email_lowercase``). Con ``NEWSLETTER_WRITE_BEHIND`` las
+altas se acumulan en memoria y ``subscription_buffer`` las escribe por lotes
+con ``bulk_create(ignore_conflicts=True)``.
+"""
+import atexit
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, close_old_connections, connections, router, transaction
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+
+from .models import Newsletter
+
+
+def normalize_email(email):
+    """Email sin espacios y en minúsculas; ``ValidationError`` si no es válido"""
+    email = (email or '').strip().lower()
+    validate_email(email)
+    if len(email) > Newsletter._meta.get_field('email').max_length:
+        raise ValidationError('Email demasiado largo.')
+    return email
+
+
+def _clean_name(name):
+    return (name or '').strip()[:Newsletter._meta.get_field('name').max_length]
+
+
+def subscribe(email, name=''):
+    """
+    Da de alta (o reactiva) ``email`` y devuelve True; False si ya estaba suscrito.
+
+    ``email`` debe venir normalizado (``normalize_email``).
+    """
+    name = _clean_name(name)
+    connection = connections[router.db_for_write(Newsletter)]
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        return _subscribe_get_or_create(email, name)
+
+    table = connection.ops.quote_name(Newsletter._meta.db_table)
+    with connection.cursor() as cursor:
+        # Devuelve la fila si se insertó o se reactivó; nada si ya estaba activa
+        cursor.execute(
+            f'INSERT INTO {table} (email, name, subscribed_at, is_active) VALUES (%s, %s, %s, %s) '
+            f'ON CONFLICT (email) DO UPDATE SET is_active = %s WHERE {table}.is_active = %s '
+            f'RETURNING id',
+            [email, name, connection.ops.adapt_datetimefield_value(timezone.now()), True, True, False],
+        )
+        return cursor.fetchone() is not None
+
+
+def _subscribe_get_or_create(email, name):
+    try:
+        subscriber, created = Newsletter.objects.get_or_create(email=email, defaults={'name': name})
+    except IntegrityError:
+        return False
+    if not created and not subscriber.is_active:
+        return Newsletter.objects.filter(pk=subscriber.pk, is_active=False).update(is_active=True) > 0
+    return created
+
+
+class SubscriptionBuffer:
+    """
+    Buffer de escritura diferida para altas del newsletter.
+
+    ``add`` sólo guarda el email en memoria (ninguna consulta en la petición); un
+    hilo vacía el buffer al llegar a ``max_size`` altas, ``max_delay`` segundos
+    después de la primera pendiente o al terminar el proceso. Cada vaciado es
+    una transacción con un ``bulk_create(ignore_conflicts=True)`` y la
+    reactivación de las bajas. Lo pendiente se pierde si el proceso muere sin
+    salir limpiamente.
+    """
+
+    def __init__(self, max_size=500, max_delay=2.0):
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.timer = None
+        atexit.register(self.flush)
+
+    def add(self, email, name=''):
+        with self.lock:
+            self.pending.setdefault(email, _clean_name(name))
+            if len(self.pending) >= self.max_size:
+                # Lleno: se vacía ya, pero fuera de la petición
+                delay = 0
+            elif self.timer is None:
+                delay = self.max_delay
+            else:
+                return
+            if self.timer is not None:
+                self.timer.cancel()
+            self.timer = threading.Timer(delay, self._flush_in_thread)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        """Escribe lo pendiente y devuelve cuántas altas se procesaron"""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        if not pending:
+            return 0
+        with transaction.atomic():
+            Newsletter.objects.bulk_create(
+                [Newsletter(email=email, name=name) for email, name in pending.items()],
+                batch_size=self.max_size, ignore_conflicts=True,
+            )
+            Newsletter.objects.filter(email__in=list(pending), is_active=False).update(is_active=True)
+        return len(pending)
+
+    def _flush_in_thread(self):
+        try:
+            self.flush()
+        finally:
+            close_old_connections()
+
+
+subscription_buffer = SimpleLazyObject(lambda: SubscriptionBuffer(
+    settings.NEWSLETTER_BUFFER_SIZE, settings.NEWSLETTER_BUFFER_DELAY,
+))
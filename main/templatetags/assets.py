@@ -0,0 +1,13 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from .. import assets
+
+register = template.Library()
+
+
+@register.simple_tag
+def critical_css():
+    """``<style>`` con el CSS crítico generado por ``build_assets``; nada si aún no existe"""
+    css = assets.critical_css()
+    return mark_safe(f'<style>{css}</style>') if css else ''
@@ -0,0 +1,17 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from ..caching import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def cached_cards(name, objects):
+    """
+    Tarjetas de ``objects`` con la plantilla registrada como ``name`` en
+    main.caching.CARDS, cacheadas por objeto y versión::
+
+        {% cached_cards 'book' page_obj %}
+    """
+    return mark_safe(render_cards(name, objects))
@@ -0,0 +1,31 @@
+from django import template
+
+from ..images import image_variants
+
+register = template.Library()
+
+
+@register.inclusion_tag('main/responsive_image.html')
+def responsive_image(url, alt='', sizes='100vw', css_class='', style='', width=None, height=None, default_width=None, loading='lazy'):
+    """
+    ``<picture>`` con ``srcset`` WebP/JPEG de las variantes de ``url``, o un
+    ``<img>`` con la URL original si aún no se han generado.
+
+    ``width``/``height`` fijan el tamaño mostrado; sin ellos se usan las
+    proporciones del original para reservar el hueco antes de cargar. Las
+    imágenes visibles al cargar la página deben pasar ``loading='eager'``.
+    """
+    variants = image_variants(url, default_width or width)
+    if variants and not width:
+        width, height = variants['width'], variants['height']
+    return {
+        'url': url,
+        'variants': variants,
+        'alt': alt,
+        'sizes': sizes,
+        'css_class': css_class,
+        'style': style,
+        'width': width,
+        'height': height,
+        'loading': loading,
+    }
@@ -1,3 +1,1584 @@
-from django.test import TestCase
+import base64
+import csv
+import io
+import json
+import os
+import re
+import smtplib
+import tempfile
+import threading
+import time
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from unittest import mock
+from urllib.parse import urlencode
+from xml.etree import ElementTree
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.core.cache import cache
+from django.db import IntegrityError, close_old_connections, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import F
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import async_views, ical, sitemaps, views
+from . import urls as main_urls
+from PIL import Image
+
+from .benchmarks import (
+    LatencyProxy, LocalImageServer, LocalSMTPServer, admin_paths, public_paths, seed_books, seed_site,
+)
+from .catalog_import import BookImporter
+from .caching import (
+    build_upcoming_events, cache_stats, card_key, get_home_blocks, home_block_key, render_cards, reset_cache_stats,
+)
+from .concurrency import gather_queries
+from .db_router import STICKY_COOKIE
+from .exports import export_rows
+from . import assets
+from .assets import parse_css, prune, serialize
+from .images import build_variants, fetch_image, get_manifest
+from .instrumentation import finish_request, measure_request, reset_view_stats, view_percentiles
+from .models import (
+    BlogPost, Book, BookReview, CampaignFailure, Event, EventRegistration, Gallery, Genre, Member,
+    MemberRecommendation, Newsletter, NewsletterCampaign,
+)
+from .newsletter import CampaignSender
+from .pagination import KeysetPaginator
+from .query_budget import QueryBudgetTestMixin
+from .query_plans import sequential_scans
+from .ratings import recompute_ratings
+from .recommendations import load_matrices, recommended_books, refresh_recommendations, top_books
+from .search import fold_accents, search_books
+from .subscriptions import SubscriptionBuffer
+from .throttling import hit
+
+
+def setUpModule():
+    # Los estilos y el CSS crítico no se versionan: se generan en una carpeta temporal, fuera del código
+    global generated_assets, generated_assets_settings
+    generated_assets = tempfile.TemporaryDirectory()
+    root = Path(generated_assets.name)
+    static_dirs = [path for path in settings.STATICFILES_DIRS if path != settings.GENERATED_ASSETS_DIR / 'static']
+    generated_assets_settings = override_settings(GENERATED_ASSETS_DIR=root, STATICFILES_DIRS=static_dirs + [root / 'static'])
+    generated_assets_settings.enable()
+    call_command('build_assets', stdout=io.StringIO())
+
+
+def tearDownModule():
+    generated_assets_settings.disable()
+    generated_assets.cleanup()
+
+
+class BookSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.realismo = Genre.objects.create(name='Realismo Mágico')
+        cls.cien_anos = Book.objects.create(
+            title='Cien años de soledad', author='Gabriel García Márquez',
+            synopsis='La historia de la familia Buendía en Macondo.', reading_status='completed',
+        )
+        cls.cien_anos.genres.add(cls.realismo)
+        cls.ficciones = Book.objects.create(
+            title='Ficciones', author='Jorge Luis Borges',
+            synopsis='Cuentos sobre laberintos, espejos y soledad.', reading_status='completed',
+        )
+
+    def test_fold_accents(self):
+        self.assertEqual(fold_accents('García Márquez'), 'garcia marquez')
+
+    def test_accent_insensitive_match(self):
+        results = search_books(Book.objects.all(), 'Garcia')
+        self.assertEqual(list(results), [self.cien_anos])
+
+    def test_searches_genres_and_synopsis(self):
+        self.assertEqual(list(search_books(Book.objects.all(), 'magico')), [self.cien_anos])
+        self.assertEqual(list(search_books(Book.objects.all(), 'laberintos')), [self.ficciones])
+
+    def test_ranked_by_relevance(self):
+        # "soledad" aparece en el título de uno y sólo en la sinopsis del otro
+        results = list(search_books(Book.objects.all(), 'soledad'))
+        self.assertEqual(results, [self.cien_anos, self.ficciones])
+        self.assertGreater(results[0].search_rank, results[1].search_rank)
+
+    def test_index_follows_changes(self):
+        self.ficciones.title = 'El Aleph'
+        self.ficciones.save()
+        self.assertEqual(list(search_books(Book.objects.all(), 'aleph')), [self.ficciones])
+
+        self.realismo.name = 'Surrealismo'
+        self.realismo.save()
+        self.assertEqual(list(search_books(Book.objects.all(), 'surrealismo')), [self.cien_anos])
+
+        self.cien_anos.genres.clear()
+        self.assertEqual(list(search_books(Book.objects.all(), 'surrealismo')), [])
+
+    def test_library_view_uses_search(self):
+        response = self.client.get(reverse('main:library'), {'search': 'marquez'}, secure=True)
+        self.assertContains(response, 'Cien años de soledad')
+        self.assertNotContains(response, 'Ficciones')
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Fechas repetidas y nulas para ejercitar el desempate por id y el orden de los nulos
+        end_dates = [date(2024, 1, 1), date(2024, 1, 1), None, date(2023, 6, 1), None, date(2024, 3, 1), date(2022, 1, 1)]
+        for n, end_date in enumerate(end_dates):
+            Book.objects.create(
+                title=f'Libro {n}', author='Autor', synopsis='...', reading_status='completed', reading_end_date=end_date,
+            )
+        cls.ordering = ('-reading_end_date', '-id')
+        cls.expected = list(Book.objects.order_by(F('reading_end_date').desc(nulls_last=True), '-id'))
+
+    def walk(self, per_page):
+        paginator = KeysetPaginator(Book.objects.all(), per_page, self.ordering)
+        pages = [paginator.get_page(None)]
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        return paginator, pages
+
+    def test_forward_walk_covers_everything_once(self):
+        for per_page in (1, 2, 3, 7, 10):
+            _, pages = self.walk(per_page)
+            self.assertEqual([book for page in pages for book in page], self.expected)
+            self.assertFalse(pages[0].has_previous())
+
+    def test_backward_walk_returns_same_pages(self):
+        paginator, pages = self.walk(2)
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = paginator.get_page(page.previous_cursor)
+            self.assertEqual(list(page), list(expected))
+        self.assertFalse(page.has_previous())
+
+    def test_invalid_cursor_returns_first_page(self):
+        paginator = KeysetPaginator(Book.objects.all(), 3, self.ordering)
+        self.assertEqual(list(paginator.get_page('no-es-un-cursor')), self.expected[:3])
+
+    def test_malformed_cursors_never_fail(self):
+        def encode(payload):
+            return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+        cursors = [
+            'x', '%%%', encode('{"n": 1}'), encode('7'), encode('["n"]'), encode('["n", [1]]'),
+            encode('["n", [1, 2, 3]]'), encode('["n", ["hoy", 1]]'), encode('["n", [[1], {}]]'),
+            encode('["n", ["abc", 1]]'), encode('[["n"], [1, 2]]'), encode('\xff'),
+            encode('["n", ["2024-01-05", 1e400]]'), encode('["n", ["2024-01-05", 100000000000000000000000000000]]'),
+            encode('["n", [1e400, 1]]'), encode('["n", [NaN, 1]]'),
+        ]
+        paths = [
+            (reverse('main:library'), {}), (reverse('main:library'), {'search': 'libro'}),
+            (reverse('main:blog'), {}), (reverse('main:gallery'), {}),
+        ]
+        for path, params in paths:
+            first = self.client.get(path, params, secure=True)
+            for cursor in cursors:
+                with self.subTest(path=path, params=params, cursor=cursor):
+                    # Un cursor mal formado da la primera página
+                    response = self.client.get(path, {**params, 'cursor': cursor}, secure=True)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(list(response.context['page_obj']), list(first.context['page_obj']))
+
+    def test_page_cost_is_constant(self):
+        _, pages = self.walk(2)
+        paginator = KeysetPaginator(Book.objects.all(), 2, self.ordering)
+        # Una sola consulta por página, sin COUNT(*)
+        with self.assertNumQueries(1):
+            list(paginator.get_page(pages[2].next_cursor))
+
+    def test_walks_search_results_by_rank(self):
+        books = search_books(Book.objects.all(), 'libro autor')
+        expected = list(books)
+        paginator = KeysetPaginator(books, 2, ('-search_rank', '-id'))
+        page = paginator.get_page(None)
+        seen = list(page)
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor)
+            seen.extend(page)
+        self.assertEqual(seen, expected)
+
+    def test_optional_count(self):
+        self.assertIsNone(KeysetPaginator(Book.objects.all(), 2, self.ordering).count)
+        self.assertEqual(KeysetPaginator(Book.objects.all(), 2, self.ordering, count='approximate').count, 7)
+
+    def test_blog_view_links_next_page(self):
+        for n in range(8):
+            BlogPost.objects.create(title=f'Entrada {n}', author_name='Autora', content='Texto')
+        response = self.client.get(reverse('main:blog'), secure=True)
+        next_cursor = response.context['page_obj'].next_cursor
+        self.assertContains(response, f'?cursor={next_cursor}')
+        response = self.client.get(reverse('main:blog'), {'cursor': next_cursor}, secure=True)
+        self.assertEqual([post.title for post in response.context['page_obj']], ['Entrada 1', 'Entrada 0'])
+
+
+def create_catalog(size, offset=0):
+    """Datos relacionados de todo tipo para ``size`` elementos por modelo"""
+    genres = [Genre.objects.get_or_create(name=f'Género {n}')[0] for n in range(3)]
+    now = timezone.now()
+    for n in range(offset, offset + size):
+        for status in ('completed', 'upcoming'):
+            book = Book.objects.create(
+                title=f'Libro {status} {n}', author='Autor', synopsis='Sinopsis', reading_status=status,
+            )
+            book.genres.set(genres)
+        BookReview.objects.create(book=book, author_name='Lector', rating=4, review_text='Bien')
+        Event.objects.create(title=f'Evento {n}', description='...', date=now + timedelta(days=n + 1), book=book)
+        event = Event.objects.create(title=f'Pasado {n}', description='...', date=now - timedelta(days=n + 1), book=book)
+        BlogPost.objects.create(
+            title=f'Entrada {n}', author_name='Autora', content='Texto', book=book,
+            featured_quote='Una cita', is_featured=True,
+        )
+        Gallery.objects.create(title=f'Foto {n}', image_url='https://example.com/foto.jpg', event=event, is_featured=True)
+        Member.objects.create(name=f'Miembro {n}', email=f'm{n}@example.com').favorite_genres.set(genres)
+    current = Book.objects.create(title='Actual', author='Autor', synopsis='...', reading_status='current')
+    current.genres.set(genres)
+    BookReview.objects.create(book=current, author_name='Lector', rating=5, review_text='Muy bien')
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    def public_paths(self):
+        event = Event.objects.order_by('pk').first()
+        post = BlogPost.objects.order_by('pk').first()
+        paths = []
+        for pattern in main_urls.urlpatterns:
+            name = f'{main_urls.app_name}:{pattern.name}'
+            if 'pk' in pattern.pattern.converters:
+                pk = {'event': event.pk, 'book': post.book_id}.get(pattern.name.split('_')[0], post.pk)
+                paths.append(reverse(name, kwargs={'pk': pk}))
+            else:
+                paths.append(reverse(name))
+        return paths
+
+    def measure(self):
+        # Se mide el camino en frío: la portada no debe salir de la caché
+        cache.clear()
+        counts = {}
+        for path in self.public_paths():
+            response, count = self.assertWithinQueryBudget(path, secure=True)
+            self.assertEqual(response.status_code, 200, path)
+            counts[path] = count
+        return counts
+
+    def test_every_url_within_budget_and_constant(self):
+        create_catalog(2)
+        small = self.measure()
+        create_catalog(10, offset=2)
+        # Con cinco veces más datos ninguna vista ejecuta más consultas (sin N+1)
+        self.assertEqual(self.measure(), small)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class QueryPlanTests(TestCase):
+    # Las páginas que listan todos los géneros los leen enteros a propósito
+    ALLOWED_SCANS = {'main_genre'}
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_books(300)
+        seed_site()
+        Member.objects.bulk_create([Member(name=f'Miembro {n}', email=f'm{n}@example.com') for n in range(100)])
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # Con tablas pequeñas PostgreSQL prefiere recorrerlas; así sólo lo hace si no hay índice útil
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def test_public_pages_use_indexes(self):
+        genre = Genre.objects.order_by('pk').first()
+        # La biblioteca filtra por el nombre del género (?genre=) y busca con ?search=
+        library = reverse('main:library')
+        paths = public_paths() + [f"{library}?{urlencode({'genre': genre.name})}", f'{library}?search=amor']
+        for path in paths:
+            with self.subTest(path=path), CaptureQueriesContext(connection) as captured:
+                response = self.client.get(path, secure=True)
+                self.assertEqual(response.status_code, 200)
+                if response.streaming:
+                    response.getvalue()
+                scans = sequential_scans(captured.captured_queries, allowed=self.ALLOWED_SCANS)
+                self.assertEqual(scans, [], f'{path} recorre tablas enteras')
+
+
+class HomeCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_cache_stats()
+        create_catalog(2)
+
+    def test_steady_state_runs_no_queries(self):
+        get_home_blocks()
+        with self.assertNumQueries(0):
+            blocks = get_home_blocks()
+        self.assertEqual(blocks['current_book'].title, 'Actual')
+        self.assertEqual(cache_stats()['home'], {'hits': 4, 'misses': 4})
+        # La vista sólo consulta las fechas de última modificación (ETag)
+        with self.assertNumQueries(1):
+            self.client.get(reverse('main:home'), secure=True)
+
+    def test_changes_invalidate_only_affected_block(self):
+        blocks = get_home_blocks()
+        with self.captureOnCommitCallbacks(execute=True):
+            Event.objects.create(title='Nuevo', description='...', date=timezone.now() + timedelta(hours=1))
+        self.assertIsNone(cache.get(home_block_key('upcoming_events')))
+        self.assertIsNotNone(cache.get(home_block_key('current_book')))
+        self.assertEqual(get_home_blocks()['upcoming_events'][0].title, 'Nuevo')
+
+        current = blocks['current_book']
+        with self.captureOnCommitCallbacks(execute=True):
+            current.genres.clear()
+        self.assertIsNone(cache.get(home_block_key('current_book')))
+        self.assertIsNotNone(cache.get(home_block_key('featured_posts')))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BlogPost.objects.create(title='Destacada', author_name='A', content='...', is_featured=True)
+        self.assertIsNone(cache.get(home_block_key('featured_posts')))
+        self.assertIsNotNone(cache.get(home_block_key('upcoming_events')))
+
+    def test_upcoming_events_expire_when_first_event_starts(self):
+        Event.objects.all().delete()
+        Event.objects.create(title='Pronto', description='...', date=timezone.now() + timedelta(seconds=30))
+        events, timeout = build_upcoming_events()
+        self.assertEqual([event.title for event in events], ['Pronto'])
+        self.assertLessEqual(timeout, 31)
+
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(title='Reseñado', author='Autor', synopsis='...')
+        self.other = Book.objects.create(title='Otro', author='Autor', synopsis='...')
+
+    def review(self, rating, book=None):
+        return BookReview.objects.create(book=book or self.book, author_name='Lector', rating=rating, review_text='...')
+
+    def assertAggregates(self, book, count, average, histogram):
+        book.refresh_from_db()
+        self.assertEqual(book.rating_count, count)
+        self.assertEqual(float(book.average_rating), average)
+        self.assertEqual([row['count'] for row in book.rating_histogram], histogram)
+
+    def test_create_edit_delete_update_aggregates(self):
+        first = self.review(5)
+        self.review(4)
+        self.review(3)
+        self.assertAggregates(self.book, 3, 4.0, [1, 1, 1, 0, 0])
+
+        first = BookReview.objects.get(pk=first.pk)
+        first.rating = 2
+        first.save()
+        self.assertAggregates(self.book, 3, 3.0, [0, 1, 1, 1, 0])
+
+        first.book = self.other
+        first.save()
+        self.assertAggregates(self.book, 2, 3.5, [0, 1, 1, 0, 0])
+        self.assertAggregates(self.other, 1, 2.0, [0, 0, 0, 1, 0])
+
+        for review in self.book.reviews.order_by('rating'):
+            review.delete()
+        # Sin reseñas el promedio no se toca: queda el de la última
+        self.assertAggregates(self.book, 0, 4.0, [0, 0, 0, 0, 0])
+
+    def test_write_does_not_aggregate_reviews(self):
+        self.review(4)
+        with self.assertNumQueries(2):
+            # Un INSERT y un UPDATE con deltas, sin SELECT sobre las reseñas
+            self.book.reviews.create(author_name='Lector', rating=1, review_text='...')
+        self.assertAggregates(self.book, 2, 2.5, [0, 1, 0, 0, 1])
+
+    def test_recompute_fixes_drift(self):
+        self.review(5)
+        self.review(2, book=self.other)
+        Book.objects.update(rating_count=99, average_rating=1)
+        self.assertEqual(recompute_ratings(batch_size=1), 2)
+        self.assertAggregates(self.book, 1, 5.0, [1, 0, 0, 0, 0])
+        self.assertAggregates(self.other, 1, 2.0, [0, 0, 0, 1, 0])
+
+    def test_unreviewed_books_keep_their_average(self):
+        # Promedio escrito a mano antes de que hubiera reseñas
+        Book.objects.filter(pk=self.other.pk).update(average_rating=4.2)
+        Book.objects.filter(pk=self.book.pk).update(average_rating=3.8)
+        self.assertEqual(recompute_ratings(), 2)
+        self.assertAggregates(self.other, 0, 4.2, [0, 0, 0, 0, 0])
+
+        review = self.review(2, book=self.other)
+        self.assertAggregates(self.other, 1, 2.0, [0, 0, 0, 1, 0])
+        review.delete()
+        self.assertAggregates(self.other, 0, 2.0, [0, 0, 0, 0, 0])
+        self.assertAggregates(self.book, 0, 3.8, [0, 0, 0, 0, 0])
+
+
+class PublicPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_cache_stats()
+        create_catalog(2)
+
+    def get(self, name='main:blog', **extra):
+        return self.client.get(reverse(name), secure=True, **extra)
+
+    def test_anonymous_response_is_shareable(self):
+        response = self.get()
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+        self.assertIn('public', response['Cache-Control'])
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+        self.assertNotIn('csrftoken', response.cookies)
+
+    def test_conditional_get_returns_304(self):
+        etag = self.get()['ETag']
+        with self.assertNumQueries(1):
+            response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        modified = self.get()['Last-Modified']
+        self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE=modified).status_code, 304)
+
+    def test_repeat_visit_skips_rendering(self):
+        first = self.get()
+        with self.assertNumQueries(1):
+            second = self.get()
+        self.assertEqual(second.templates, [])
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(cache_stats()['page'], {'hits': 1, 'misses': 1})
+
+    def test_content_change_changes_version(self):
+        etag = self.get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            BlogPost.objects.create(title='Recién publicada', author_name='A', content='...')
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Recién publicada')
+
+        # Los borrados no mueven updated_at: los cubre la marca de la señal
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            BlogPost.objects.filter(title='Recién publicada').delete()
+        self.assertNotEqual(self.get()['ETag'], etag)
+
+    def test_session_requests_are_not_shared(self):
+        self.client.cookies['sessionid'] = 'abc'
+        response = self.get()
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('page', cache_stats())
+
+    def test_csrf_token_endpoint(self):
+        response = self.get('main:csrf_token')
+        self.assertTrue(response.json()['csrfToken'])
+        self.assertIn('csrftoken', response.cookies)
+        self.assertIn('no-store', response['Cache-Control'])
+
+
+class CardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_cache_stats()
+        create_catalog(3)
+
+    def posts(self):
+        return BlogPost.objects.select_related('book').order_by('pk')
+
+    def test_only_missing_cards_are_rendered(self):
+        first = render_cards('post', self.posts())
+        self.assertEqual(cache_stats()['cards'], {'hits': 0, 'misses': 3})
+        with self.assertTemplateNotUsed('main/cards/post.html'), self.assertNumQueries(1):
+            self.assertEqual(render_cards('post', self.posts()), first)
+
+        BlogPost.objects.filter(pk=self.posts()[0].pk).update(updated_at=timezone.now() + timedelta(seconds=1))
+        with self.assertTemplateUsed('main/cards/post.html', count=1):
+            render_cards('post', self.posts())
+        self.assertEqual(cache_stats()['cards'], {'hits': 5, 'misses': 4})
+
+    def test_new_deploy_renders_cards_again(self):
+        first = render_cards('post', self.posts())
+        with self.settings(CARD_CACHE_VERSION='otro-despliegue'):
+            with self.assertTemplateUsed('main/cards/post.html', count=3):
+                self.assertEqual(render_cards('post', self.posts()), first)
+        with mock.patch.object(staticfiles_storage, 'manifest_hash', 'nuevo', create=True):
+            render_cards('post', self.posts())
+        self.assertEqual(cache_stats()['cards'], {'hits': 0, 'misses': 9})
+
+    def test_version_follows_related_data(self):
+        def book_key():
+            book = Book.objects.prefetch_related('genres').get(title='Libro completed 0')
+            return card_key('book', book)
+
+        def post_key():
+            return card_key('post', self.posts()[0])
+
+        book, post = book_key(), post_key()
+        Genre.objects.filter(name='Género 0').update(name='Ensayo')
+        self.assertNotEqual(book_key(), book)
+        self.assertEqual(post_key(), post)
+        Book.objects.filter(pk=self.posts()[0].book_id).update(title='Otro título')
+        self.assertNotEqual(post_key(), post)
+
+    def test_listing_pages_reuse_cards_after_page_invalidation(self):
+        self.client.get(reverse('main:gallery'), secure=True)
+        self.assertEqual(cache_stats()['cards'], {'hits': 0, 'misses': 6})
+        with self.captureOnCommitCallbacks(execute=True):
+            Gallery.objects.create(title='Nueva', image_url='https://example.com/nueva.jpg')
+        response = self.client.get(reverse('main:gallery'), secure=True)
+        self.assertContains(response, 'Nueva')
+        # Sólo la foto nueva (destacada no, en la página sí) se renderiza
+        self.assertEqual(cache_stats()['cards'], {'hits': 6, 'misses': 7})
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        # Cada base con un contenido distinto para saber de cuál se leyó
+        BlogPost.objects.create(title='En la primaria', author_name='A', content='...')
+        BlogPost.objects.using('replica').create(title='En la réplica', author_name='A', content='...')
+
+    def get(self, name='main:blog'):
+        return self.client.get(reverse(name), secure=True)
+
+    def test_public_pages_read_from_replica(self):
+        response = self.get()
+        self.assertContains(response, 'En la réplica')
+        self.assertNotContains(response, 'En la primaria')
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_write_pins_client_to_primary(self):
+        response = self.client.post(reverse('main:newsletter_subscribe'), {'email': 'ana@example.com'}, secure=True)
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(response.cookies[STICKY_COOKIE]['max-age'], 10)
+        self.assertTrue(Newsletter.objects.filter(email='ana@example.com').exists())
+        self.assertFalse(Newsletter.objects.using('replica').exists())
+        # La réplica aún no tiene el cambio: el cliente sigue leyendo de la primaria
+        self.assertContains(self.get(), 'En la primaria')
+
+        self.client.cookies.pop(STICKY_COOKIE)
+        self.assertContains(self.get(), 'En la réplica')
+
+    def test_recent_deletes_are_not_cached_from_a_lagging_replica(self):
+        def sync_replica():
+            BlogPost.objects.using('replica').all().delete()
+            posts = list(BlogPost.objects.all())
+            BlogPost.objects.using('replica').bulk_create(posts)
+            for post in posts:
+                BlogPost.objects.using('replica').filter(pk=post.pk).update(
+                    created_at=post.created_at, updated_at=post.updated_at,
+                )
+
+        BlogPost.objects.all().delete()
+        deleted = BlogPost.objects.create(title='Borrada', author_name='A', content='...')
+        BlogPost.objects.create(title='Queda', author_name='A', content='...')
+        sync_replica()
+        self.assertContains(self.get(), 'Borrada')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            deleted.delete()
+        # La réplica aún tiene la fila: la página se genera (y se guarda) desde la primaria
+        self.assertNotContains(self.get(), 'Borrada')
+
+        sync_replica()
+        with self.settings(REPLICA_STICKY_SECONDS=0):
+            response = self.get()
+        self.assertContains(response, 'Queda')
+        self.assertNotContains(response, 'Borrada')
+
+    def test_forms_and_admin_use_primary(self):
+        Member.objects.create(name='Socia primaria', email='socia@example.com')
+        self.assertContains(self.get('main:join'), 'Socia primaria')
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'clave'))
+        response = self.client.get(reverse('admin:main_blogpost_changelist'), secure=True)
+        self.assertContains(response, 'En la primaria')
+        self.assertNotContains(response, 'En la réplica')
+
+
+class PerformanceInstrumentationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_cache_stats()
+        reset_view_stats()
+        create_catalog(3)
+
+    def timing(self, response):
+        return dict(
+            (part.split(';')[0].strip(), part.split(';', 1)[1]) for part in response['Server-Timing'].split(',')
+        )
+
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing_counts_queries_and_templates(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('main:library'), secure=True)
+        timing = self.timing(response)
+        self.assertIn(f'desc="{len(captured)} consultas"', timing['db'])
+        self.assertNotEqual(timing['tpl'], 'dur=0.0')
+        self.assertIn('fallos', timing['cache'])
+        self.assertEqual(list(view_percentiles()), ['main:library'])
+
+    @override_settings(SERVER_TIMING=False, METRICS_TOKEN='secreto')
+    def test_server_timing_only_for_staff_or_token_by_default(self):
+        url = reverse('main:about')
+        response = self.client.get(url, secure=True)
+        self.assertNotIn('Server-Timing', response)
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+        response = self.client.get(url, secure=True, headers={'Authorization': 'Bearer secreto'})
+        self.assertIn('db', self.timing(response))
+        self.client.force_login(User.objects.create_user('staff', 'staff@example.com', 'clave', is_staff=True))
+        self.assertIn('Server-Timing', self.client.get(url, secure=True))
+        self.client.force_login(User.objects.create_user('socia', 'socia@example.com', 'clave'))
+        self.assertNotIn('Server-Timing', self.client.get(url, secure=True))
+
+    @override_settings(SLOW_QUERY_MS=0, DUPLICATE_QUERY_THRESHOLD=2)
+    def test_slow_and_duplicate_queries_are_logged(self):
+        with self.assertLogs('main.performance', 'WARNING') as logs:
+            self.client.get(reverse('main:events'), secure=True)
+        output = '\n'.join(logs.output)
+        self.assertIn('Consulta lenta', output)
+
+        request = RequestFactory().get('/')
+        with self.assertLogs('main.performance', 'WARNING') as logs:
+            with measure_request() as metrics:
+                # N+1: una consulta por libro en lugar de una para todos
+                for pk in Book.objects.values_list('pk', flat=True)[:3]:
+                    Book.objects.get(pk=pk)
+            finish_request(request, HttpResponse(), metrics, time.perf_counter())
+        self.assertTrue(any('repitió 3 veces' in line for line in logs.output))
+
+    def test_metrics_requires_staff_or_token(self):
+        self.client.get(reverse('main:blog'), secure=True)
+        self.client.get(reverse('main:blog'), secure=True)
+        self.assertEqual(self.client.get(reverse('metrics'), secure=True).status_code, 403)
+        with override_settings(METRICS_TOKEN='secreto'):
+            response = self.client.get(reverse('metrics'), secure=True, headers={'Authorization': 'Bearer secreto'})
+            self.assertEqual(response.status_code, 200)
+            wrong = self.client.get(reverse('metrics'), secure=True, headers={'Authorization': 'Bearer otro'})
+            self.assertEqual(wrong.status_code, 403)
+        body = response.content.decode()
+        self.assertIn('djangocrug_request_duration_seconds{view="main:blog",quantile="0.99"}', body)
+        self.assertIn('djangocrug_request_duration_seconds_count{view="main:blog"} 2', body)
+        self.assertIn('djangocrug_cache_requests_total{namespace="cards",result="miss"}', body)
+
+        self.client.force_login(User.objects.create_user('staff', 'staff@example.com', 'clave', is_staff=True))
+        self.assertEqual(self.client.get(reverse('metrics'), secure=True).status_code, 200)
+
+
+@override_settings(ASYNC_CONCURRENT_QUERIES=True)
+class AsyncViewTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        create_catalog(2)
+
+    def test_independent_queries_run_in_separate_threads(self):
+        barrier = threading.Barrier(2, timeout=5)
+
+        def count(model):
+            def run():
+                # Las dos consultas sólo pasan la barrera si se ejecutan a la vez
+                barrier.wait()
+                return threading.get_ident(), model.objects.count()
+            return run
+
+        (first_thread, books), (second_thread, events) = async_to_sync(gather_queries)(count(Book), count(Event))
+        self.assertNotEqual(first_thread, second_thread)
+        self.assertEqual((books, events), (Book.objects.count(), Event.objects.count()))
+
+    def test_async_views_render_like_sync_views(self):
+        for name in ('home', 'events', 'library', 'gallery'):
+            with self.subTest(view=name):
+                path = reverse(f'main:{name}')
+                expected = getattr(views, name)(RequestFactory().get(path, secure=True))
+                cache.clear()
+                request = AsyncRequestFactory().get(path, secure=True)
+                response = async_to_sync(getattr(async_views, name))(request)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, expected.content)
+                cache.clear()
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class NewsletterCampaignTests(TestCase):
+    def setUp(self):
+        Newsletter.objects.bulk_create(
+            [Newsletter(email=f'lector{n}@example.com', name=f'Lector <{n}>') for n in range(5)]
+            + [Newsletter(email='baja@example.com', is_active=False)]
+        )
+        self.campaign = NewsletterCampaign.objects.create(subject='Hola $name', body='Leemos Pedro Páramo.')
+
+    def test_personalised_messages_for_active_subscribers(self):
+        result = CampaignSender(self.campaign, workers=1, batch_size=2).send()
+        self.assertEqual((result['sent'], result['failed']), (5, 0))
+        self.assertEqual(len(mail.outbox), 5)
+        message = mail.outbox[0]
+        self.assertEqual(message.to, ['lector0@example.com'])
+        self.assertEqual(message.subject, 'Hola Lector <0>')
+        self.assertIn('Pedro Páramo', message.body)
+        html = message.alternatives[0][0]
+        self.assertIn('Lector &lt;0&gt;', html)
+        self.assertNotIn('baja@example.com', [m.to[0] for m in mail.outbox])
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, 'sent')
+
+    def test_interrupted_campaign_resumes_without_resending(self):
+        def interrupt(index, sent, failed):
+            raise KeyboardInterrupt
+
+        # El primer lote (2 mensajes) queda guardado antes de la interrupción
+        with self.assertRaises(KeyboardInterrupt):
+            CampaignSender(self.campaign, workers=1, batch_size=2, progress=interrupt).send()
+        self.assertEqual(len(mail.outbox), 2)
+
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, 'sending')
+        result = CampaignSender(self.campaign, batch_size=2).send()
+        self.assertEqual(result['sent'], 3)
+        recipients = [m.to[0] for m in mail.outbox]
+        self.assertEqual(sorted(recipients), [f'lector{n}@example.com' for n in range(5)])
+
+
+class NewsletterSMTPTests(TransactionTestCase):
+    def test_workers_reuse_one_connection_and_record_failures(self):
+        Newsletter.objects.bulk_create(
+            [Newsletter(email=f'lector{n}@example.com') for n in range(18)]
+            + [Newsletter(email='reject@example.com')]
+        )
+        campaign = NewsletterCampaign.objects.create(subject='Hola', body='Novedades del club.')
+        with LocalSMTPServer(reject='reject') as smtp:
+            smtp_settings = override_settings(
+                EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                EMAIL_HOST=smtp.host, EMAIL_PORT=smtp.port, EMAIL_USE_TLS=False,
+            )
+            with smtp_settings:
+                result = CampaignSender(campaign, workers=2, batch_size=4).send()
+
+        self.assertEqual((result['sent'], result['failed']), (18, 1))
+        self.assertEqual(smtp.connections, 2)
+        self.assertEqual(smtp.messages, 18)
+        failure = CampaignFailure.objects.get(campaign=campaign)
+        self.assertEqual(failure.email, 'reject@example.com')
+        self.assertEqual(sum(campaign.shards.values_list('sent_count', flat=True)), 18)
+        campaign.refresh_from_db()
+        self.assertEqual(campaign.status, 'sent')
+
+
+class SiteBenchmarkTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        handle, self.output = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        self.addCleanup(os.remove, self.output)
+
+    def benchmark(self, **options):
+        call_command(
+            'benchmark_site', requests=2, concurrency=[2], output=self.output, stdout=io.StringIO(), **options,
+        )
+        with open(self.output, encoding='utf-8') as stream:
+            return json.load(stream)
+
+    def test_seeded_site_every_route_and_baseline(self):
+        call_command(
+            'seed_benchmark', books=40, upcoming=3, reviews=2, events=6, posts=8, images=6,
+            members=10, suggestions=4, stdout=io.StringIO(),
+        )
+        self.assertEqual(Book.objects.filter(reading_status='upcoming').count(), 3)
+        self.assertEqual(Member.objects.count(), 10)
+        self.assertTrue(Book.objects.filter(rating_count__gt=0).exists())
+
+        report = self.benchmark()
+        results = report['results']
+        self.assertEqual(list(results), public_paths() + admin_paths())
+        self.assertIn(reverse('admin:main_bookreview_changelist'), results)
+        library = results[reverse('main:library')]['2']
+        self.assertGreater(library['rps'], 0)
+        self.assertLessEqual(library['p50'], library['p99'])
+        self.assertGreater(results[reverse('admin:main_book_changelist')]['2']['queries'], 0)
+        self.assertFalse(User.objects.filter(username='benchmark').exists())
+
+        # Una línea base imposible de igualar hace fallar la comparación
+        for levels in results.values():
+            levels['2'].update(p95=0.001, queries=0)
+        baseline = self.output + '.base'
+        with open(baseline, 'w', encoding='utf-8') as stream:
+            json.dump(report, stream)
+        self.addCleanup(os.remove, baseline)
+        with self.assertRaisesMessage(CommandError, 'línea base'):
+            self.benchmark(baseline=baseline, max_regression=50, paths=['reflexiones'])
+
+
+class LatencyProxyTests(TestCase):
+    def test_proxy_delays_each_round_trip(self):
+        with LocalSMTPServer() as smtp, LatencyProxy((smtp.host, smtp.port), rtt=0.1) as proxy:
+            started = time.perf_counter()
+            # Saludo (media ida y vuelta) + EHLO (una completa)
+            with smtplib.SMTP(proxy.host, proxy.port) as client:
+                client.ehlo()
+                elapsed = time.perf_counter() - started
+        self.assertGreaterEqual(elapsed, 0.15)
+        self.assertEqual((proxy.connections, smtp.connections), (1, 1))
+
+
+class ImportBooksTests(TestCase):
+    def write(self, suffix, content):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w', encoding='utf-8') as stream:
+            stream.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_csv_import_creates_books_genres_and_index(self):
+        Genre.objects.create(name='Novela')
+        path = self.write('.csv', (
+            'title,author,isbn,publication_year,synopsis,genres\n'
+            'Pedro Páramo,Juan Rulfo,9786071600001,1955,Comala,Novela|Realismo mágico\n'
+            'Rayuela,Julio Cortázar,9788437604572,1963,París y Buenos Aires,Novela\n'
+        ))
+        call_command('import_books', path, verbosity=0, stdout=io.StringIO())
+
+        self.assertEqual(Book.objects.count(), 2)
+        self.assertEqual(Genre.objects.count(), 2)
+        book = Book.objects.get(isbn='9786071600001')
+        self.assertEqual(book.publication_year, 1955)
+        self.assertEqual(sorted(book.genres.values_list('name', flat=True)), ['Novela', 'Realismo mágico'])
+        self.assertEqual([b.title for b in search_books(Book.objects.all(), 'realismo')], ['Pedro Páramo'])
+
+    def test_reimport_upserts_by_isbn(self):
+        rows = [
+            {'title': 'Ficciones', 'author': 'Borges', 'isbn': '9788420633114', 'genres': ['Cuento']},
+            {'title': 'Aura', 'author': 'Carlos Fuentes', 'isbn': '9789684110001', 'reading_end_date': '2024-05-01'},
+        ]
+        BookImporter(batch_size=1).import_rows(rows)
+
+        stats = BookImporter().import_rows([
+            {'title': 'Ficciones (edición revisada)', 'author': 'Jorge Luis Borges', 'isbn': '9788420633114', 'genres': ['Ensayo']},
+            {'title': 'Aura', 'author': 'Carlos Fuentes', 'isbn': '9789684110001'},
+        ])
+        self.assertEqual((stats['created'], stats['updated']), (0, 2))
+        self.assertEqual(Book.objects.count(), 2)
+        book = Book.objects.get(isbn='9788420633114')
+        self.assertEqual(book.title, 'Ficciones (edición revisada)')
+        self.assertEqual(list(book.genres.values_list('name', flat=True)), ['Ensayo'])
+        # Las columnas ausentes en la fila no se pisan
+        self.assertEqual(Book.objects.get(isbn='9789684110001').reading_end_date, date(2024, 5, 1))
+
+    def test_invalid_rows_are_skipped_and_queries_do_not_grow_per_row(self):
+        lines = [json.dumps({'title': f'Libro {n}', 'author': 'Autora', 'genres': ['Poesía', f'G{n % 3}']}) for n in range(50)]
+        lines.append(json.dumps({'title': 'Sin autor'}))
+        lines.append(json.dumps({'title': 'Raro', 'author': 'X', 'reading_status': 'perdido'}))
+        rows = [json.loads(line) for line in lines]
+
+        with self.assertNumQueries(10):
+            stats = BookImporter(batch_size=100).import_rows(rows)
+        self.assertEqual((stats['created'], stats['skipped']), (50, 2))
+        self.assertEqual(Book.genres.through.objects.count(), 100)
+
+    def test_malformed_rows_are_counted_as_errors(self):
+        rows = [
+            ['Rayuela', 'Cortázar'],
+            'Rayuela',
+            {'title': 'Rayuela', 'author': 'Cortázar', 'publication_year': [1963]},
+            {'title': 'Rayuela', 'author': 'Cortázar', 'reading_end_date': {'año': 1963}},
+            {'title': 'Rayuela', 'author': 'Cortázar', 'genres': 7},
+            {'title': 'Rayuela', 'author': 'Cortázar', 'genres': ['Novela', 3]},
+            {'title': 'Rayuela', 'author': 'Cortázar', 'reading_start_date': '2024-02-30'},
+            {'title': 'Rayuela', 'author': 'Cortázar', 'publication_year': '1963', 'genres': ['Novela']},
+        ]
+        stats = BookImporter().import_rows(rows)
+        self.assertEqual((stats['rows'], stats['created'], stats['skipped']), (8, 1, 7))
+        self.assertEqual(len(stats['errors']), 7)
+        self.assertTrue(stats['errors'][0].startswith('fila 1: '))
+
+
+class AdminExportTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'clave'))
+        novela, poesia = Genre.objects.create(name='Novela'), Genre.objects.create(name='Poesía')
+        for n in range(6):
+            member = Member.objects.create(name=f'Lectora {n}', email=f'lectora{n}@example.com', is_active=n % 2 == 0)
+            member.favorite_genres.set([novela, poesia] if n < 3 else [poesia])
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_url_respects_changelist_filters_and_search(self):
+        url = reverse('admin:main_member_export', args=['csv'])
+        response = self.client.get(url, {'is_active__exact': '1', 'q': 'lectora'}, secure=True)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lines = self.read(response).splitlines()
+        self.assertEqual(lines[0], 'name,email,phone,bio,favorite_genres,join_date,is_active')
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], ['Lectora 0', 'Lectora 2', 'Lectora 4'])
+        self.assertIn('Novela|Poesía', lines[1])
+
+        changelist = self.client.get(reverse('admin:main_member_changelist'), {'q': 'lectora'}, secure=True)
+        self.assertContains(changelist, f'{url}?q=lectora')
+
+    def test_invalid_lookups_do_not_fail(self):
+        url = reverse('admin:main_member_export', args=['csv'])
+        changelist = reverse('admin:main_member_changelist')
+        response = self.client.get(url, {'join_date__gte': 'ayer'}, secure=True)
+        self.assertRedirects(response, f'{changelist}?e=1', fetch_redirect_response=False)
+        # Búsquedas por campos no permitidos: 400 (SuspiciousOperation), igual que el listado
+        self.assertEqual(self.client.get(url, {'favorite_genres__book__title': 'x'}, secure=True).status_code, 400)
+
+    def test_csv_escapes_formulas(self):
+        Member.objects.create(name='=HYPERLINK("http://example.com")', email='f@example.com', phone='+34 600 000 000')
+        Member.objects.create(name='@SUM(A1)', email='g@example.com', bio='-2+3')
+        response = self.client.get(reverse('admin:main_member_export', args=['csv']), {'q': 'example.com'}, secure=True)
+        rows = list(csv.reader(io.StringIO(self.read(response))))
+        cells = {cell for row in rows[1:] for cell in row}
+        self.assertTrue({"'=HYPERLINK(\"http://example.com\")", "'+34 600 000 000", "'@SUM(A1)", "'-2+3"} <= cells)
+        self.assertIn('Lectora 0', cells)
+
+    def test_action_exports_selected_rows_as_jsonl(self):
+        selected = Newsletter.objects.bulk_create([Newsletter(email=f'n{n}@example.com') for n in range(3)])
+        response = self.client.post(reverse('admin:main_newsletter_changelist'), {
+            'action': 'export_jsonl', '_selected_action': [selected[0].pk, selected[2].pk],
+        }, secure=True)
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual([row['email'] for row in rows], ['n2@example.com', 'n0@example.com'])
+
+    def test_m2m_loaded_once_per_chunk(self):
+        # values_list + una consulta a la tabla intermedia por bloque, sin importar las filas
+        with self.assertNumQueries(3):
+            rows = list(export_rows(Member.objects.order_by('name'), ['name', 'favorite_genres'], chunk_size=3))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[5], {'name': 'Lectora 5', 'favorite_genres': ['Poesía']})
+
+
+@override_settings(THROTTLE_RATES={})
+class NewsletterSubscribeTests(TransactionTestCase):
+    def post(self, email, name=''):
+        request = RequestFactory().post(reverse('main:newsletter_subscribe'), {'email': email, 'name': name})
+        return json.loads(views.newsletter_subscribe(request).content)
+
+    def test_upsert_normalises_and_reactivates(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(self.post('  Ana@Example.COM ', 'Ana')['success'])
+        self.assertFalse(self.post('ana@example.com')['success'])
+        self.assertEqual(list(Newsletter.objects.values_list('email', 'name')), [('ana@example.com', 'Ana')])
+
+        Newsletter.objects.update(is_active=False)
+        self.assertTrue(self.post('ANA@example.com')['success'])
+        self.assertTrue(Newsletter.objects.get().is_active)
+        self.assertEqual(self.post('no-es-un-email')['message'], 'Introduce un email válido.')
+
+    def test_parallel_subscribes_never_fail(self):
+        emails = [f'{"Lector" if n % 2 else "lector"}{n % 100}@Example.com' for n in range(2000)]
+
+        def subscribe(email):
+            try:
+                return self.post(email)['success']
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(32) as pool:
+            results = list(pool.map(subscribe, emails))
+        # Sin excepciones, y exactamente un alta por email distinto
+        self.assertEqual(results.count(True), 100)
+        self.assertEqual(Newsletter.objects.count(), 100)
+
+    def test_write_behind_buffer_flushes_in_bulk(self):
+        Newsletter.objects.create(email='baja@example.com', is_active=False)
+        buffer = SubscriptionBuffer(max_size=1000, max_delay=60)
+        with ThreadPoolExecutor(16) as pool:
+            list(pool.map(buffer.add, [f'lector{n % 150}@example.com' for n in range(2000)] + ['baja@example.com']))
+        # BEGIN, un INSERT OR IGNORE (ON CONFLICT DO NOTHING), la reactivación de las bajas y COMMIT
+        with self.assertNumQueries(4):
+            self.assertEqual(buffer.flush(), 151)
+        self.assertEqual(Newsletter.objects.filter(is_active=True).count(), 151)
+        self.assertEqual(buffer.flush(), 0)
+
+    @override_settings(NEWSLETTER_WRITE_BEHIND=True)
+    def test_view_with_write_behind_does_not_touch_the_database(self):
+        with self.assertNumQueries(0):
+            self.assertTrue(self.post('nuevo@example.com')['success'])
+        from .subscriptions import subscription_buffer
+        subscription_buffer.flush()
+        self.assertTrue(Newsletter.objects.filter(email='nuevo@example.com').exists())
+
+    def test_migration_merges_mixed_case_emails(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate([('main', '0010_member_recommendations')])
+        self.addCleanup(lambda: MigrationExecutor(connection).migrate(executor.loader.graph.leaf_nodes('main')))
+        apps = executor.loader.project_state([('main', '0010_member_recommendations')]).apps
+        OldNewsletter = apps.get_model('main', 'Newsletter')
+        now = timezone.now()
+        first = OldNewsletter.objects.create(email='Ana@Example.com', subscribed_at=now, is_active=False)
+        OldNewsletter.objects.create(email='ana@example.com', name='Ana', subscribed_at=now, is_active=True)
+        OldNewsletter.objects.create(email='LUIS@example.com', subscribed_at=now)
+        OldNewsletter.objects.create(email='otro@example.com', subscribed_at=now)
+        campaign = apps.get_model('main', 'NewsletterCampaign').objects.create(subject='Hola', body='...')
+        failure = apps.get_model('main', 'CampaignFailure').objects.create(
+            campaign=campaign, subscriber_id=first.pk + 1, email='ana@example.com', error='x',
+        )
+
+        MigrationExecutor(connection).migrate(executor.loader.graph.leaf_nodes('main'))
+        self.assertEqual(
+            sorted(Newsletter.objects.values_list('email', 'name', 'is_active')),
+            [('ana@example.com', 'Ana', True), ('luis@example.com', '', True), ('otro@example.com', '', True)],
+        )
+        self.assertEqual(CampaignFailure.objects.get(pk=failure.pk).subscriber_id, first.pk)
+        # Ya no hay forma de volver a guardar un email con mayúsculas
+        with self.assertRaises(IntegrityError):
+            Newsletter.objects.create(email='Ana@example.com')
+        self.assertFalse(self.post('ANA@EXAMPLE.COM')['success'])
+
+
+class FeedTests(TestCase):
+    ATOM = '{http://www.w3.org/2005/Atom}'
+
+    def setUp(self):
+        cache.clear()
+        reset_cache_stats()
+        self.book = Book.objects.create(title='Rayuela', author='Julio Cortázar', synopsis='...', reading_status='current')
+        self.other = Book.objects.create(title='Ficciones', author='Borges', synopsis='...')
+        self.post = BlogPost.objects.create(title='Sobre Rayuela', author_name='Ana', content='Texto', book=self.book)
+        BlogPost.objects.create(title='Sobre Ficciones', author_name='Luis', content='Texto', book=self.other)
+        BlogPost.objects.create(title='Borrador', author_name='Ana', content='...', is_published=False)
+
+    def titles(self, name, args=()):
+        response = self.client.get(reverse(name, args=args), secure=True)
+        root = ElementTree.fromstring(response.content)
+        if root.tag == 'rss':
+            return [item.findtext('title') for item in root.iter('item')]
+        return [entry.findtext(f'{self.ATOM}title') for entry in root.iter(f'{self.ATOM}entry')]
+
+    def test_blog_feeds(self):
+        self.assertEqual(self.titles('main:blog_rss'), ['Sobre Ficciones', 'Sobre Rayuela'])
+        self.assertEqual(self.titles('main:blog_atom'), ['Sobre Ficciones', 'Sobre Rayuela'])
+        self.assertEqual(self.titles('main:book_blog_atom', [self.book.pk]), ['Sobre Rayuela'])
+        response = self.client.get(reverse('main:book_blog_rss', args=[0]), secure=True)
+        self.assertEqual(response.status_code, 404)
+
+    def test_readings_feed_announces_status_changes(self):
+        self.assertEqual(self.titles('main:readings_rss'), [
+            'Lectura Actual: Rayuela (Julio Cortázar)', 'Próxima Lectura: Ficciones (Borges)',
+        ])
+        self.other.reading_status = 'current'
+        self.other.save()
+        response = self.client.get(reverse('main:readings_atom'), secure=True)
+        self.assertContains(response, f'libro-{self.other.pk}-current')
+        self.assertNotContains(response, f'libro-{self.other.pk}-upcoming')
+
+    def test_polls_cost_one_query(self):
+        url = reverse('main:blog_atom')
+        response = self.client.get(url, secure=True)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, secure=True, headers={'If-None-Match': response['ETag']}).status_code, 304)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, secure=True).content, response.content)
+        self.assertEqual(cache_stats()['page'], {'hits': 1, 'misses': 1})
+
+        # Un cambio en el contenido genera el feed de nuevo
+        self.post.title = 'Sobre Rayuela, otra vez'
+        self.post.save()
+        self.assertContains(self.client.get(url, secure=True), 'Sobre Rayuela, otra vez')
+        self.assertEqual(cache_stats()['page'], {'hits': 1, 'misses': 2})
+
+
+class SitemapTests(TestCase):
+    NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+
+    def setUp(self):
+        cache.clear()
+        reset_cache_stats()
+        now = timezone.now()
+        self.events = [
+            Event.objects.create(title=f'Encuentro {n}', description='...', date=now + timedelta(days=n)) for n in range(5)
+        ]
+        Event.objects.create(title='Suspendido', description='...', date=now, is_active=False)
+        self.post = BlogPost.objects.create(title='Reflexión', author_name='Ana', content='...')
+        BlogPost.objects.create(title='Borrador', author_name='Ana', content='...', is_published=False)
+
+    def entries(self, url):
+        response = self.client.get(url, secure=True)
+        self.assertEqual(response['Content-Type'], 'application/xml; charset=utf-8')
+        root = ElementTree.fromstring(response.getvalue())
+        return [
+            (element.findtext(f'{self.NS}loc').removeprefix('https://testserver'), element.findtext(f'{self.NS}lastmod'))
+            for element in root
+        ]
+
+    def test_sections_split_above_limit(self):
+        with mock.patch('main.sitemaps.LIMIT', 2):
+            index = self.entries(reverse('main:sitemap_index'))
+            events = reverse('main:sitemap_events')
+            self.assertEqual([loc for loc, _ in index], [
+                reverse('main:sitemap_pages'), events,
+                f'{events}?desde={self.events[2].pk}', f'{events}?desde={self.events[4].pk}',
+                reverse('main:sitemap_posts'),
+            ])
+            urls = [self.entries(loc) for loc, _ in index[1:4]]
+        self.assertEqual([loc for part in urls for loc, _ in part], [event.get_absolute_url() for event in self.events])
+        self.assertEqual(urls[0][0][1], sitemaps.format_lastmod(self.events[0].created_at))
+        self.assertEqual(index[3][1], sitemaps.format_lastmod(self.events[4].created_at))
+        self.assertEqual(self.entries(reverse('main:sitemap_posts')), [
+            (self.post.get_absolute_url(), sitemaps.format_lastmod(self.post.updated_at)),
+        ])
+        pages = dict(self.entries(reverse('main:sitemap_pages')))
+        self.assertEqual(pages[reverse('main:blog')], sitemaps.format_lastmod(self.post.updated_at))
+        self.assertIsNone(pages[reverse('main:contact')])
+
+        for start in ('x', '', '²', '-1', str(sitemaps.MAX_PK + 1)):
+            response = self.client.get(reverse('main:sitemap_events'), {'desde': start}, secure=True)
+            self.assertEqual(response.status_code, 404, start)
+        response = self.client.get(reverse('main:sitemap_events'), {'desde': sitemaps.MAX_PK}, secure=True)
+        self.assertEqual(self.entries(response.wsgi_request.get_full_path()), [])
+
+    def test_rows_are_read_inside_the_view(self):
+        # Al enviar el cuerpo ya no hay réplica ni presupuesto: sólo se genera el XML
+        for url in (reverse('main:sitemap_index'), reverse('main:sitemap_events'), reverse('main:sitemap_pages')):
+            response = self.client.get(url, secure=True)
+            self.assertTrue(response.streaming)
+            with self.assertNumQueries(0):
+                body = response.getvalue()
+            self.assertIn(b'</', body)
+
+    def test_generated_once_per_change(self):
+        url = reverse('main:sitemap_index')
+        first = self.client.get(url, secure=True)
+        self.assertTrue(first.streaming)
+        body = first.getvalue()
+        with self.assertNumQueries(1):
+            cached = self.client.get(url, secure=True)
+        self.assertEqual(cached.content, body)
+        self.assertEqual(cache_stats()['page'], {'hits': 1, 'misses': 1})
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, secure=True, headers={'If-None-Match': first['ETag']}).status_code, 304)
+
+        self.assertFalse(cached.streaming)
+        # Un cambio genera el índice otra vez
+        self.post.save()
+        self.assertTrue(self.client.get(url, secure=True).streaming)
+        self.assertEqual(cache_stats()['page'], {'hits': 1, 'misses': 2})
+
+    def test_robots_points_to_index(self):
+        response = self.client.get(reverse('main:robots_txt'), secure=True)
+        self.assertContains(response, f"Sitemap: https://testserver{reverse('main:sitemap_index')}")
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        fantasy, history, poetry = (Genre.objects.create(name=name) for name in ('Fantasía', 'Historia', 'Poesía'))
+
+        def book(title, genres, ratings=0, stars=3):
+            book = Book.objects.create(
+                title=title, author='Autor', synopsis='...', rating_count=ratings, rating_sum=ratings * stars,
+            )
+            book.genres.set(genres)
+            return book
+
+        self.good = book('Buena fantasía', [fantasy], 10, 5)
+        self.bad = book('Mala fantasía', [fantasy], 10, 1)
+        self.mixed = book('Fantasía histórica', [fantasy, history])
+        self.history = book('Historia', [history])
+        self.poetry = book('Poesía', [poetry], 20, 5)
+        self.reader = Member.objects.create(name='Ana', email='ana@example.com')
+        self.reader.favorite_genres.set([fantasy])
+        self.newcomer = Member.objects.create(name='Luis', email='luis@example.com')
+        Member.objects.create(name='Baja', email='baja@example.com', is_active=False).favorite_genres.set([poetry])
+
+    def test_refresh_and_lookup(self):
+        self.assertEqual(refresh_recommendations(n=3), 6)
+        with self.assertNumQueries(1):
+            books = recommended_books(self.reader.pk)
+        # Sus géneros primero y, dentro de ellos, mejor valorados arriba
+        self.assertEqual(books[0], self.good)
+        self.assertEqual(set(books), {self.good, self.bad, self.mixed})
+        scores = list(MemberRecommendation.objects.filter(member=self.reader).values_list('score', flat=True))
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        # Sin géneros favoritos: los mejor valorados del club
+        self.assertEqual(recommended_books(self.newcomer.pk)[:2], [self.poetry, self.good])
+
+        # Se sustituyen, no se acumulan
+        self.reader.favorite_genres.set([Genre.objects.get(name='Historia')])
+        self.assertEqual(refresh_recommendations(n=3), 6)
+        self.assertEqual(set(recommended_books(self.reader.pk)[:2]), {self.history, self.mixed})
+
+    def test_batches_do_not_change_results(self):
+        _, _, members, books, weights = load_matrices()
+        top, scores = top_books(members, books, weights, n=4)
+        top_one, scores_one = top_books(members, books, weights, n=4, batch_size=1)
+        self.assertEqual(top.tolist(), top_one.tolist())
+        self.assertEqual(scores.tolist(), scores_one.tolist())
+
+
+# LocMemCache guarda 300 entradas por defecto: aquí hacen falta los 1201 bloques
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'OPTIONS': {'MAX_ENTRIES': 5000},
+}})
+class ICalendarTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_cache_stats()
+        self.book = Book.objects.create(title='Rayuela', author='Julio Cortázar', synopsis='...')
+        start = timezone.now() + timedelta(days=1)
+        Event.objects.bulk_create([
+            Event(title=f'Encuentro {n}', description='Lectura', date=start + timedelta(days=n), location='Biblioteca')
+            for n in range(1200)
+        ])
+        self.event = Event.objects.create(
+            title='Charla: Cortázar, París; y Buenos Aires', description='Primera línea\nSegunda, más larga ' * 8,
+            date=start, location='Café Tortoni', online_link='https://meet.example.com/rayuela', book=self.book,
+        )
+        Event.objects.create(title='Suspendido', description='...', date=start, is_active=False)
+        Event.objects.create(
+            title='Cancelado hace mucho', description='...', date=start, is_active=False,
+            details_updated_at=timezone.now() - timedelta(days=60),
+        )
+
+    def get(self, name='main:events_ics', args=(), **headers):
+        return self.client.get(reverse(name, args=args), secure=True, headers=headers)
+
+    def content_lines(self, response):
+        body = response.content.decode()
+        self.assertTrue(body.endswith('\r\n'))
+        physical = body.split('\r\n')[:-1]
+        self.assertTrue(all(len(line.encode()) <= 75 for line in physical))
+        return body.replace('\r\n ', '').split('\r\n')[:-1]
+
+    def test_feed_is_valid_and_polls_get_304(self):
+        response = self.get()
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        lines = self.content_lines(response)
+        self.assertEqual((lines[0], lines[-1]), ('BEGIN:VCALENDAR', 'END:VCALENDAR'))
+        self.assertTrue(all(re.match(r'^[A-Z-]+(;[^:]+)?:', line) for line in lines))
+        self.assertEqual(lines.count('BEGIN:VEVENT'), 1202)
+        self.assertEqual(lines.count('STATUS:CANCELLED'), 1)
+        self.assertIn('SUMMARY:Suspendido', lines)
+        self.assertNotIn('SUMMARY:Cancelado hace mucho', lines)
+        self.assertIn('SUMMARY:Charla: Cortázar\\, París\\; y Buenos Aires', lines)
+        self.assertIn('LOCATION:Café Tortoni', lines)
+        self.assertIn('CONFERENCE;VALUE=URI;FEATURE=VIDEO:https://meet.example.com/rayuela', lines)
+        self.assertTrue(any('Libro: Rayuela (Julio Cortázar)' in line for line in lines))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get(**{'If-None-Match': response['ETag']}).status_code, 304)
+
+    def test_only_changed_events_are_serialized_again(self):
+        self.get()
+        self.assertEqual(cache_stats()['ics'], {'hits': 0, 'misses': 1202})
+        # Una inscripción cambia updated_at (nueva versión de la página) pero no el bloque
+        Event.objects.filter(pk=self.event.pk).update(confirmed_count=1, updated_at=timezone.now())
+        self.get()
+        self.assertEqual(cache_stats()['ics'], {'hits': 1202, 'misses': 1202})
+        self.book.title = 'Rayuela (edición crítica)'
+        self.book.save()
+        self.assertContains(self.get(), 'edición crítica')
+        self.assertEqual(cache_stats()['ics'], {'hits': 2403, 'misses': 1203})
+
+    def test_changes_raise_sequence_and_last_modified(self):
+        def vevent():
+            lines = self.content_lines(self.get('main:event_ics', [self.event.pk]))
+            return dict(line.split(':', 1) for line in lines[lines.index('BEGIN:VEVENT') + 1:lines.index('END:VEVENT')])
+
+        first = vevent()
+        self.assertEqual(first['SEQUENCE'], '0')
+        self.assertEqual(first['LAST-MODIFIED'], first['DTSTAMP'])
+
+        # Guardar sin cambiar nada de lo publicado (o cambiar sólo contadores) no es una revisión
+        self.event.max_participants = 20
+        self.event.save()
+        self.assertEqual(vevent()['SEQUENCE'], '0')
+
+        self.event.refresh_from_db()
+        created = self.event.details_updated_at
+        self.event.date += timedelta(hours=1)
+        self.event.save()
+        second = vevent()
+        self.assertEqual(second['SEQUENCE'], '1')
+        self.event.refresh_from_db()
+        self.assertGreater(self.event.details_updated_at, created)
+        self.assertEqual(second['LAST-MODIFIED'], ical.format_datetime(self.event.details_updated_at))
+
+        self.event.is_active = False
+        self.event.save(update_fields=['is_active'])
+        third = vevent()
+        self.assertEqual((third['SEQUENCE'], third['STATUS']), ('2', 'CANCELLED'))
+        self.assertEqual(self.content_lines(self.get()).count('STATUS:CANCELLED'), 2)
+
+    def test_changing_the_book_raises_sequence(self):
+        self.event.refresh_from_db()
+        created = self.event.details_updated_at
+        self.event.book = Book.objects.create(title='Pedro Páramo', author='Juan Rulfo', synopsis='...')
+        self.event.save(update_fields=['book'])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.sequence, 1)
+        self.assertGreater(self.event.details_updated_at, created)
+        content = self.get('main:event_ics', [self.event.pk]).content.decode()
+        self.assertIn('SEQUENCE:1', content)
+        self.assertIn('Pedro Páramo', content)
+
+        self.event.book = None
+        self.event.save()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.sequence, 2)
+
+    def test_single_event_download(self):
+        response = self.get('main:event_ics', [self.event.pk])
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="encuentro-{self.event.pk}.ics"')
+        self.assertEqual(self.content_lines(response).count('BEGIN:VEVENT'), 1)
+        cancelled = Event.objects.get(title='Suspendido')
+        self.assertContains(self.get('main:event_ics', [cancelled.pk]), 'STATUS:CANCELLED')
+
+
+@override_settings(THROTTLE_RATES={})
+class EventRegistrationTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.event = Event.objects.create(
+            title='Tertulia', description='...', date=timezone.now() + timedelta(days=7), max_participants=20,
+        )
+
+    def post(self, name, data):
+        request = RequestFactory().post(reverse(f'main:{name}'), data, secure=True)
+        return json.loads(getattr(views, name)(request).content)
+
+    def sign_up(self, email):
+        return self.post('event_register', {'event': self.event.pk, 'name': 'Lector', 'email': email})
+
+    def counters(self):
+        self.event.refresh_from_db()
+        return self.event.confirmed_count, self.event.waitlist_count
+
+    def test_parallel_sign_ups_never_exceed_capacity(self):
+        def sign_up(n):
+            try:
+                return self.sign_up(f'lector{n}@example.com')['status']
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(32) as pool:
+            statuses = list(pool.map(sign_up, range(300)))
+        self.assertEqual(statuses.count('confirmed'), 20)
+        self.assertEqual(statuses.count('waitlisted'), 280)
+        self.assertEqual(EventRegistration.objects.filter(status='confirmed').count(), 20)
+        self.assertEqual(self.counters(), (20, 280))
+
+    def test_waitlist_promotion_on_cancellation(self):
+        Event.objects.filter(pk=self.event.pk).update(max_participants=1)
+        self.assertEqual(self.sign_up('ana@example.com')['status'], 'confirmed')
+        self.assertEqual(self.sign_up('luis@example.com')['status'], 'waitlisted')
+        self.assertEqual(self.sign_up('eva@example.com')['status'], 'waitlisted')
+        # Repetir la inscripción no ocupa otra plaza
+        self.assertFalse(self.sign_up('ANA@example.com ')['success'])
+        self.assertEqual(self.counters(), (1, 2))
+        self.assertIn('#cancelar=', mail.outbox[0].body)
+
+        ana = EventRegistration.objects.get(email='ana@example.com')
+        mail.outbox.clear()
+        self.assertTrue(self.post('event_cancel', {'token': ana.token})['success'])
+        self.assertFalse(self.post('event_cancel', {'token': ana.token})['success'])
+        self.assertEqual(self.counters(), (1, 1))
+        # Asciende el primero de la lista de espera, y se le avisa
+        self.assertEqual(EventRegistration.objects.get(email='luis@example.com').status, 'confirmed')
+        self.assertEqual([message.to for message in mail.outbox], [['luis@example.com']])
+
+        # Ana puede volver a apuntarse: la cancelada no cuenta
+        self.assertEqual(self.sign_up('ana@example.com')['status'], 'waitlisted')
+        Event.objects.filter(pk=self.event.pk).update(date=timezone.now() - timedelta(hours=1))
+        self.assertFalse(self.sign_up('nuevo@example.com')['success'])
+
+    def test_pages_show_seats_from_counter(self):
+        for n in range(3):
+            self.sign_up(f'lector{n}@example.com')
+        for name, args in (('main:events', []), ('main:event_detail', [self.event.pk])):
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(reverse(name, args=args), secure=True)
+            self.assertContains(response, '17 de 20 plazas libres' if args == [] else '17 plazas libres')
+            self.assertFalse(any('main_eventregistration' in query['sql'] for query in captured))
+
+
+@override_settings(THROTTLE_RATES={'newsletter_subscribe': '5/m', 'contact': '2/m'}, THROTTLE_PROXY_COUNT=1)
+class ThrottleTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def subscribe(self, ip, email):
+        request = RequestFactory().post(
+            reverse('main:newsletter_subscribe'), {'email': email},
+            # La primera IP la pone el cliente (falsificable); la última la añade el proxy
+            HTTP_X_FORWARDED_FOR=f'1.2.3.4, {ip}',
+        )
+        try:
+            return views.newsletter_subscribe(request)
+        finally:
+            close_old_connections()
+
+    def test_flood_writes_stay_bounded_per_ip(self):
+        # 40 IPs x 50 POSTs en paralelo: sólo 5 por IP llegan a escribir
+        attempts = [(f'203.0.113.{ip}', f'flood{ip}-{n}@example.com') for n in range(50) for ip in range(40)]
+        with ThreadPoolExecutor(32) as pool:
+            statuses = list(pool.map(lambda args: self.subscribe(*args).status_code, attempts))
+        self.assertEqual(statuses.count(200), 200)
+        self.assertEqual(statuses.count(429), 1800)
+        self.assertEqual(Newsletter.objects.count(), 200)
+
+    def test_rejection_happens_before_validation_and_database(self):
+        data = {'name': 'Ana', 'email': 'ana@example.com', 'subject': 'Hola', 'message': 'Hola'}
+        url = reverse('main:contact')
+        for _ in range(2):
+            self.assertEqual(self.client.post(url, data, secure=True).status_code, 302)
+        with self.assertNumQueries(0):
+            response = self.client.post(url, {}, secure=True)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        # Los GET no cuentan
+        self.assertEqual(self.client.get(url, secure=True).status_code, 200)
+
+        response = self.subscribe('198.51.100.7', 'x@example.com')
+        self.assertEqual(response.status_code, 200)
+
+    def test_sliding_window_weights_previous_window(self):
+        with mock.patch('main.throttling.time.time', return_value=600.0):
+            results = [hit('prueba', 'ip', 4, 60)[0] for _ in range(4)]
+        self.assertEqual(results, [True] * 4)
+        # A mitad de la ventana siguiente aún cuenta la mitad de la anterior (2)
+        with mock.patch('main.throttling.time.time', return_value=690.0):
+            self.assertEqual([hit('prueba', 'ip', 4, 60)[0] for _ in range(3)], [True, True, False])
+
+
+def image_bytes(width, height, format='PNG'):
+    stream = io.BytesIO()
+    Image.new('RGB', (width, height), 'teal').save(stream, format)
+    return stream.getvalue()
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        override = self.settings(IMAGE_VARIANTS_ROOT=self.root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def build(self, *args):
+        call_command('build_image_variants', *args, stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_only_public_http_urls_are_fetched(self):
+        with LocalImageServer({'/portada.png': image_bytes(100, 100)}) as server:
+            urls = [
+                server.url('/portada.png'), 'http://localhost/portada.png', 'http://10.0.0.1/portada.png',
+                'http://169.254.169.254/latest/meta-data/', 'http://[::1]/portada.png',
+                'http://[::ffff:127.0.0.1]/portada.png', 'file:///etc/passwd', 'ftp://example.com/portada.png',
+                'portada.png',
+            ]
+            for url in urls:
+                with self.subTest(url=url), self.assertRaises(ValueError):
+                    fetch_image(url)
+            self.assertEqual(server.requests, [])
+            with self.settings(IMAGE_FETCH_ALLOW_PRIVATE=True):
+                self.assertEqual(fetch_image(server.url('/portada.png')), image_bytes(100, 100))
+
+    @override_settings(IMAGE_FETCH_ALLOW_PRIVATE=True)
+    def test_command_builds_hashed_variants_once(self):
+        files = {'/portada.png': image_bytes(1000, 1500), '/foto.png': image_bytes(300, 200), '/rota.png': b'html'}
+        with LocalImageServer(files) as server:
+            for n in range(2):
+                Book.objects.create(title=f'Libro {n}', author='Autor', synopsis='...', cover_image=server.url('/portada.png'))
+            Gallery.objects.create(title='Foto', image_url=server.url('/foto.png'))
+            Gallery.objects.create(title='Perdida', image_url=server.url('/falta.png'))
+            Member.objects.create(name='Ana', email='ana@example.com', profile_image=server.url('/rota.png'))
+
+            self.build()
+            # Una descarga por URL distinta, aunque la usen varios objetos
+            self.assertEqual(sorted(server.requests), ['/falta.png', '/foto.png', '/portada.png', '/rota.png'])
+            entries = get_manifest().load()
+            cover = entries[server.url('/portada.png')]
+            self.assertEqual(cover['widths'], [200, 400, 800])
+            self.assertEqual((cover['width'], cover['height']), (1000, 1500))
+            # Sin ampliar: la foto estrecha se queda en su ancho
+            self.assertEqual(entries[server.url('/foto.png')]['widths'], [200, 300])
+            self.assertIn('error', entries[server.url('/falta.png')])
+            self.assertIn('error', entries[server.url('/rota.png')])
+            names = sorted(path.name for path in self.root.glob('*-*w.*'))
+            self.assertEqual(len(names), 10)
+            self.assertIn(f"{cover['hash']}-400w.webp", names)
+            with Image.open(self.root / f"{cover['hash']}-400w.jpg") as variant:
+                self.assertEqual(variant.size, (400, 600))
+
+            self.build()
+            self.assertEqual(len(server.requests), 4)
+            self.build('--retry-failed')
+            self.assertEqual(len(server.requests), 6)
+
+    def test_template_tag_renders_srcset_or_original(self):
+        url = 'https://example.com/portada.jpg'
+        entry = build_variants(image_bytes(1000, 1500, 'JPEG'))
+        get_manifest().save({url: entry, 'https://example.com/rota.jpg': {'error': 'HTTPError'}})
+        template = Template('{% load images %}{% responsive_image url alt="Portada" sizes="50vw" %}')
+
+        html = template.render(Context({'url': url}))
+        self.assertIn(f'<source type="image/webp" srcset="/media/variants/{entry["hash"]}-200w.webp 200w, ', html)
+        self.assertIn(f'src="/media/variants/{entry["hash"]}-800w.jpg"', html)
+        self.assertIn('sizes="50vw"', html)
+        self.assertIn('width="1000" height="1500" loading="lazy"', html)
+
+        for original in ('https://example.com/rota.jpg', 'https://example.com/nueva.jpg'):
+            html = template.render(Context({'url': original}))
+            self.assertNotIn('<picture', html)
+            self.assertIn(f'src="{original}"', html)
+
+    def test_variants_are_served_with_immutable_cache(self):
+        entry = build_variants(image_bytes(500, 500))
+        response = self.client.get(f'/media/variants/{entry["hash"]}-400w.webp', secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        response.close()
+
+        # Generada con el servidor ya arrancado: la sirve la vista de respaldo
+        entry = build_variants(image_bytes(600, 300))
+        response = self.client.get(f'/media/variants/{entry["hash"]}-200w.jpg', secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        response.close()
+        self.assertEqual(self.client.get('/media/variants/manifest.json', secure=True).status_code, 404)
+
+
+class StaticAssetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_missing_generated_assets_are_reported(self):
+        self.assertEqual(assets.check_outputs(), [])
+        call_command('build_assets', '--check', stdout=io.StringIO())
+        with tempfile.TemporaryDirectory() as directory, self.settings(GENERATED_ASSETS_DIR=Path(directory)):
+            self.assertEqual([warning.id for warning in assets.check_outputs()], ['main.W001'])
+            with self.assertRaisesMessage(CommandError, 'elixir.css'):
+                call_command('build_assets', '--check', stdout=io.StringIO())
+            # Sin CSS crítico la página se sirve igual, con la hoja completa
+            response = self.client.get(reverse('main:about'), secure=True)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('<style>', response.content.decode())
+            self.assertContains(response, 'href="/static/main/css/elixir.css"')
+        cache.clear()
+
+    def test_prune_keeps_only_used_selectors(self):
+        css = (
+            '.a,.b{color:red}@media (min-width:1px){.c{margin:0}.a .c{margin:1px}}'
+            '.d:not(.e){padding:0}@keyframes gira{to{opacity:0}}.b{animation:gira 1s}'
+            'p{margin:0}'
+        )
+        self.assertEqual(
+            serialize(prune(parse_css(css), {'a', 'd'})),
+            '.a{color:red}.d:not(.e){padding:0}p{margin:0}',
+        )
+
+    def test_pages_inline_critical_css_and_load_local_assets(self):
+        response = self.client.get(reverse('main:about'), secure=True)
+        html = response.content.decode()
+        self.assertIn('<style>:root{', html)
+        self.assertIn('.navbar-collapse{', html)
+        self.assertIn('rel="preload" href="/static/main/css/elixir.css" as="style"', html)
+        self.assertIn('<script src="/static/main/js/site.js" defer>', html)
+        self.assertNotIn('cdn.jsdelivr.net', html)
+        self.assertNotIn('cdnjs.cloudflare.com', html)
@@ -0,0 +1,85 @@
+"""
+Límite de peticiones POST por IP y por endpoint con contadores en la caché.
+
+Ventana deslizante aproximada con dos contadores de ventana fija: la cuenta
+estimada es la de la ventana actual más la de la anterior ponderada por la
+parte que aún se solapa. Los contadores se suben con ``cache.incr`` (atómico
+en Redis y en LocMem), así que el límite se cumple entre todos los workers que
+comparten la caché. Las peticiones rechazadas no llegan a la vista: ni
+validación de formularios ni consultas.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+UNITS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+MESSAGE = 'Demasiados intentos. Inténtalo de nuevo en unos minutos.'
+
+
+def parse_rate(rate):
+    """'10/m' -> (10, 60); None o '' -> None (sin límite)"""
+    if not rate:
+        return None
+    count, unit = rate.split('/')
+    return int(count), UNITS[unit[0]]
+
+
+def client_ip(request):
+    """IP del cliente; con THROTTLE_PROXY_COUNT se toma de X-Forwarded-For"""
+    proxies = settings.THROTTLE_PROXY_COUNT
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if proxies and forwarded:
+        hops = [hop.strip() for hop in forwarded.split(',')]
+        # Cada proxy de confianza añade la IP que le conecta: se cuenta desde el final
+        return hops[max(len(hops) - proxies, 0)]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def hit(scope, ident, limit, window):
+    """Cuenta una petición; devuelve ``(permitida, segundos hasta reintentar)``"""
+    now = time.time()
+    current = int(now // window)
+    key = f'throttle:{scope}:{ident}:{current}'
+    # Vive dos ventanas: la siguiente la usa como ventana anterior
+    cache.add(key, 0, window * 2)
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        # Expiró entre add e incr
+        cache.add(key, 1, window * 2)
+        count = 1
+    previous = cache.get(f'throttle:{scope}:{ident}:{current - 1}', 0)
+    elapsed = now - current * window
+    estimated = previous * (1 - elapsed / window) + count
+    if estimated <= limit:
+        return True, 0
+    return False, math.ceil(window - elapsed)
+
+
+def throttle(scope, json=False):
+    """
+    Limita los POST de la vista según ``THROTTLE_RATES[scope]`` (p. ej. '5/m').
+
+    Al superar el límite responde 429 con ``Retry-After`` (JSON si ``json``)
+    sin ejecutar la vista.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            rate = parse_rate(settings.THROTTLE_RATES.get(scope))
+            if request.method == 'POST' and rate:
+                allowed, retry_after = hit(scope, client_ip(request), *rate)
+                if not allowed:
+                    if json:
+                        response = JsonResponse({'success': False, 'message': MESSAGE}, status=429)
+                    else:
+                        response = HttpResponse(MESSAGE, status=429, content_type='text/plain; charset=utf-8')
+                    response['Retry-After'] = str(retry_after)
+                    return response
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
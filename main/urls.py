@@ -1,10 +1,17 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Servida por ASGI, las vistas de lectura con consultas independientes usan su versión asíncrona
+if settings.ASYNC_VIEWS:
+    from . import async_views as read_views
+else:
+    read_views = views
+
 app_name = 'main'
 
 urlpatterns = [
-    path('', views.home, name='home'),
+    path('', read_views.home, name='home'),
     path('about/', views.about, name='about'),
     path('contact/', views.contact, name='contact'),
     
@@ -12,24 +19,44 @@ urlpatterns = [
     path('lecturas/actual/', views.current_reading, name='current_reading'),
     path('lecturas/proximas/', views.upcoming_readings, name='upcoming_readings'),
     path('lecturas/sugerir/', views.suggest_book, name='suggest_book'),
+    path('lecturas/rss/', views.readings_rss, name='readings_rss'),
+    path('lecturas/atom/', views.readings_atom, name='readings_atom'),
     
     # Events URLs
-    path('encuentros/', views.events, name='events'),
+    path('encuentros/', read_views.events, name='events'),
     path('encuentros/<int:pk>/', views.event_detail, name='event_detail'),
+    path('encuentros/<int:pk>/calendario.ics', views.event_ics, name='event_ics'),
+    path('encuentros/calendario.ics', views.events_ics, name='events_ics'),
+    path('encuentros/inscripcion/', views.event_register, name='event_register'),
+    path('encuentros/inscripcion/cancelar/', views.event_cancel, name='event_cancel'),
     
     # Library URL
-    path('biblioteca/', views.library, name='library'),
+    path('biblioteca/', read_views.library, name='library'),
     
     # Blog URLs
     path('reflexiones/', views.blog, name='blog'),
     path('reflexiones/<int:pk>/', views.blog_detail, name='blog_detail'),
+    path('reflexiones/rss/', views.blog_rss, name='blog_rss'),
+    path('reflexiones/atom/', views.blog_atom, name='blog_atom'),
+    path('reflexiones/libro/<int:pk>/rss/', views.book_blog_rss, name='book_blog_rss'),
+    path('reflexiones/libro/<int:pk>/atom/', views.book_blog_atom, name='book_blog_atom'),
     
     # Membership URLs
     path('unete/', views.join, name='join'),
     
     # Gallery URL
-    path('galeria/', views.gallery, name='gallery'),
+    path('galeria/', read_views.gallery, name='gallery'),
     
     # Newsletter subscription
     path('newsletter/suscribir/', views.newsletter_subscribe, name='newsletter_subscribe'),
+    
+    # Token CSRF para formularios incluidos en páginas cacheadas
+    path('csrf/', views.csrf_token, name='csrf_token'),
+    
+    # Mapa del sitio para buscadores
+    path('robots.txt', views.robots_txt, name='robots_txt'),
+    path('sitemap.xml', views.sitemap_index, name='sitemap_index'),
+    path('sitemap-paginas.xml', views.sitemap_pages, name='sitemap_pages'),
+    path('sitemap-encuentros.xml', views.sitemap_events, name='sitemap_events'),
+    path('sitemap-reflexiones.xml', views.sitemap_posts, name='sitemap_posts'),
 ]
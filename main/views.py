@@ -1,26 +1,66 @@
+import re
+import uuid
+from itertools import chain
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.views.decorators.cache import cache_control, never_cache
+from django.views.static import serve
 from django.contrib import messages
-from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import Prefetch
 from django.utils import timezone
 from .models import Book, Event, BlogPost, Member, BookSuggestion, Newsletter, Gallery, Genre, BookReview
+from .caching import get_home_blocks
+from .feeds import BlogAtomFeed, BlogFeed, ReadingsAtomFeed, ReadingsFeed
+from .http_cache import latest_started_event, public_page
+from .ical import BATCH_SIZE as ICS_BATCH_SIZE, CANCELLED_WINDOW as ICS_CANCELLED_WINDOW, calendar
+from .images import VARIANT_NAME_RE
+from .instrumentation import metrics_authorized, prometheus_metrics
 from .forms import BookSuggestionForm, MemberRegistrationForm, ContactForm, NewsletterForm
+from .pagination import KeysetPaginator
+from .query_budget import query_budget
+from .registrations import RegistrationClosed, cancel, notify, register
+from .search import search_books
+from . import sitemaps
+from .subscriptions import normalize_email, subscribe, subscription_buffer
+from .throttling import throttle
+
+def genre_badges():
+    """Prefetch de los géneros que se muestran como etiquetas en las tarjetas"""
+    return Prefetch('genres', queryset=Genre.objects.only('id', 'name'))
+
+def event_lists(now):
+    """Eventos próximos y los seis últimos pasados (compartido con async_views)"""
+    upcoming_events = Event.objects.filter(date__gte=now, is_active=True).order_by('date').select_related('book')
+    past_events = Event.objects.filter(date__lt=now).order_by('-date').select_related('book')[:6]
+    return upcoming_events, past_events
 
+def library_books(genre_filter, search_query):
+    """Libros completados filtrados por género/búsqueda y su orden de paginación"""
+    books = Book.objects.filter(reading_status='completed')
+    ordering = ('-reading_end_date', '-id')
+    
+    if genre_filter:
+        books = books.filter(genres__name=genre_filter)
+    
+    if search_query:
+        # Ordenados por relevancia (título, autor, géneros y sinopsis, sin distinguir tildes)
+        books = search_books(books, search_query)
+        ordering = ('-search_rank', '-id')
+    
+    return books.prefetch_related(genre_badges()), ordering
+
+@query_budget(6)
+@public_page(Book, Event, BlogPost, extra_sources=[latest_started_event])
 def home(request):
     """Vista principal de la aplicación"""
     try:
-        current_book = Book.objects.filter(reading_status='current').first()
-        upcoming_events = Event.objects.filter(date__gte=timezone.now(), is_active=True)[:3]
-        featured_posts = BlogPost.objects.filter(is_published=True, is_featured=True)[:2]
-        featured_quote = BlogPost.objects.filter(is_published=True, featured_quote__isnull=False).exclude(featured_quote='').first()
-        
-        context = {
-            'current_book': current_book,
-            'upcoming_events': upcoming_events,
-            'featured_posts': featured_posts,
-            'featured_quote': featured_quote,
-        }
+        # Cada bloque se cachea por separado y lo invalidan las señales de main/signals.py
+        context = get_home_blocks()
     except Exception as e:
         # Si hay error con la base de datos, mostrar página básica
         context = {
@@ -32,17 +72,23 @@ def home(request):
         }
     return render(request, 'main/home.html', context)
 
+@query_budget(3)
+@public_page(Member, Genre)
 def about(request):
     """Vista de información sobre la aplicación"""
-    members = Member.objects.filter(is_active=True)[:6]
+    members = Member.objects.filter(is_active=True).prefetch_related(
+        Prefetch('favorite_genres', queryset=Genre.objects.only('id', 'name'))
+    )[:6]
     context = {
         'members': members,
     }
     return render(request, 'main/about.html', context)
 
+@query_budget(4)
+@public_page(Book, Genre, BookReview)
 def current_reading(request):
     """Vista de la lectura actual"""
-    current_book = Book.objects.filter(reading_status='current').first()
+    current_book = Book.objects.filter(reading_status='current').prefetch_related(genre_badges()).first()
     reviews = BookReview.objects.filter(book=current_book)[:5] if current_book else []
     
     context = {
@@ -51,15 +97,19 @@ def current_reading(request):
     }
     return render(request, 'main/current_reading.html', context)
 
+@query_budget(3)
+@public_page(Book, Genre)
 def upcoming_readings(request):
     """Vista de próximas lecturas"""
-    upcoming_books = Book.objects.filter(reading_status='upcoming').order_by('reading_start_date')
+    upcoming_books = Book.objects.filter(reading_status='upcoming').order_by('reading_start_date').prefetch_related(genre_badges())
     
     context = {
         'upcoming_books': upcoming_books,
     }
     return render(request, 'main/upcoming_readings.html', context)
 
+@query_budget(1)
+@throttle('suggest_book')
 def suggest_book(request):
     """Vista para sugerir libros"""
     if request.method == 'POST':
@@ -76,10 +126,11 @@ def suggest_book(request):
     }
     return render(request, 'main/suggest_book.html', context)
 
+@query_budget(3)
+@public_page(Event, Book, extra_sources=[latest_started_event])
 def events(request):
     """Vista de eventos y actividades"""
-    upcoming_events = Event.objects.filter(date__gte=timezone.now(), is_active=True).order_by('date')
-    past_events = Event.objects.filter(date__lt=timezone.now()).order_by('-date')[:6]
+    upcoming_events, past_events = event_lists(timezone.now())
     
     context = {
         'upcoming_events': upcoming_events,
@@ -87,34 +138,98 @@ def events(request):
     }
     return render(request, 'main/events.html', context)
 
+@query_budget(3)
+@public_page(Event, Book, Genre, extra_sources=[latest_started_event])
 def event_detail(request, pk):
     """Vista detalle de evento"""
-    event = get_object_or_404(Event, pk=pk)
+    event = get_object_or_404(
+        Event.objects.select_related('book').prefetch_related(
+            Prefetch('book__genres', queryset=Genre.objects.only('id', 'name'))
+        ),
+        pk=pk,
+    )
     context = {
         'event': event,
     }
     return render(request, 'main/event_detail.html', context)
 
+@query_budget(3)
+@public_page(Event, Book)
+def events_ics(request):
+    """Calendario iCalendar de los encuentros para suscribirse desde el móvil (los cancelados hace poco, como tales)"""
+    events = Event.objects.select_related('book').order_by('date', 'pk')
+    cancelled = events.filter(is_active=False, details_updated_at__gte=timezone.now() - ICS_CANCELLED_WINDOW)
+    body = calendar(
+        chain(
+            events.filter(is_active=True).iterator(chunk_size=ICS_BATCH_SIZE),
+            cancelled.iterator(chunk_size=ICS_BATCH_SIZE),
+        ),
+        request.get_host(), request.scheme,
+    )
+    return HttpResponse(body, content_type='text/calendar; charset=utf-8')
+
+@query_budget(2)
+@public_page(Event, Book)
+def event_ics(request, pk):
+    """Un encuentro en formato iCalendar para añadirlo al calendario"""
+    event = get_object_or_404(Event.objects.select_related('book'), pk=pk)
+    body = calendar([event], request.get_host(), request.scheme, name=event.title)
+    response = HttpResponse(body, content_type='text/calendar; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="encuentro-{event.pk}.ics"'
+    return response
+
+@query_budget(4)
+@throttle('event_register', json=True)
+def event_register(request):
+    """Inscripción a un encuentro: plaza confirmada o lista de espera"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Error en la inscripción.'})
+    try:
+        email = normalize_email(request.POST.get('email'))
+    except ValidationError:
+        return JsonResponse({'success': False, 'message': 'Introduce un email válido.'})
+    try:
+        registration, created = register(int(request.POST.get('event', '')), request.POST.get('name'), email)
+    except (ValueError, RegistrationClosed):
+        return JsonResponse({'success': False, 'message': 'Las inscripciones para este encuentro están cerradas.'})
+    
+    if not created:
+        message = 'Ya estás inscrito en este encuentro.'
+    elif registration.status == 'confirmed':
+        message = '¡Plaza confirmada! Te enviamos un correo con los detalles.'
+    else:
+        message = 'El encuentro está completo: estás en la lista de espera y te avisaremos si se libera una plaza.'
+    if created:
+        notify([registration], request.build_absolute_uri(reverse('main:event_detail', args=[registration.event_id])))
+    return JsonResponse({'success': created, 'status': registration.status, 'message': message})
+
+@query_budget(8)
+def event_cancel(request):
+    """Cancelación con el enlace del correo; la plaza pasa a la lista de espera"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Error al cancelar.'})
+    try:
+        token = uuid.UUID(request.POST.get('token', ''))
+    except ValueError:
+        registration = None
+    else:
+        registration, promoted = cancel(token)
+    if registration is None:
+        return JsonResponse({'success': False, 'message': 'Esta inscripción no existe o ya estaba cancelada.'})
+    notify(promoted, request.build_absolute_uri(registration.event.get_absolute_url()))
+    return JsonResponse({'success': True, 'message': 'Inscripción cancelada. ¡Gracias por avisar!'})
+
+@query_budget(5)
+@public_page(Book, Genre)
 def library(request):
     """Vista de biblioteca recomendada"""
     genre_filter = request.GET.get('genre')
     search_query = request.GET.get('search')
     
-    books = Book.objects.filter(reading_status='completed').order_by('-reading_end_date')
-    
-    if genre_filter:
-        books = books.filter(genres__name=genre_filter)
-    
-    if search_query:
-        books = books.filter(
-            Q(title__icontains=search_query) | 
-            Q(author__icontains=search_query)
-        )
-    
-    genres = Genre.objects.all()
-    paginator = Paginator(books, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    books, ordering = library_books(genre_filter, search_query)
+    genres = list(Genre.objects.all())
+    paginator = KeysetPaginator(books, 12, ordering, count='approximate')
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     
     context = {
         'page_obj': page_obj,
@@ -124,25 +239,28 @@ def library(request):
     }
     return render(request, 'main/library.html', context)
 
+@query_budget(2)
+@public_page(BlogPost, Book)
 def blog(request):
     """Vista del blog/reflexiones"""
-    posts = BlogPost.objects.filter(is_published=True).order_by('-created_at')
-    paginator = Paginator(posts, 6)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = BlogPost.objects.filter(is_published=True).select_related('book')
+    paginator = KeysetPaginator(posts, 6, ('-created_at', '-id'))
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'main/blog.html', context)
 
+@query_budget(3)
+@public_page(BlogPost, Book)
 def blog_detail(request, pk):
     """Vista detalle de entrada de blog"""
-    post = get_object_or_404(BlogPost, pk=pk, is_published=True)
+    post = get_object_or_404(BlogPost.objects.select_related('book'), pk=pk, is_published=True)
     related_posts = BlogPost.objects.filter(
         is_published=True, 
-        book=post.book
-    ).exclude(pk=pk)[:3] if post.book else []
+        book_id=post.book_id
+    ).exclude(pk=pk)[:3] if post.book_id else []
     
     context = {
         'post': post,
@@ -150,6 +268,58 @@ def blog_detail(request, pk):
     }
     return render(request, 'main/blog_detail.html', context)
 
+# Feeds RSS/Atom (main/feeds.py): se renderizan una vez por cambio de contenido
+blog_rss = query_budget(2)(public_page(BlogPost, Book)(BlogFeed()))
+blog_atom = query_budget(2)(public_page(BlogPost, Book)(BlogAtomFeed()))
+book_blog_rss = query_budget(3)(public_page(BlogPost, Book)(BlogFeed()))
+book_blog_atom = query_budget(3)(public_page(BlogPost, Book)(BlogAtomFeed()))
+readings_rss = query_budget(3)(public_page(Book, Genre)(ReadingsFeed()))
+readings_atom = query_budget(3)(public_page(Book, Genre)(ReadingsAtomFeed()))
+
+def sitemap_response(chunks):
+    return StreamingHttpResponse(chunks, content_type='application/xml; charset=utf-8')
+
+@query_budget(4)
+@public_page(Book, Event, BlogPost, Gallery)
+def sitemap_index(request):
+    """Índice del mapa del sitio con un sitemap por sección (main/sitemaps.py)"""
+    return sitemap_response(sitemaps.index(f'{request.scheme}://{request.get_host()}'))
+
+@query_budget(2)
+@public_page(Book, Event, BlogPost, Gallery)
+def sitemap_pages(request):
+    """Sitemap de las páginas fijas y los listados"""
+    return sitemap_response(sitemaps.urlset(f'{request.scheme}://{request.get_host()}', sitemaps.page_urls()))
+
+def section_sitemap(request, section):
+    start = request.GET.get('desde')
+    # Sólo dígitos ASCII: isdigit() también acepta '²', que int() rechaza
+    if start is not None and (not re.fullmatch(r'[0-9]+', start) or int(start) > sitemaps.MAX_PK):
+        raise Http404
+    urls = section.urls(int(start) if start else None)
+    return sitemap_response(sitemaps.urlset(f'{request.scheme}://{request.get_host()}', urls))
+
+@query_budget(2)
+@public_page(Event)
+def sitemap_events(request):
+    """Sitemap de los encuentros activos (``?desde=<pk>`` para los archivos siguientes)"""
+    return section_sitemap(request, sitemaps.SECTIONS['events'])
+
+@query_budget(2)
+@public_page(BlogPost)
+def sitemap_posts(request):
+    """Sitemap de las reflexiones publicadas (``?desde=<pk>`` para los archivos siguientes)"""
+    return section_sitemap(request, sitemaps.SECTIONS['posts'])
+
+@query_budget(0)
+@cache_control(public=True, max_age=60 * 60 * 24)
+def robots_txt(request):
+    """robots.txt con la dirección del mapa del sitio"""
+    sitemap = f"{request.scheme}://{request.get_host()}{reverse('main:sitemap_index')}"
+    return HttpResponse(f'User-agent: *\nDisallow: /admin/\nSitemap: {sitemap}\n', content_type='text/plain; charset=utf-8')
+
+@query_budget(4)
+@throttle('join')
 def join(request):
     """Vista para unirse al club"""
     if request.method == 'POST':
@@ -169,14 +339,15 @@ def join(request):
     }
     return render(request, 'main/join.html', context)
 
+@query_budget(3)
+@public_page(Gallery, Event)
 def gallery(request):
     """Vista de galería"""
-    images = Gallery.objects.all().order_by('-upload_date')
+    images = Gallery.objects.all().order_by('-upload_date').select_related('event')
     featured_images = images.filter(is_featured=True)[:6]
     
-    paginator = Paginator(images, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = KeysetPaginator(images, 12, ('-upload_date', '-id'))
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     
     context = {
         'page_obj': page_obj,
@@ -184,6 +355,8 @@ def gallery(request):
     }
     return render(request, 'main/gallery.html', context)
 
+@query_budget(0)
+@throttle('contact')
 def contact(request):
     """Vista de contacto"""
     if request.method == 'POST':
@@ -200,21 +373,49 @@ def contact(request):
     }
     return render(request, 'main/contact.html', context)
 
+@query_budget(1)
+@throttle('newsletter_subscribe', json=True)
 def newsletter_subscribe(request):
     """Vista para suscribirse al newsletter"""
     if request.method == 'POST':
-        email = request.POST.get('email')
+        try:
+            email = normalize_email(request.POST.get('email'))
+        except ValidationError:
+            return JsonResponse({'success': False, 'message': 'Introduce un email válido.'})
         name = request.POST.get('name', '')
         
-        if email:
-            newsletter, created = Newsletter.objects.get_or_create(
-                email=email,
-                defaults={'name': name}
-            )
-            
-            if created:
-                return JsonResponse({'success': True, 'message': '¡Suscripción exitosa!'})
-            else:
-                return JsonResponse({'success': False, 'message': 'Este email ya está suscrito.'})
+        if settings.NEWSLETTER_WRITE_BEHIND:
+            # Se escribe por lotes: no se sabe aún si el email ya estaba suscrito
+            subscription_buffer.add(email, name)
+            return JsonResponse({'success': True, 'message': '¡Suscripción exitosa!'})
+        
+        # Una sola sentencia INSERT ... ON CONFLICT: sin carreras ni IntegrityError
+        if subscribe(email, name):
+            return JsonResponse({'success': True, 'message': '¡Suscripción exitosa!'})
+        else:
+            return JsonResponse({'success': False, 'message': 'Este email ya está suscrito.'})
     
     return JsonResponse({'success': False, 'message': 'Error en la suscripción.'})
+
+@query_budget(0)
+@never_cache
+def csrf_token(request):
+    """Token CSRF para formularios de páginas cacheadas (el pie de página del newsletter)"""
+    return JsonResponse({'csrfToken': get_token(request)})
+
+@query_budget(0)
+def image_variant(request, name):
+    """Variante de imagen generada después de arrancar (las anteriores las sirve WhiteNoise)"""
+    if not VARIANT_NAME_RE.fullmatch(name):
+        raise Http404
+    response = serve(request, name, document_root=settings.IMAGE_VARIANTS_ROOT)
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@query_budget(2)
+@never_cache
+def metrics(request):
+    """Percentiles por vista y contadores de caché en formato Prometheus (staff o METRICS_TOKEN)"""
+    if not metrics_authorized(request):
+        return HttpResponse('No autorizado.', status=403, content_type='text/plain; charset=utf-8')
+    return HttpResponse(prometheus_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')